@@ -0,0 +1,43 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+from speed_profiles import SpeedHistory, build_profiles, partition_day, save_profiles
+
+parser = argparse.ArgumentParser(description="교통 히스토리 -> 요일/15분 버킷 속도 프로파일 생성")
+parser.add_argument("--history-dir", default=os.environ.get("TRAFFIC_HISTORY_DIR", "/cache/traffic_history"),
+                    help="수집기가 쌓은 히스토리 디렉터리 (기본값: 환경변수 TRAFFIC_HISTORY_DIR)")
+parser.add_argument("--output", default=os.environ.get("SPEED_PROFILE_FILE", "/cache/speed_profiles.npz"),
+                    help="프로파일 출력 파일 (기본값: 환경변수 SPEED_PROFILE_FILE)")
+parser.add_argument("--days", type=int, default=28, help="최근 며칠의 히스토리를 사용할지 (기본값: 28)")
+parser.add_argument("--min-samples", type=int, default=3, help="버킷별 최소 표본 수 (기본값: 3)")
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    started_at = time.time()
+    history = SpeedHistory(args.history_dir)
+    since_day = partition_day(started_at - args.days * 86400) if args.days else None
+    way_ids, speeds, observed_at = history.load(since_day)
+    if not way_ids.size:
+        logging.error(f"히스토리가 비어 있습니다: {args.history_dir}")
+        return 1
+
+    profile_ways, profile_speeds, samples = build_profiles(way_ids, speeds, observed_at, args.min_samples)
+    days = len([day for day in history.days() if not since_day or day >= since_day])
+    save_profiles(args.output, profile_ways, profile_speeds, samples, built_at=started_at, history_days=days)
+
+    filled = float(np.isfinite(profile_speeds).mean()) if profile_speeds.size else 0.0
+    observed = float((samples >= args.min_samples).mean()) if samples.size else 0.0
+    logging.info(f"속도 프로파일 생성: {args.output} (way {profile_ways.size}개, 관측 {way_ids.size}건, {days}일, "
+                 f"충분한 표본 버킷 {observed:.1%}, 채워진 버킷 {filled:.1%}, {time.time() - started_at:.1f}초)")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,40 @@
+#!/bin/bash
+# Valhalla 실시간 교통용 traffic.tar와 ways_edges.txt 생성 (valhalla 타일을 만든 뒤 한 번 실행)
+#
+#   docker compose --profile setup run --rm valhalla-traffic-setup
+#   docker compose restart valhalla traffic-proxy
+#
+# traffic.tar 위치는 valhalla.json의 mjolnir.traffic_extract, way->edge 매핑은 같은 디렉터리의 ways_edges.txt.
+# traffic-proxy는 같은 디렉터리를 /custom_files로 마운트해 traffic.tar에 속도를 직접 기록한다.
+set -euo pipefail
+
+CONFIG=${VALHALLA_CONFIG:-/custom_files/valhalla.json}
+CUSTOM_FILES=$(dirname "$CONFIG")
+config_value() {
+    python3 -c "import json, sys; print(json.load(open(sys.argv[1]))['mjolnir'][sys.argv[2]])" "$CONFIG" "$1"
+}
+TILE_DIR=$(config_value tile_dir)
+TRAFFIC_TAR=$(config_value traffic_extract)
+WAYS_EDGES="$CUSTOM_FILES/ways_edges.txt"
+
+if [ ! -d "$TILE_DIR" ] || [ -z "$(ls -A "$TILE_DIR")" ]; then
+    echo "ERROR: valhalla 타일이 없습니다 ($TILE_DIR). valhalla 컨테이너로 타일을 먼저 만드세요" >&2
+    exit 1
+fi
+
+echo "traffic.tar 생성: $TRAFFIC_TAR"
+valhalla_build_extract -c "$CONFIG" --with-traffic --overwrite -v
+
+echo "way -> edge 매핑 생성: $WAYS_EDGES"
+(cd "$CUSTOM_FILES" && valhalla_ways_to_edges --config "$CONFIG")
+for candidate in "$TILE_DIR/ways_edges.txt" "$CUSTOM_FILES/ways_edges.txt"; do
+    if [ -s "$candidate" ] && [ "$candidate" != "$WAYS_EDGES" ]; then
+        mv "$candidate" "$WAYS_EDGES"
+    fi
+done
+
+if [ ! -s "$TRAFFIC_TAR" ] || [ ! -s "$WAYS_EDGES" ]; then
+    echo "ERROR: 생성 실패 (traffic.tar: $TRAFFIC_TAR, ways_edges: $WAYS_EDGES)" >&2
+    exit 1
+fi
+echo "완료. valhalla와 traffic-proxy를 재시작하면 실시간 교통 타일을 사용합니다"
@@ -13,6 +13,7 @@ from auth import auth_required, get_current_driver
 
 from get_valhalla_matrix import get_time_distance_matrix
 from get_valhalla_route import get_turn_by_turn_route
+from matrix_codec import post_matrix
 
 logging.basicConfig(
     level=logging.INFO,
@@ -26,14 +27,24 @@ driver_hub_status = {}
 
 BACKEND_API_URL = os.environ.get("BACKEND_API_URL")
 LKH_SERVICE_URL = os.environ.get("LKH_SERVICE_URL", "http://lkh:5001/solve")
+LKH_MATRIX_TRANSPORT = os.environ.get("LKH_MATRIX_TRANSPORT", "application/x-npy")
 DELIVERY_START_TIME = datetime_time(15, 0)
 HUB_LOCATION = {"lat": 37.5299, "lon": 126.9648, "name": "용산역"}
 COSTING_MODEL = "auto"
 KST = pytz.timezone('Asia/Seoul')
 
-KAKAO_API_KEY = os.environ.get('KAKAO_API_KEY', 'YOUR_KAKAO_API_KEY_HERE')
-KAKAO_ADDRESS_API = "https://dapi.kakao.com/v2/local/search/address.json"
-KAKAO_KEYWORD_API = "https://dapi.kakao.com/v2/local/search/keyword.json"
+VALHALLA_HOST = os.environ.get("VALHALLA_HOST", "traffic-proxy")
+VALHALLA_PORT = os.environ.get("VALHALLA_PORT", "8003")
+GEOCODE_SEARCH_URL = f"http://{VALHALLA_HOST}:{VALHALLA_PORT}/search"
+GEOCODE_BATCH_URL = f"http://{VALHALLA_HOST}:{VALHALLA_PORT}/search/batch"
+PROXY_HEALTH_URL = f"http://{VALHALLA_HOST}:{VALHALLA_PORT}/health"
+# 프록시는 캐시에 없는 주소마다 카카오를 최대 2번(주소, 키워드) 부르고, bulk 요청은 토큰을 KAKAO_BULK_TIMEOUT초까지만 기다린다.
+# 한 번에 보내는 주소 수를 카카오 한도로 GEOCODE_BATCH_SECONDS 안에 끝낼 수 있는 만큼으로 제한한다
+KAKAO_API_RATE = float(os.environ.get('KAKAO_API_RATE', '20'))
+GEOCODE_BATCH_SECONDS = float(os.environ.get('GEOCODE_BATCH_SECONDS', '60'))
+GEOCODE_BATCH_SIZE = max(1, min(500, int(KAKAO_API_RATE / 2 * GEOCODE_BATCH_SECONDS)))
+GEOCODE_BATCH_TIMEOUT = GEOCODE_BATCH_SECONDS * 2 + 30
+GEOCODE_BATCH_RETRIES = int(os.environ.get('GEOCODE_BATCH_RETRIES', '2'))
 
 DISTRICT_DRIVER_MAPPING = {
     "은평구": 6, "서대문구": 6, "마포구": 6,
@@ -271,93 +282,134 @@ def complete_delivery_in_db(delivery_id):
     finally:
         conn.close()
 
-def kakao_geocoding(address):
+def geocoding_proxy_status():
+    """카카오 키와 호출은 프록시가 가지므로 이 서비스는 프록시 연결 상태만 보고한다"""
     try:
-        headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
+        response = requests.get(PROXY_HEALTH_URL, timeout=3)
+        return "ok" if response.status_code == 200 else f"error {response.status_code}"
+    except Exception as e:
+        logging.warning(f"지오코딩 프록시 상태 확인 실패: {e}")
+        return "unreachable"
 
-        params = {"query": address}
-        response = requests.get(KAKAO_ADDRESS_API, headers=headers, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            documents = data.get("documents", [])
-            
-            if documents:
-                doc = documents[0]
-                lat = float(doc["y"])
-                lon = float(doc["x"])
-                address_name = doc.get("address_name", address)
-                
-                logging.info(f"카카오 주소 검색 성공: {address} -> ({lat}, {lon}) [{address_name}]")
-                return lat, lon, address_name
+def proxy_geocode(address, priority="interactive"):
+    """프록시 /search로 지오코딩 (카카오 호출은 프록시의 캐시와 우선순위 스케줄러를 거친다). 실패하면 None"""
+    try:
+        params = {"text": address, "priority": priority}
+        response = requests.get(GEOCODE_SEARCH_URL, params=params, timeout=15)
 
-        response = requests.get(KAKAO_KEYWORD_API, headers=headers, params=params, timeout=10)
-        
         if response.status_code == 200:
-            data = response.json()
-            documents = data.get("documents", [])
-            
-            if documents:
-                doc = documents[0]
-                lat = float(doc["y"])
-                lon = float(doc["x"])
-                place_name = doc.get("place_name", address)
-                
-                logging.info(f"카카오 키워드 검색 성공: {address} -> ({lat}, {lon}) [{place_name}]")
-                return lat, lon, place_name
+            features = response.json().get("features") or []
+            if features:
+                coords = features[0]["geometry"]["coordinates"]
+                properties = features[0].get("properties", {})
+                return {
+                    "lat": coords[1],
+                    "lon": coords[0],
+                    "name": properties.get("display_name", address),
+                    "confidence": properties.get("confidence", 0),
+                    "district": properties.get("district")
+                }
 
-        logging.warning(f"카카오 지오코딩 실패, 기본 좌표 사용: {address}")
-        return get_default_coordinates_by_district(address)
-        
+        logging.warning(f"프록시 지오코딩 실패: {address} ({response.status_code})")
     except Exception as e:
-        logging.error(f"카카오 지오코딩 오류: {e}")
-        return get_default_coordinates_by_district(address)
+        logging.error(f"프록시 지오코딩 오류: {e}")
+    return None
+
+def kakao_geocoding(address):
+    result = proxy_geocode(address)
+    if result:
+        logging.info(f"카카오 지오코딩: {address} -> ({result['lat']}, {result['lon']}) [{result['name']}] "
+                     f"신뢰도: {result['confidence']}")
+        return result["lat"], result["lon"], result["name"]
+
+    logging.warning(f"카카오 지오코딩 실패, 기본 좌표 사용: {address}")
+    return get_default_coordinates_by_district(address)
 
 def extract_district_from_kakao_geocoding(address):
+    result = proxy_geocode(address)
+    district = (result or {}).get("district")
+    if district and district.endswith("구"):
+        logging.info(f"카카오 API로 구 추출 성공: {address} -> {district}")
+        return district
+
+    address_parts = address.split()
+    for part in address_parts:
+        if part.endswith('구'):
+            logging.info(f"텍스트에서 구 추출: {address} -> {part}")
+            return part
+
+    logging.warning(f"구 정보 추출 실패: {address}")
+    return None
+
+def request_geocode_batch(addresses):
+    """주소 목록을 GEOCODE_BATCH_SIZE씩 나눠 프록시 /search/batch로 지오코딩. 입력 순서대로 결과 dict 목록, 실패하면 None"""
+    results = []
+    for start in range(0, len(addresses), GEOCODE_BATCH_SIZE):
+        chunk = addresses[start:start + GEOCODE_BATCH_SIZE]
+        response = requests.post(GEOCODE_BATCH_URL, json={"addresses": chunk, "priority": "bulk"},
+                                 timeout=GEOCODE_BATCH_TIMEOUT)
+        if response.status_code != 200:
+            logging.error(f"일괄 지오코딩 실패: {response.status_code}")
+            return None
+
+        data = response.json()
+        logging.info(f"일괄 지오코딩: {data.get('count')}건 (고유 {data.get('unique')}건, {data.get('sources')}) "
+                     f"{data.get('elapsed_sec')}초")
+        results.extend(data.get("results") or [])
+    return results
+
+def geocode_addresses_batch(addresses):
+    """주소 목록을 한 번에 지오코딩. 입력 순서대로 결과 dict 목록, 실패하면 None
+
+    프록시가 카카오 대기 시간 초과 등으로 구별 기본 좌표(source: fallback)를 돌려준 주소는 다시 요청하고,
+    끝까지 풀리지 않은 주소는 결과에 unresolved: True로 표시한다 (기본 좌표를 실제 위치로 쓰지 않도록).
+    """
     try:
-        headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
-        params = {"query": address}
+        results = request_geocode_batch(addresses)
+        if results is None:
+            return None
+
+        for attempt in range(1, GEOCODE_BATCH_RETRIES + 1):
+            pending = [i for i, result in enumerate(results) if (result or {}).get("source") == "fallback"]
+            if not pending:
+                break
+            logging.warning(f"일괄 지오코딩 기본 좌표 {len(pending)}건 재시도 ({attempt}/{GEOCODE_BATCH_RETRIES})")
+            retried = request_geocode_batch([addresses[i] for i in pending])
+            if retried is None:
+                break
+            for i, result in zip(pending, retried):
+                results[i] = result
+
+        unresolved = 0
+        for result in results:
+            if result and result.get("source") == "fallback":
+                result["unresolved"] = True
+                unresolved += 1
+        if unresolved:
+            logging.warning(f"일괄 지오코딩에서 좌표를 찾지 못한 주소 {unresolved}건")
+        return results
 
-        response = requests.get(KAKAO_ADDRESS_API, headers=headers, params=params, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            documents = data.get("documents", [])
-            
-            if documents:
-                doc = documents[0]
-
-                address_info = doc.get("address", {})
-                if address_info:
-                    district = address_info.get("region_2depth_name", "")
-                    if district and district.endswith("구"):
-                        logging.info(f"카카오 API로 구 추출 성공: {address} -> {district}")
-                        return district
-
-                road_address = doc.get("road_address", {})
-                if road_address:
-                    district = road_address.get("region_2depth_name", "")
-                    if district and district.endswith("구"):
-                        logging.info(f"카카오 API로 구 추출 성공 (도로명): {address} -> {district}")
-                        return district
-
-        address_parts = address.split()
-        for part in address_parts:
-            if part.endswith('구'):
-                logging.info(f"텍스트에서 구 추출: {address} -> {part}")
-                return part
-        
-        logging.warning(f"구 정보 추출 실패: {address}")
-        return None
-        
     except Exception as e:
-        logging.error(f"구 추출 오류: {e}")
-        address_parts = address.split()
-        for part in address_parts:
-            if part.endswith('구'):
-                return part
+        logging.error(f"일괄 지오코딩 오류: {e}")
         return None
 
+def extract_districts_batch(addresses):
+    """주소 목록의 구 이름 목록. 일괄 지오코딩이 실패하면 주소별 조회로 대체"""
+    if not addresses:
+        return []
+
+    results = geocode_addresses_batch(addresses)
+    if results is None:
+        return [extract_district_from_kakao_geocoding(address) for address in addresses]
+
+    districts = []
+    for address, result in zip(addresses, results):
+        district = None if (result or {}).get("unresolved") else (result or {}).get("district")
+        if not district or not district.endswith("구"):
+            district = next((part for part in address.split() if part.endswith("구")), None)
+        districts.append(district)
+    return districts
+
 def address_to_coordinates(address):
     lat, lon, _ = kakao_geocoding(address)
     return lat, lon
@@ -459,10 +511,7 @@ def calculate_optimal_next_destination(locations, current_location):
        time_matrix, _ = get_enhanced_time_distance_matrix(location_coords, costing=COSTING_MODEL)
        
        if time_matrix is not None:
-           response = requests.post(
-               LKH_SERVICE_URL,
-               json={"matrix": time_matrix.tolist()}
-           )
+           response = post_matrix(LKH_SERVICE_URL, time_matrix, transport=LKH_MATRIX_TRANSPORT)
            
            if response.status_code == 200:
                result = response.json()
@@ -541,19 +590,15 @@ def import_todays_pickups():
         converted_count = 0
         district_stats = {}
         
+        converted_addresses = []
         for pickup in completed_pickups:
             if convert_pickup_to_delivery_in_db(pickup['id']):
                 converted_count += 1
+                converted_addresses.append(pickup['recipientAddr'])
 
-                address = pickup['recipientAddr']
-                district = extract_district_from_kakao_geocoding(address)
-                if district:
-                    district_stats[district] = district_stats.get(district, 0) + 1
-                else:
-                    for part in address.split():
-                        if part.endswith('구'):
-                            district_stats[part] = district_stats.get(part, 0) + 1
-                            break
+        for district in extract_districts_batch(converted_addresses):
+            if district:
+                district_stats[district] = district_stats.get(district, 0) + 1
         
         return jsonify({
             "status": "success",
@@ -572,17 +617,10 @@ def assign_to_drivers():
         unassigned = get_unassigned_deliveries_today_from_db()
 
         district_deliveries = {}
-        for delivery in unassigned:
+        districts = extract_districts_batch([delivery['recipientAddr'] for delivery in unassigned])
+        for delivery, district in zip(unassigned, districts):
             address = delivery['recipientAddr']
 
-            district = extract_district_from_kakao_geocoding(address)
-            
-            if not district:
-                for part in address.split():
-                    if part.endswith('구'):
-                        district = part
-                        break
-            
             if district:
                 if district not in district_deliveries:
                     district_deliveries[district] = []
@@ -846,7 +884,7 @@ def status():
     return jsonify({
         "status": "healthy",
         "geocoding": "kakao",
-        "kakao_api_configured": bool(KAKAO_API_KEY and KAKAO_API_KEY != 'YOUR_KAKAO_API_KEY_HERE')
+        "geocoding_proxy": geocoding_proxy_status()
     })
 
 @app.route('/api/debug/db-check')
@@ -912,7 +950,7 @@ def test_kakao_geocoding():
             "location_name": location_name,
             "extracted_district": district,
             "assigned_driver": driver_id,
-            "api_status": "ok" if KAKAO_API_KEY and KAKAO_API_KEY != 'YOUR_KAKAO_API_KEY_HERE' else "api_key_needed"
+            "api_status": geocoding_proxy_status()
         }), 200
         
     except Exception as e:
@@ -924,5 +962,5 @@ if __name__ == "__main__":
     host = os.environ.get("HOST", "0.0.0.0")
     
     logging.info(f"Starting delivery service on {host}:{port}")
-    logging.info(f"카카오 API 설정: {'OK' if KAKAO_API_KEY and KAKAO_API_KEY != 'YOUR_KAKAO_API_KEY_HERE' else 'API KEY 필요'}")
+    logging.info(f"지오코딩 프록시: {PROXY_HEALTH_URL}")
     app.run(host=host, port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import csv
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from proxy_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = ()
+
+SEOUL_PREFIX = re.compile(r'^(서울특별시|서울시)(?=\s)')
+LOT_NUMBER_DASH = re.compile(r'\s*-\s*')
+SEPARATORS = re.compile(r'[,\s]+')
+
+
+def district_from_address(address):
+    """주소 문자열에서 '구'로 끝나는 첫 토큰"""
+    for part in (address or '').split():
+        if part.endswith('구'):
+            return part
+    return None
+
+
+def normalize_address(address):
+    """캐시 키용 주소 정규화: NFKC, 공백/쉼표 정리, '서울특별시'/'서울시' -> '서울', 지번 '-' 주변 공백 제거"""
+    text = unicodedata.normalize('NFKC', address or '').strip()
+    text = SEPARATORS.sub(' ', text).strip(' .')
+    text = LOT_NUMBER_DASH.sub('-', text)
+    return SEOUL_PREFIX.sub('서울', text)
+
+
+class GeocodeCache:
+    """정규화한 주소 -> 지오코딩 결과 캐시. 메모리 LRU 앞단 + SQLite 영구 저장소
+
+    값은 dict(lat, lon, name, confidence, district). 카카오에서 결과가 없던 주소는
+    NOT_FOUND로 negative_ttl 동안 기억해 같은 주소로 다시 API를 부르지 않는다.
+    """
+
+    def __init__(self, path, max_memory_items=50000, ttl=30 * 86400, negative_ttl=86400):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = TTLCache(max_memory_items, ttl)
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS geocode ("
+                    "key TEXT PRIMARY KEY, lat REAL, lon REAL, name TEXT, confidence REAL, "
+                    "district TEXT, found INTEGER NOT NULL, expires_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                logger.error(f"지오코딩 캐시 DB를 열 수 없습니다 ({path}), 메모리 캐시만 사용: {e}")
+                self._db = None
+
+    def get(self, address):
+        """캐시된 결과 dict, 결과 없음으로 캐시된 경우 NOT_FOUND, 캐시에 없으면 None"""
+        key = normalize_address(address)
+        value = self.memory.get(key)
+        if value is not None or self._db is None:
+            return value
+
+        with self._lock:
+            row = self._db.execute(
+                "SELECT lat, lon, name, confidence, district, found, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        lat, lon, name, confidence, district, found, expires_at = row
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            return None
+
+        value = {"lat": lat, "lon": lon, "name": name, "confidence": confidence, "district": district} if found else NOT_FOUND
+        self.memory.put(key, value, ttl=remaining)
+        self.disk_hits += 1
+        return value
+
+    def put(self, address, value):
+        """value: 결과 dict 또는 NOT_FOUND"""
+        key = normalize_address(address)
+        ttl = self.ttl if value else self.negative_ttl
+        self.memory.put(key, value, ttl=ttl)
+        if self._db is not None:
+            self._write([(key, value, time.time() + ttl)])
+
+    def _write(self, entries):
+        rows = [
+            (key, value.get('lat'), value.get('lon'), value.get('name'), value.get('confidence'),
+             value.get('district'), 1, expires_at) if value else
+            (key, None, None, None, None, None, 0, expires_at)
+            for key, value, expires_at in entries
+        ]
+        try:
+            with self._lock:
+                self._db.executemany("INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+        except Exception as e:
+            logger.error(f"지오코딩 캐시 저장 오류: {e}")
+
+    def prewarm(self, path):
+        """CSV(address, lat, lon[, name, confidence, district])로 캐시를 미리 채운다. 불러온 주소 수 반환"""
+        entries = []
+        expires_at = time.time() + self.ttl
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                try:
+                    address = row['address']
+                    value = {
+                        "lat": float(row['lat']),
+                        "lon": float(row['lon']),
+                        "name": row.get('name') or address,
+                        "confidence": float(row.get('confidence') or 0.95),
+                        "district": row.get('district') or district_from_address(address)
+                    }
+                except (KeyError, TypeError, ValueError):
+                    continue
+                key = normalize_address(address)
+                self.memory.put(key, value)
+                entries.append((key, value, expires_at))
+
+        if entries and self._db is not None:
+            self._write(entries)
+        return len(entries)
+
+    def purge_expired(self):
+        if self._db is None:
+            return 0
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM geocode WHERE expires_at < ?", (time.time(),)).rowcount
+            self._db.commit()
+        return deleted
+
+    def stats(self):
+        stored = None
+        if self._db is not None:
+            with self._lock:
+                stored = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        return dict(self.memory.stats(), disk_hits=self.disk_hits, stored=stored, path=self.path,
+                    negative_ttl_sec=self.negative_ttl)
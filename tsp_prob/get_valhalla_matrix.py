@@ -30,6 +30,7 @@ def get_time_distance_matrix(locations, costing="auto", use_traffic=True):
         "targets": locations,
         "costing": costing,
         "units": "kilometers",
+        "verbose": False,
         "costing_options": {
             costing: {
                 "use_live_traffic": use_traffic
@@ -56,22 +57,20 @@ def get_time_distance_matrix(locations, costing="auto", use_traffic=True):
             distance_matrix = np.full((n, n), -1.0, dtype=float)
             found_routes = 0
 
-            if 'sources_to_targets' in data:
-                for i, source_data in enumerate(data['sources_to_targets']):
-                    if source_data:
-                        for j, target_data in enumerate(source_data):
-                            if target_data and target_data.get('time') is not None and target_data.get('distance') is not None:
-                                time_matrix[i, j] = target_data['time']
-                                distance_matrix[i, j] = target_data['distance']
-                                found_routes += 1
-                            else:
-                                logging.warning(f"No route found between location {i} and {j}. Assigning large penalty.")
-                                time_matrix[i, j] = 9999999
-                                distance_matrix[i, j] = 9999999
-                    else:
-                        logging.warning(f"No target data found for source {i}. Assigning large penalties for this row.")
-                        time_matrix[i, :] = 9999999
-                        distance_matrix[i, :] = 9999999
+            sources_to_targets = data.get('sources_to_targets') or {}
+            durations = np.array(sources_to_targets.get('durations') or [], dtype=float)
+            distances = np.array(sources_to_targets.get('distances') or [], dtype=float)
+
+            if durations.shape == (n, n) and distances.shape == (n, n):
+                routable = np.isfinite(durations) & np.isfinite(distances)
+                found_routes = int(routable.sum())
+                if found_routes < n * n:
+                    missing = np.argwhere(~routable)
+                    logging.warning(f"No route found for {len(missing)} location pairs (e.g. {missing[:5].tolist()}). Assigning large penalty.")
+                time_matrix = np.where(routable, durations, 9999999)
+                distance_matrix = np.where(routable, distances, 9999999)
+            elif durations.size:
+                logging.error(f"Unexpected matrix shape {durations.shape}, expected {(n, n)}")
 
             if found_routes == 0:
                 logging.error("Failed to calculate any routes between locations.")
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+PRIORITIES = ('interactive', 'bulk')
+
+
+class KakaoScheduler:
+    """카카오 API 호출용 우선순위 토큰 버킷
+
+    interactive 대기자가 있으면 bulk는 토큰을 받지 못하고, bulk는 버킷에 interactive_reserve개를
+    남겨둔 상태에서만 토큰을 가져간다. 같은 등급 안에서는 먼저 온 순서대로 처리한다.
+    """
+
+    def __init__(self, rate, burst=None, interactive_reserve=2.0, bucket=None):
+        """bucket(SharedTokenBucket)을 주면 토큰은 워커 프로세스들이 함께 쓰는 버킷에서 가져온다"""
+        self.bucket = bucket
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.interactive_reserve = min(float(interactive_reserve), max(self.capacity - 1.0, 0.0))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._waits = {priority: deque(maxlen=1000) for priority in PRIORITIES}
+        self._granted = {priority: 0 for priority in PRIORITIES}
+        self._timeouts = {priority: 0 for priority in PRIORITIES}
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        if self.bucket is not None:
+            return
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def _can_take(self, priority, ticket):
+        if self._queues[priority][0] is not ticket:
+            return False
+        if priority == 'bulk' and self._queues['interactive']:
+            return False
+        needed = 1.0 + (self.interactive_reserve if priority == 'bulk' else 0.0)
+        if self.bucket is not None:
+            taken, self.tokens = self.bucket.take(needed)
+            return taken
+        if self.tokens < needed:
+            return False
+        self.tokens -= 1.0
+        return True
+
+    def acquire(self, priority='interactive', timeout=None):
+        """토큰 하나를 얻을 때까지 대기. timeout(초) 안에 못 얻으면 False"""
+        if priority not in self._queues:
+            priority = 'bulk'
+        if self.rate <= 0:
+            return True
+
+        ticket = object()
+        started_at = time.monotonic()
+        deadline = None if timeout is None else started_at + timeout
+        with self._cond:
+            self._queues[priority].append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._can_take(priority, ticket):
+                        self._granted[priority] += 1
+                        self._waits[priority].append(now - started_at)
+                        return True
+
+                    if deadline is not None and now >= deadline:
+                        self._timeouts[priority] += 1
+                        return False
+
+                    needed = 1.0 + (self.interactive_reserve if priority == 'bulk' else 0.0)
+                    wait = max((needed - self.tokens) / self.rate, 0.005)
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._queues[priority].remove(ticket)
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            self._refill(time.monotonic())
+            tokens = self.bucket.peek() if self.bucket is not None else self.tokens
+            result = {"rate_per_sec": self.rate, "burst": self.capacity, "tokens": round(tokens, 2),
+                      "interactive_reserve": self.interactive_reserve, "shared": self.bucket is not None}
+            for priority in PRIORITIES:
+                waits = np.array(self._waits[priority])
+                result[priority] = {
+                    "queued": len(self._queues[priority]),
+                    "granted": self._granted[priority],
+                    "timeouts": self._timeouts[priority],
+                    "queue_time_sec": {
+                        "p50": round(float(np.percentile(waits, 50)), 3),
+                        "p95": round(float(np.percentile(waits, 95)), 3),
+                        "max": round(float(waits.max()), 3)
+                    } if waits.size else None
+                }
+        return result
@@ -0,0 +1,179 @@
+import ctypes
+import multiprocessing
+import os
+import queue
+import threading
+
+import numpy as np
+
+LKH_LIBRARY = os.environ.get("LKH_LIBRARY", "/usr/local/lib/liblkh.so")
+LKH_NATIVE = os.environ.get("LKH_NATIVE", "auto").lower()
+LKH_NATIVE_WORKERS = int(os.environ.get("LKH_NATIVE_WORKERS", str(os.cpu_count() or 1)))
+LKH_NATIVE_MAX_SOLVES = int(os.environ.get("LKH_NATIVE_MAX_SOLVES", "500"))
+
+# lkh_wrapper.c가 fopen을 가로채 메모리에서 돌려주는 파일 이름
+PARAMETER_FILE = ":lkh:parameters"
+PROBLEM_FILE = ":lkh:problem"
+INITIAL_TOUR_FILE = ":lkh:initial_tour"
+
+_library = None
+_library_lock = threading.Lock()
+_solve_lock = threading.Lock()
+
+
+def _load_library():
+    global _library
+    with _library_lock:
+        if _library is None:
+            library = ctypes.CDLL(LKH_LIBRARY)
+            library.lkh_solve.argtypes = [
+                ctypes.c_int, ctypes.POINTER(ctypes.c_int), ctypes.c_char_p,
+                ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_longlong)
+            ]
+            library.lkh_solve.restype = ctypes.c_int
+            _library = library
+    return _library
+
+
+def native_available():
+    if LKH_NATIVE in ('false', '0', 'no', 'off'):
+        return False
+    return os.path.exists(LKH_LIBRARY)
+
+
+def native_parameters(runs, time_limit, max_trials, extra_lines=(), initial_tour=None):
+    """메모리 파일 이름을 쓰는 LKH 파라미터 텍스트 (출력 파일 없이 결과는 버퍼로 받는다)"""
+    lines = [
+        "TRACE_LEVEL = 0",
+        f"PROBLEM_FILE = {PROBLEM_FILE}",
+        f"RUNS = {runs}",
+        f"TIME_LIMIT = {time_limit}",
+        f"MAX_TRIALS = {max_trials}",
+    ]
+    lines += list(extra_lines)
+    if initial_tour:
+        lines.append(f"INITIAL_TOUR_FILE = {INITIAL_TOUR_FILE}")
+    return "\n".join(lines) + "\n"
+
+
+def solve_in_process(int_matrix, parameters, initial_tour=None):
+    """현재 프로세스에서 liblkh.so로 풀기. (0부터 시작하는 tour 배열, 비용)
+
+    LKH는 전역 상태를 쓰므로 한 프로세스에서는 한 번에 하나만 푼다.
+    """
+    matrix = np.ascontiguousarray(int_matrix, dtype=np.intc)
+    n = matrix.shape[0]
+    tour = np.empty(n, dtype=np.intc)
+    cost = ctypes.c_longlong(0)
+    initial = np.ascontiguousarray(initial_tour, dtype=np.intc) if initial_tour else None
+
+    library = _load_library()
+    with _solve_lock:
+        status = library.lkh_solve(
+            n, matrix.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), parameters.encode(),
+            initial.ctypes.data_as(ctypes.POINTER(ctypes.c_int)) if initial is not None else None,
+            tour.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), ctypes.byref(cost)
+        )
+    if status != 0:
+        raise RuntimeError(f"lkh_solve failed with status {status}")
+    return tour, int(cost.value)
+
+
+def _worker_main(connection):
+    """워커 프로세스: (행렬, 파라미터, 초기 tour)를 받아 풀고 (결과, 오류)를 돌려준다. None을 받으면 종료"""
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        try:
+            connection.send((solve_in_process(*task), None))
+        except Exception as e:
+            connection.send((None, str(e)))
+
+
+class _Worker:
+    """파이프로 작업을 주고받는 워커 프로세스 하나"""
+
+    def __init__(self, context):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        self.solves = 0
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+            self.process.join(timeout=1)
+        except OSError:
+            pass
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class NativeSolverPool:
+    """liblkh.so를 올린 워커 프로세스 풀
+
+    LKH 전역 상태와 해제되지 않는 메모리 때문에 요청 스레드에서 직접 부르지 않고,
+    워커마다 max_solves번 푼 뒤 새 프로세스로 교체한다. 워커 안에서는 fork/exec나 임시 파일이 없다.
+    timeout은 워커를 받은 뒤의 실행 시간에만 걸리고, 넘기면 그 워커 하나만 죽이고 새로 띄운다.
+    """
+
+    def __init__(self, processes=LKH_NATIVE_WORKERS, max_solves=LKH_NATIVE_MAX_SOLVES):
+        self.processes = max(1, processes)
+        self.max_solves = max_solves or None
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.processes)
+        self._idle = queue.LifoQueue()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _Worker(self._context)
+
+    def _checkin(self, worker):
+        worker.solves += 1
+        if self.max_solves and worker.solves >= self.max_solves:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def solve(self, int_matrix, parameters, initial_tour=None, timeout=None):
+        """(tour, cost). 실패하거나 시간이 넘으면 None (호출 측이 LKH 실행 파일로 대체)"""
+        with self._slots:
+            try:
+                worker = self._checkout()
+            except OSError as e:
+                print(f"Error starting in-process LKH worker: {e}")
+                return None
+            try:
+                worker.connection.send((int_matrix, parameters, initial_tour))
+                finished = worker.connection.poll(timeout)
+                if finished:
+                    result, error = worker.connection.recv()
+            except Exception as e:
+                print(f"Error: in-process LKH worker failed: {e}")
+                worker.kill()
+                return None
+            if not finished:
+                print(f"Error: in-process LKH timed out ({timeout} seconds), killing worker {worker.process.pid}")
+                worker.kill()
+                return None
+            self._checkin(worker)
+
+        if error:
+            print(f"Error running in-process LKH: {error}")
+            return None
+        return result
+
+
+native_solver = NativeSolverPool() if native_available() else None
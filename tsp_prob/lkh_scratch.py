@@ -0,0 +1,73 @@
+import os
+import queue
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+LKH_SCRATCH_DIR = os.environ.get("LKH_SCRATCH_DIR", "/dev/shm/lkh")
+LKH_SCRATCH_SLOTS = int(os.environ.get("LKH_SCRATCH_SLOTS", "8"))
+
+
+def _usable_directory(directory):
+    """directory를 만들 수 없으면 (tmpfs가 없는 환경 등) 시스템 임시 디렉터리 아래로"""
+    try:
+        os.makedirs(directory, exist_ok=True)
+        return directory
+    except OSError:
+        fallback = os.path.join(tempfile.gettempdir(), "lkh")
+        os.makedirs(fallback, exist_ok=True)
+        return fallback
+
+
+class ScratchPool:
+    """미리 만들어 둔 LKH 작업 디렉터리 풀
+
+    요청마다 임시 디렉터리를 만들고 지우는 대신 tmpfs 위의 slot을 빌려 쓰고 비워서 돌려준다.
+    slot이 모두 사용 중이면 같은 위치에 일회용 디렉터리를 만든다.
+    네이티브 솔버(lkh_native)를 쓸 수 없을 때의 LKH 실행 파일 경로에서만 쓰인다.
+
+    후보 집합/Pi 파일(CANDIDATE_FILE/PI_FILE) 재사용은 하지 않는다. 서비스 파라미터(RUNS, MAX_TRIALS,
+    lkh_tuning_lines)로 재어 보면 25~100노드에서 시간 대부분이 시행 탐색이라 재사용해도 차이가 측정 오차 안이었다.
+    """
+
+    def __init__(self, directory=LKH_SCRATCH_DIR, slots=LKH_SCRATCH_SLOTS):
+        self.directory = _usable_directory(directory)
+        self.slots = max(0, slots)
+        self.overflows = 0
+        self._free = queue.Queue()
+        for i in range(self.slots):
+            path = os.path.join(self.directory, f"slot_{i}")
+            os.makedirs(path, exist_ok=True)
+            self._free.put(path)
+
+    @contextmanager
+    def slot(self):
+        try:
+            path, pooled = self._free.get_nowait(), True
+        except queue.Empty:
+            path, pooled = tempfile.mkdtemp(dir=self.directory), False
+            self.overflows += 1
+
+        try:
+            yield path
+        finally:
+            if pooled:
+                for name in os.listdir(path):
+                    try:
+                        os.remove(os.path.join(path, name))
+                    except OSError:
+                        pass
+                self._free.put(path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "slots": self.slots,
+            "free": self._free.qsize(),
+            "overflows": self.overflows
+        }
+
+
+scratch_pool = ScratchPool()
@@ -0,0 +1,200 @@
+#include "LKH.h"
+#include "Genetic.h"
+#include <setjmp.h>
+#include <stdarg.h>
+
+/*
+ * In-process entry point for LKH, built into liblkh.so together with the
+ * LKH sources (everything except LKHmain.c).
+ *
+ * The library is linked with -Wl,--wrap=fopen,--wrap=exit,--wrap=printff:
+ * parameter, problem and initial tour "files" are served from memory
+ * buffers, eprintf()'s exit() jumps back to lkh_solve() instead of killing
+ * the calling process, and progress output is dropped. LKH keeps its state
+ * in globals, so callers must not run two solves in the same process at
+ * once.
+ */
+
+#define MEM_PARAMETERS ":lkh:parameters"
+#define MEM_PROBLEM ":lkh:problem"
+#define MEM_INITIAL_TOUR ":lkh:initial_tour"
+
+FILE *__real_fopen(const char *path, const char *mode);
+void __real_exit(int status);
+
+static char *ParameterText, *ProblemText, *InitialTourText;
+static int Solving;
+static jmp_buf SolveEnv;
+
+FILE *__wrap_fopen(const char *path, const char *mode)
+{
+    char *Text = 0;
+
+    if (path && !strcmp(path, MEM_PARAMETERS))
+        Text = ParameterText;
+    else if (path && !strcmp(path, MEM_PROBLEM))
+        Text = ProblemText;
+    else if (path && !strcmp(path, MEM_INITIAL_TOUR))
+        Text = InitialTourText;
+    else
+        return __real_fopen(path, mode);
+    return Text ? fmemopen(Text, strlen(Text), "r") : 0;
+}
+
+void __wrap_exit(int status)
+{
+    if (Solving)
+        longjmp(SolveEnv, 1);
+    __real_exit(status);
+}
+
+void __wrap_printff(const char *fmt, ...)
+{
+    va_list args;
+
+    if (Solving)
+        return;
+    va_start(args, fmt);
+    vprintf(fmt, args);
+    va_end(args);
+    fflush(stdout);
+}
+
+static char *FormatProblem(int n, const int *Matrix)
+{
+    size_t Size = 256 + (size_t) n * n * 12, Used;
+    char *Text = (char *) malloc(Size);
+    int i, j;
+
+    if (!Text)
+        return 0;
+    Used = snprintf(Text, Size,
+                    "NAME : in_process_%d\nTYPE : TSP\nDIMENSION : %d\n"
+                    "EDGE_WEIGHT_TYPE : EXPLICIT\n"
+                    "EDGE_WEIGHT_FORMAT : FULL_MATRIX\n"
+                    "EDGE_WEIGHT_SECTION\n", n, n);
+    for (i = 0; i < n; i++) {
+        for (j = 0; j < n; j++)
+            Used += snprintf(Text + Used, Size - Used, "%d ",
+                             Matrix[(size_t) i * n + j]);
+        Text[Used - 1] = '\n';
+    }
+    snprintf(Text + Used, Size - Used, "EOF\n");
+    return Text;
+}
+
+static char *FormatInitialTour(int n, const int *Tour)
+{
+    size_t Size = 128 + (size_t) n * 12, Used;
+    char *Text = (char *) malloc(Size);
+    int i;
+
+    if (!Text)
+        return 0;
+    Used = snprintf(Text, Size, "TYPE : TOUR\nDIMENSION : %d\nTOUR_SECTION\n",
+                    n);
+    for (i = 0; i < n; i++)
+        Used += snprintf(Text + Used, Size - Used, "%d\n", Tour[i] + 1);
+    snprintf(Text + Used, Size - Used, "-1\nEOF\n");
+    return Text;
+}
+
+static void FindBestTour(void)
+{
+    GainType Cost, OldOptimum;
+    double LastTime;
+
+    if (Norm != 0 || Penalty) {
+        Norm = 9999;
+        BestCost = PLUS_INFINITY;
+        BestPenalty = CurrentPenalty = PLUS_INFINITY;
+    } else {
+        /* The ascent has solved the problem! */
+        Optimum = BestCost = (GainType) LowerBound;
+        RecordBetterTour();
+        RecordBestTour();
+        CurrentPenalty = PLUS_INFINITY;
+        BestPenalty = CurrentPenalty = Penalty ? Penalty() : 0;
+        Runs = 0;
+    }
+
+    for (Run = 1; Run <= Runs; Run++) {
+        LastTime = GetTime();
+        if (LastTime - StartTime >= TotalTimeLimit) {
+            Run--;
+            break;
+        }
+        Cost = FindTour();
+        if (Run > 1)
+            Cost = MergeTourWithBestTour();
+        if (CurrentPenalty < BestPenalty ||
+            (CurrentPenalty == BestPenalty && Cost < BestCost)) {
+            BestPenalty = CurrentPenalty;
+            BestCost = Cost;
+            RecordBetterTour();
+            RecordBestTour();
+        }
+        OldOptimum = Optimum;
+        if (CurrentPenalty == 0 && Cost < Optimum)
+            Optimum = Cost;
+        if (Optimum < OldOptimum && FirstNode->InputSuc) {
+            Node *N = FirstNode;
+            while ((N = N->InputSuc = N->Suc) != FirstNode);
+        }
+        SRandom(++Seed);
+    }
+}
+
+/*
+ * Solves the symmetric or asymmetric TSP given by the row-major n x n
+ * matrix. Parameters is the text of an LKH parameter file; its
+ * PROBLEM_FILE (and INITIAL_TOUR_FILE, if InitialTour is given) must name
+ * the in-memory files above. On success the 0-based tour is written to
+ * TourOut, its cost to CostOut, and 0 is returned. Returns -1 if LKH
+ * reported an error and -2 if memory ran out.
+ */
+int lkh_solve(int n, const int *Matrix, const char *Parameters,
+              const int *InitialTour, int *TourOut, long long *CostOut)
+{
+    int i, Status = 0;
+
+    ParameterText = strdup(Parameters);
+    ProblemText = FormatProblem(n, Matrix);
+    InitialTourText = InitialTour ? FormatInitialTour(n, InitialTour) : 0;
+    if (!ParameterText || !ProblemText || (InitialTour && !InitialTourText)) {
+        Status = -2;
+        goto Done;
+    }
+
+    Solving = 1;
+    if (setjmp(SolveEnv)) {
+        Status = -1;
+        goto Done;
+    }
+    /* ReadParameters() does not reset these between runs */
+    InitialTourFileName = SubproblemTourFileName = 0;
+    MTSPSolutionFileName = SINTEFSolutionFileName = 0;
+    EdgeFiles = 0;
+    ParameterFileName = MEM_PARAMETERS;
+    ReadParameters();
+    StartTime = GetTime();
+    MaxMatrixDimension = 20000;
+    MergeWithTour = MergeWithTourIPT;
+    ReadProblem();
+    AllocateStructures();
+    CreateCandidateSet();
+    InitializeStatistics();
+    FindBestTour();
+
+    for (i = 0; i < n; i++)
+        TourOut[i] = BestTour[i] - 1;
+    *CostOut = (long long) BestCost;
+
+  Done:
+    Solving = 0;
+    free(ParameterText);
+    free(ProblemText);
+    free(InitialTourText);
+    ParameterText = ProblemText = InitialTourText = 0;
+    return Status;
+}
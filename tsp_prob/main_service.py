@@ -13,6 +13,7 @@ from auth import auth_required, get_current_driver
 
 from get_valhalla_matrix import get_time_distance_matrix
 from get_valhalla_route import get_turn_by_turn_route
+from matrix_codec import post_matrix
 
 logging.basicConfig(
    level=logging.INFO,
@@ -26,6 +27,7 @@ HUB_LOCATION = {"lat": 37.5299, "lon": 126.9648, "name": "용산역"}
 COSTING_MODEL = "auto"
 BACKEND_API_URL = os.environ.get("BACKEND_API_URL", "http://backend:8080")
 LKH_SERVICE_URL = os.environ.get("LKH_SERVICE_URL", "http://lkh:5001/solve")
+LKH_MATRIX_TRANSPORT = os.environ.get("LKH_MATRIX_TRANSPORT", "application/x-npy")
 VALHALLA_HOST = os.environ.get("VALHALLA_HOST", "traffic-proxy")
 VALHALLA_PORT = os.environ.get("VALHALLA_PORT", "8003")
 
@@ -441,10 +443,7 @@ def calculate_optimal_next_destination(locations, current_location):
        time_matrix, _ = get_time_distance_matrix(location_coords, costing=COSTING_MODEL, use_traffic=True)
        
        if time_matrix is not None:
-           response = requests.post(
-               LKH_SERVICE_URL,
-               json={"matrix": time_matrix.tolist()}
-           )
+           response = post_matrix(LKH_SERVICE_URL, time_matrix, transport=LKH_MATRIX_TRANSPORT)
            
            if response.status_code == 200:
                result = response.json()
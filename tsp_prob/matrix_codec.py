@@ -0,0 +1,83 @@
+import io
+import logging
+
+import numpy as np
+import requests
+
+JSON_CONTENT_TYPE = 'application/json'
+NPY_CONTENT_TYPE = 'application/x-npy'
+RAW_CONTENT_TYPE = 'application/octet-stream'
+BINARY_CONTENT_TYPES = (NPY_CONTENT_TYPE, RAW_CONTENT_TYPE)
+
+SHAPE_HEADER = 'X-Matrix-Shape'
+DTYPE_HEADER = 'X-Matrix-Dtype'
+RAW_DTYPES = {'float32': '<f4', 'float64': '<f8', 'int32': '<i4'}
+
+
+class MatrixFormatError(ValueError):
+    pass
+
+
+def encode_matrix(matrix, content_type=NPY_CONTENT_TYPE, dtype='float32'):
+    """행렬 -> (요청 본문, 헤더). npy는 모양/타입이 본문에 들어가고 raw는 헤더로 보낸다"""
+    values = np.ascontiguousarray(matrix, dtype=RAW_DTYPES[dtype])
+    headers = {'Content-Type': content_type}
+    if content_type == NPY_CONTENT_TYPE:
+        buffer = io.BytesIO()
+        np.save(buffer, values, allow_pickle=False)
+        return buffer.getvalue(), headers
+
+    headers[SHAPE_HEADER] = ','.join(str(size) for size in values.shape)
+    headers[DTYPE_HEADER] = dtype
+    return values.tobytes(), headers
+
+
+def decode_matrix(body, content_type, headers=None):
+    """바이너리 본문을 복사 없이 읽기 전용 배열로 (np.frombuffer)"""
+    headers = headers or {}
+    if content_type == NPY_CONTENT_TYPE:
+        stream = io.BytesIO(body)
+        try:
+            version = np.lib.format.read_magic(stream)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+        except ValueError as e:
+            raise MatrixFormatError(f"npy 헤더를 읽을 수 없습니다: {e}")
+        if fortran_order or dtype.hasobject:
+            raise MatrixFormatError("C 순서의 숫자 배열만 지원합니다")
+        offset = stream.tell()
+
+    elif content_type == RAW_CONTENT_TYPE:
+        dtype_name = headers.get(DTYPE_HEADER, 'float32')
+        if dtype_name not in RAW_DTYPES:
+            raise MatrixFormatError(f"지원하지 않는 {DTYPE_HEADER}: {dtype_name}")
+        try:
+            shape = tuple(int(size) for size in headers.get(SHAPE_HEADER, '').split(','))
+        except ValueError:
+            raise MatrixFormatError(f"{SHAPE_HEADER} 헤더가 필요합니다 (예: 25,25)")
+        dtype = np.dtype(RAW_DTYPES[dtype_name])
+        offset = 0
+
+    else:
+        raise MatrixFormatError(f"지원하지 않는 Content-Type: {content_type}")
+
+    if any(size <= 0 for size in shape):
+        raise MatrixFormatError(f"행렬 모양의 각 차원은 양수여야 합니다: {shape}")
+    count = int(np.prod(shape)) if shape else 1
+    if len(body) - offset != count * dtype.itemsize:
+        raise MatrixFormatError(f"본문 크기가 모양 {shape}, 타입 {dtype}과 맞지 않습니다")
+    return np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+
+
+def post_matrix(url, matrix, transport=NPY_CONTENT_TYPE, timeout=None, **options):
+    """행렬을 바이너리로 POST (options는 쿼리 문자열). 서버가 415를 주면 JSON으로 다시 보낸다"""
+    if transport in BINARY_CONTENT_TYPES:
+        body, headers = encode_matrix(matrix, transport)
+        response = requests.post(url, data=body, headers=headers, params=options, timeout=timeout)
+        if response.status_code != 415:
+            return response
+        logging.warning(f"{url}가 바이너리 행렬을 지원하지 않아 JSON으로 재전송")
+
+    return requests.post(url, json=dict(options, matrix=np.asarray(matrix).tolist()), timeout=timeout)
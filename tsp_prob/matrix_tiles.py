@@ -0,0 +1,94 @@
+import logging
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _balanced(n, side):
+    """블록 수는 그대로 두고 마지막 블록만 작아지지 않도록 크기를 고르게 맞춤"""
+    blocks = -(-n // side)
+    return -(-n // blocks)
+
+
+def plan_tiles(n_sources, n_targets, tile_size, max_pairs):
+    """source × target 블록 목록 [(source slice, target slice)]. 블록당 쌍 수는 max_pairs 이하"""
+    if n_sources * n_targets <= min(tile_size * tile_size, max_pairs):
+        return [(slice(0, n_sources), slice(0, n_targets))]
+
+    target_side = max(1, min(n_targets, tile_size))
+    source_side = max(1, min(n_sources, max(tile_size, max_pairs // target_side)))
+    target_side = max(1, min(n_targets, max_pairs // source_side))
+    source_side = _balanced(n_sources, source_side)
+    target_side = _balanced(n_targets, target_side)
+    return [
+        (slice(s, min(s + source_side, n_sources)), slice(t, min(t + target_side, n_targets)))
+        for s in range(0, n_sources, source_side)
+        for t in range(0, n_targets, target_side)
+    ]
+
+
+def run_tiles(tiles, fetch_tile, executor, n_sources, n_targets, retries=2, backoff=0.5):
+    """블록을 병렬로 계산해 (시간, 거리) 행렬로 합친다
+
+    fetch_tile(source slice, target slice) -> (times, distances, meta). 블록마다 따로 재시도하고,
+    끝내 실패한 블록은 NaN으로 남긴다. (times, distances, 첫 성공 meta, 실패 블록 수) 반환
+    """
+    times = np.full((n_sources, n_targets), np.nan)
+    distances = np.full((n_sources, n_targets), np.nan)
+
+    def fetch_with_retry(sources, targets):
+        for attempt in range(retries + 1):
+            try:
+                return fetch_tile(sources, targets)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"매트릭스 블록 재시도 {attempt + 1}/{retries} "
+                               f"(sources {sources.start}-{sources.stop}, targets {targets.start}-{targets.stop}): {e}")
+                time.sleep(backoff * (2 ** attempt))
+
+    meta = None
+    failed = 0
+    futures = {executor.submit(fetch_with_retry, s, t): (s, t) for s, t in tiles}
+    for future in as_completed(futures):
+        sources, targets = futures[future]
+        try:
+            tile_times, tile_distances, tile_meta = future.result()
+        except Exception as e:
+            failed += 1
+            logger.error(f"매트릭스 블록 실패 (sources {sources.start}-{sources.stop}, "
+                         f"targets {targets.start}-{targets.stop}): {e}")
+            continue
+
+        times[sources, targets] = tile_times
+        distances[sources, targets] = tile_distances
+        if meta is None:
+            meta = tile_meta
+
+    return times, distances, meta, failed
+
+
+def miss_blocks(hit, row_fraction=0.5):
+    """캐시 미스 셀을 덮는 (행 인덱스, 열 인덱스) 블록 목록
+
+    미스가 row_fraction 이상인 행은 전체 열과 함께 한 블록으로, 나머지 미스는 해당 행 × 미스 열로 묶는다.
+    새 지점 하나가 추가된 경우 1×N, (N-1)×1 두 요청으로 끝난다.
+    """
+    miss = ~np.asarray(hit, dtype=bool)
+    if not miss.any():
+        return []
+
+    blocks = []
+    full_rows = np.flatnonzero(miss.mean(axis=1) >= row_fraction)
+    if full_rows.size:
+        blocks.append((full_rows, np.arange(miss.shape[1])))
+
+    rest = miss.copy()
+    rest[full_rows] = False
+    rows = np.flatnonzero(rest.any(axis=1))
+    if rows.size:
+        blocks.append((rows, np.flatnonzero(rest.any(axis=0))))
+    return blocks
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class TTLCache:
+    """스레드 안전 LRU + TTL 캐시
+
+    max_items 또는 max_bytes(put 시 넘긴 size 합)를 넘으면 가장 오래 쓰지 않은 항목부터 제거한다.
+    """
+
+    def __init__(self, max_items, ttl, max_bytes=None):
+        self.max_items = int(max_items)
+        self.ttl = float(ttl)
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _get(self, key, now):
+        entry = self._items.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, size = entry
+        if expires_at < now:
+            del self._items[key]
+            self.nbytes -= size
+            self.misses += 1
+            return None
+
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _put(self, key, value, size, expires_at):
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.nbytes -= previous[2]
+        self._items[key] = (value, expires_at, size)
+        self.nbytes += size
+
+    def _evict(self):
+        while self._items and (len(self._items) > self.max_items or
+                               (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+            _, (_, _, size) = self._items.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def get_many(self, keys):
+        """keys 순서대로 값 목록, 없거나 만료된 항목은 None"""
+        now = time.monotonic()
+        with self._lock:
+            return [self._get(key, now) for key in keys]
+
+    def put(self, key, value, size=0, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._put(key, value, size, expires_at)
+            self._evict()
+
+    def put_many(self, items, size=0, ttl=None):
+        """items: (key, value) 목록. 항목마다 같은 size로 계산"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in items:
+                self._put(key, value, size, expires_at)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._items),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "ttl_sec": self.ttl
+        }
+
+
+class MatrixCellCache:
+    """(출발 좌표, 도착 좌표, 요청 조건) 단위의 Valhalla 소요시간/거리 캐시
+
+    좌표는 precision 자리로 반올림해 같은 지점으로 본다. 교통 보정 전 원본 값만 저장한다.
+    """
+
+    CELL_BYTES = 240
+
+    def __init__(self, max_bytes, ttl, precision=5):
+        self.cache = TTLCache(max(1, max_bytes // self.CELL_BYTES), ttl, max_bytes=max_bytes)
+        self.precision = precision
+
+    def location_key(self, location):
+        extra = tuple(sorted((k, str(v)) for k, v in location.items() if k not in ('lat', 'lon')))
+        return (round(float(location['lat']), self.precision), round(float(location['lon']), self.precision)) + extra
+
+    def lookup(self, source_keys, target_keys, context):
+        """(times, distances, hit) 배열. 미스 셀은 NaN"""
+        keys = [(s, t, context) for s in source_keys for t in target_keys]
+        values = self.cache.get_many(keys)
+        shape = (len(source_keys), len(target_keys))
+        hit = np.array([v is not None for v in values], dtype=bool).reshape(shape)
+        cells = np.array([v if v is not None else (np.nan, np.nan) for v in values], dtype=float).reshape(shape + (2,))
+        return cells[..., 0].copy(), cells[..., 1].copy(), hit
+
+    def store(self, source_keys, target_keys, context, times, distances):
+        """경로가 있는(유한한) 셀만 저장. 실패한 블록의 NaN이 캐시되지 않도록 한다"""
+        rows, cols = np.nonzero(np.isfinite(times) & np.isfinite(distances))
+        self.cache.put_many(
+            (((source_keys[i], target_keys[j], context), (float(times[i, j]), float(distances[i, j])))
+             for i, j in zip(rows.tolist(), cols.tolist())),
+            size=self.CELL_BYTES
+        )
+
+    def stats(self):
+        return dict(self.cache.stats(), precision=self.precision)
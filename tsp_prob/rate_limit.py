@@ -0,0 +1,45 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰을 채우고 최대 burst 개까지 모아두는 스레드 안전 토큰 버킷"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens=1.0):
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1.0, deadline=None):
+        """토큰을 얻을 때까지 대기. deadline(monotonic)을 넘기면 False"""
+        if self.rate <= 0:
+            return True
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
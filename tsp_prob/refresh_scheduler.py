@@ -0,0 +1,101 @@
+import threading
+
+import numpy as np
+
+
+class RefreshScheduler:
+    """서비스링크별 갱신 주기를 변동성과 최근 경로 사용 빈도로 조정하는 우선순위 스케줄러
+
+    링크마다 목표 갱신 주기를 min_interval ~ max_interval 사이에서 정하고,
+    (경과 시간 / 목표 주기)가 1 이상인 링크를 밀린 순서대로 예산만큼 골라준다.
+    """
+
+    def __init__(self, link_count, min_interval=120.0, max_interval=1800.0,
+                 hot_half_life=1800.0, volatility_alpha=0.3):
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.hot_half_life = float(hot_half_life)
+        self.volatility_alpha = float(volatility_alpha)
+
+        self.last_fetched = np.zeros(link_count, dtype=np.float64)
+        self.last_speed = np.full(link_count, np.nan, dtype=np.float32)
+        self.volatility = np.zeros(link_count, dtype=np.float32)
+        self.hotness = np.zeros(link_count, dtype=np.float32)
+        self.last_used = np.zeros(link_count, dtype=np.float64)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(self.last_fetched.size)
+
+    def _decayed_hotness(self, now):
+        elapsed = np.maximum(now - self.last_used, 0.0)
+        return self.hotness * np.exp2(-elapsed / self.hot_half_life)
+
+    def record_usage(self, link_idx, now):
+        """경로 응답에 등장한 링크 사용 기록"""
+        link_idx = np.unique(np.asarray(link_idx, dtype=np.int64))
+        if not link_idx.size:
+            return
+        with self._lock:
+            elapsed = np.maximum(now - self.last_used[link_idx], 0.0)
+            self.hotness[link_idx] = self.hotness[link_idx] * np.exp2(-elapsed / self.hot_half_life) + 1.0
+            self.last_used[link_idx] = now
+
+    def record_fetch(self, link_idx, now):
+        with self._lock:
+            self.last_fetched[np.asarray(link_idx, dtype=np.int64)] = now
+
+    def record_observations(self, link_idx, speeds, now):
+        """새 관측값으로 상대 변화량의 지수이동평균(변동성) 갱신"""
+        link_idx = np.asarray(link_idx, dtype=np.int64)
+        speeds = np.asarray(speeds, dtype=np.float32)
+        with self._lock:
+            previous = self.last_speed[link_idx]
+            known = np.isfinite(previous)
+            change = np.abs(speeds - previous) / np.maximum(previous, 1.0)
+            self.volatility[link_idx] = np.where(
+                known,
+                self.volatility[link_idx] * (1 - self.volatility_alpha) + change * self.volatility_alpha,
+                self.volatility[link_idx]
+            )
+            self.last_speed[link_idx] = speeds
+            self.last_fetched[link_idx] = now
+
+    def target_intervals(self, now):
+        hotness = self._decayed_hotness(now)
+        hot_score = np.log1p(hotness)
+        volatility_score = np.minimum(self.volatility / 0.1, 4.0)
+        intervals = self.max_interval / (1.0 + 2.0 * hot_score + volatility_score)
+        return np.clip(intervals, self.min_interval, self.max_interval)
+
+    def due_links(self, now, budget):
+        """갱신이 필요한 링크 인덱스를 밀린 정도 순으로 최대 budget개"""
+        with self._lock:
+            overdue = (now - self.last_fetched) / self.target_intervals(now)
+        due = np.flatnonzero(overdue >= 1.0)
+        if due.size > budget:
+            due = due[np.argsort(-overdue[due], kind='stable')[:budget]]
+        return due
+
+    def stats(self, now):
+        with self._lock:
+            hotness = self._decayed_hotness(now)
+            intervals = self.target_intervals(now)
+            hot = hotness >= 0.5
+            result = {
+                "links": len(self),
+                "hot_links": int(hot.sum()),
+                "volatile_links": int(np.count_nonzero(self.volatility >= 0.1)),
+                "target_interval_sec": {
+                    "min": round(float(intervals.min()), 1) if intervals.size else None,
+                    "median": round(float(np.median(intervals)), 1) if intervals.size else None
+                }
+            }
+            fetched_hot = hot & (self.last_fetched > 0)
+            if fetched_hot.any():
+                ages = now - self.last_fetched[fetched_hot]
+                result['hot_link_age_sec'] = {
+                    "p50": round(float(np.percentile(ages, 50)), 1),
+                    "p90": round(float(np.percentile(ages, 90)), 1)
+                }
+        return result
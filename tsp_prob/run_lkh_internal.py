@@ -1,10 +1,25 @@
 import subprocess
 import os
 import numpy as np
-import tempfile
+
+from lkh_native import native_solver, native_parameters
+from lkh_scratch import scratch_pool
 
 LKH_EXECUTABLE = "/usr/local/bin/LKH"
 
+def lkh_tuning_lines(n):
+    """노드 수에 따른 후보 집합 관련 파라미터 줄"""
+    lines = ["INITIAL_PERIOD = 10", "MAX_CANDIDATES = 5"]
+    if n <= 10:
+        pass
+    elif n <= 30:
+        lines += ["CANDIDATE_SET_TYPE = POPMUSIC", "POPMUSIC_SAMPLE_SIZE = 8", "POPMUSIC_SOLUTIONS = 30",
+                  "POPMUSIC_MAX_NEIGHBORS = 3", "POPMUSIC_TRIALS = 1"]
+    else:
+        lines += ["CANDIDATE_SET_TYPE = POPMUSIC", "POPMUSIC_SAMPLE_SIZE = 10", "POPMUSIC_SOLUTIONS = 50",
+                  "POPMUSIC_MAX_NEIGHBORS = 5", "POPMUSIC_TRIALS = 1", "SUBGRADIENT = YES", "ASCENT_CANDIDATES = 30"]
+    return lines
+
 def solve_tsp_with_lkh(time_matrix, initial_tour=None, runs=5):
     n = time_matrix.shape[0]
     if n == 0:
@@ -35,7 +50,15 @@ def solve_tsp_with_lkh(time_matrix, initial_tour=None, runs=5):
 
     int_time_matrix = np.round(time_matrix).astype(int)
 
-    with tempfile.TemporaryDirectory() as tempdir:
+    if native_solver is not None:
+        parameters = native_parameters(min(runs, 5), time_limit, max_trials, lkh_tuning_lines(n), initial_tour)
+        result = native_solver.solve(int_time_matrix, parameters, initial_tour, timeout=time_limit + 30)
+        if result is not None:
+            tour, cost = result
+            return tour.tolist(), float(cost)
+        print("Warning: in-process LKH failed, falling back to the LKH executable")
+
+    with scratch_pool.slot() as tempdir:
         problem_filename = os.path.join(tempdir, "problem.tsp")
         param_filename = os.path.join(tempdir, "params.par")
         output_filename = os.path.join(tempdir, "output.tour")
@@ -72,25 +95,8 @@ def solve_tsp_with_lkh(time_matrix, initial_tour=None, runs=5):
             f.write(f"TIME_LIMIT = {time_limit}\n")
             f.write(f"MAX_TRIALS = {max_trials}\n")
 
-            f.write("INITIAL_PERIOD = 10\n")
-            f.write("MAX_CANDIDATES = 5\n")
-
-            if n <= 10:
-                pass
-            elif n <= 30:
-                f.write("CANDIDATE_SET_TYPE = POPMUSIC\n")
-                f.write("POPMUSIC_SAMPLE_SIZE = 8\n")
-                f.write("POPMUSIC_SOLUTIONS = 30\n")
-                f.write("POPMUSIC_MAX_NEIGHBORS = 3\n")
-                f.write("POPMUSIC_TRIALS = 1\n")
-            else:
-                f.write("CANDIDATE_SET_TYPE = POPMUSIC\n")
-                f.write("POPMUSIC_SAMPLE_SIZE = 10\n")
-                f.write("POPMUSIC_SOLUTIONS = 50\n")
-                f.write("POPMUSIC_MAX_NEIGHBORS = 5\n")
-                f.write("POPMUSIC_TRIALS = 1\n")
-                f.write("SUBGRADIENT = YES\n")
-                f.write("ASCENT_CANDIDATES = 30\n")
+            for line in lkh_tuning_lines(n):
+                f.write(f"{line}\n")
             
             if initial_tour_filename and initial_tour:
                 f.write(f"INITIAL_TOUR_FILE = {initial_tour_filename}\n")
@@ -0,0 +1,138 @@
+import fcntl
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+
+class HarvesterLock:
+    """여러 워커 프로세스 중 교통 수집을 맡을 하나를 flock으로 선출
+
+    잠금은 프로세스가 살아 있는 동안 유지되고, 프로세스가 죽으면 커널이 풀어주므로
+    다른 워커가 다음 try_acquire()에서 이어받는다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+
+class SharedLinkUsage:
+    """워커들이 경로 응답에 등장한 서비스링크를 세는 공유 카운터 (memmap uint32)
+
+    워커는 increment()만 하고, 수집 프로세스가 collect()로 지난번 이후 늘어난 링크를 가져간다.
+    프로세스 간 잠금 없이 더하므로 동시에 같은 링크를 세면 일부가 빠질 수 있지만 우선순위 용도로는 충분하다.
+    """
+
+    def __init__(self, path, link_count):
+        self.path = path
+        self.counts = None
+        self._seen = np.zeros(link_count, dtype=np.uint32)
+        if not link_count:
+            return
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        expected = link_count * np.dtype('<u4').itemsize
+        # 다른 워커가 이미 memmap으로 연 파일이므로 잘라내지 않는다 (줄어든 부분을 읽으면 SIGBUS).
+        # 잠근 상태에서 모자랄 때만 늘리고, 더 크면 앞부분만 사용한다
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if os.fstat(fd).st_size < expected:
+                os.ftruncate(fd, expected)
+            self.counts = np.memmap(path, dtype='<u4', mode='r+', shape=(link_count,))
+        finally:
+            os.close(fd)
+        self._seen[:] = self.counts
+
+    def increment(self, link_idx):
+        if self.counts is not None and len(link_idx):
+            self.counts[np.unique(np.asarray(link_idx, dtype=np.int64))] += np.uint32(1)
+
+    def collect(self):
+        """지난 collect() 이후 카운트가 늘어난 링크 인덱스"""
+        if self.counts is None:
+            return np.empty(0, dtype=np.int64)
+        current = np.array(self.counts)
+        changed = np.flatnonzero(current != self._seen)
+        self._seen = current
+        return changed
+
+
+class SharedTokenBucket:
+    """여러 워커 프로세스가 함께 쓰는 토큰 버킷 (파일에 남은 토큰과 마지막 갱신 시각, flock으로 보호)
+
+    워커마다 버킷을 따로 두면 한도를 워커 수로 나눠야 하고, 한가한 워커의 몫은 다른 워커가 쓰지 못한다.
+    """
+
+    _FORMAT = '<dd'
+
+    def __init__(self, path, rate, capacity):
+        self.path = path
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        # flock은 같은 프로세스의 스레드끼리는 막아주지 않는다
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < struct.calcsize(self._FORMAT):
+                self._write(self.capacity, time.time())
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self):
+        return struct.unpack(self._FORMAT, os.pread(self._fd, struct.calcsize(self._FORMAT), 0))
+
+    def _write(self, tokens, updated_at):
+        os.pwrite(self._fd, struct.pack(self._FORMAT, tokens, updated_at), 0)
+
+    def _refilled(self, now):
+        tokens, updated_at = self._read()
+        return min(self.capacity, tokens + max(now - updated_at, 0.0) * self.rate)
+
+    def take(self, needed):
+        """토큰이 needed개 이상 남아 있으면 하나를 가져간다. (성공 여부, 남은 토큰)"""
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                tokens = self._refilled(now)
+                taken = tokens >= needed
+                if taken:
+                    tokens -= 1.0
+                self._write(tokens, now)
+                return taken, tokens
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def peek(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            try:
+                return self._refilled(time.time())
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
@@ -0,0 +1,72 @@
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """같은 키로 동시에 들어온 요청은 먼저 온 요청 하나만 실행하고 나머지는 그 결과를 함께 받는다
+
+    결과는 여러 요청이 공유하므로 변경 불가능한 값(bytes, tuple 등)이어야 한다.
+    """
+
+    def __init__(self, wait_timeout=30.0):
+        self.wait_timeout = wait_timeout
+        self.executed = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """(결과, 공유 여부). 대기자가 wait_timeout 안에 결과를 못 받으면 SingleFlightTimeout"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise SingleFlightTimeout(f"동일 요청 대기 시간 초과 ({self.wait_timeout}초)")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._calls)
+        return {
+            "in_flight": in_flight,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "wait_timeout_sec": self.wait_timeout
+        }
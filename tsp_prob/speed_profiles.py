@@ -0,0 +1,269 @@
+import calendar
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KST_OFFSET = 9 * 3600
+BUCKET_SECONDS = 15 * 60
+BUCKETS_PER_DAY = 86400 // BUCKET_SECONDS
+WEEKDAYS = 7
+SLOTS_PER_WEEK = WEEKDAYS * BUCKETS_PER_DAY
+EPOCH_WEEKDAY = 3  # 1970-01-01은 목요일 (월요일 = 0)
+
+
+def time_slots(epochs):
+    """epoch 초(스칼라 또는 배열) -> KST 기준 (요일, 15분 버킷)"""
+    local = np.asarray(epochs, dtype=np.int64) + KST_OFFSET
+    days = np.floor_divide(local, 86400)
+    weekdays = (days + EPOCH_WEEKDAY) % WEEKDAYS
+    buckets = np.floor_divide(local - days * 86400, BUCKET_SECONDS)
+    return weekdays, buckets
+
+
+def parse_local_time(value):
+    """'YYYY-MM-DDTHH:MM' (KST, Valhalla date_time 형식) -> epoch 초. 형식이 다르면 None"""
+    try:
+        return calendar.timegm(time.strptime(value, '%Y-%m-%dT%H:%M')) - KST_OFFSET
+    except (TypeError, ValueError):
+        return None
+
+
+def partition_day(epoch):
+    """history 파티션 디렉터리 이름 (KST 날짜)"""
+    return time.strftime('%Y-%m-%d', time.gmtime(int(epoch) + KST_OFFSET))
+
+
+class SpeedHistory:
+    """수집된 속도 관측값을 날짜별 파티션(npz)에 쌓는 열 기반 기록
+
+    파티션마다 way_ids(int64), speeds(float32), observed_at(uint32) 세 배열을 담고,
+    직전 기록 이후 새로 관측된 way만 저장하므로 같은 관측이 두 번 쌓이지 않는다 (cursor는 재시작해도 유지).
+    기록은 15분 버킷마다 한 번이라 자주 갱신되는 링크도 버킷당 최신 관측 하나만 남는다.
+    """
+
+    STATE_FILE = 'state.json'
+
+    def __init__(self, directory, retention_days=56):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.cursor = 0
+        self.last_bucket = None
+        self.appended_rows = 0
+        self.appended_files = 0
+        self.last_purge_day = None
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.directory, self.STATE_FILE)) as f:
+                state = json.load(f)
+            self.cursor = int(state.get('cursor', 0))
+            self.last_bucket = state.get('last_bucket')
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"교통 히스토리 상태를 읽을 수 없어 처음부터 기록: {e}")
+
+    def _save_state(self):
+        path = os.path.join(self.directory, self.STATE_FILE)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump({'cursor': self.cursor, 'last_bucket': self.last_bucket}, f)
+        os.replace(tmp_path, path)
+
+    def append(self, way_ids, speeds, observed_at, now=None):
+        """cursor 이후 관측된 유효 속도만 파티션 파일로 저장 (같은 15분 버킷에서는 한 번만). 저장한 행 수 반환"""
+        now = time.time() if now is None else now
+        bucket = int(now) // BUCKET_SECONDS
+        if bucket == self.last_bucket:
+            return 0
+
+        observed_at = np.asarray(observed_at, dtype=np.uint32)
+        speeds = np.asarray(speeds, dtype=np.float32)
+        fresh = (observed_at > self.cursor) & np.isfinite(speeds) & (speeds > 0)
+        if not fresh.any():
+            return 0
+
+        directory = os.path.join(self.directory, partition_day(now))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{int(now * 1000)}.npz")
+        tmp_path = f"{path}.tmp.{os.getpid()}.npz"
+        np.savez_compressed(tmp_path, way_ids=np.asarray(way_ids, dtype=np.int64)[fresh],
+                            speeds=speeds[fresh], observed_at=observed_at[fresh])
+        os.replace(tmp_path, path)
+
+        self.cursor = int(observed_at[fresh].max())
+        self.last_bucket = bucket
+        self._save_state()
+        self.appended_rows += int(fresh.sum())
+        self.appended_files += 1
+        self.purge(now)
+        return int(fresh.sum())
+
+    def purge(self, now=None):
+        """retention_days보다 오래된 날짜 파티션 삭제 (하루 한 번)"""
+        now = time.time() if now is None else now
+        today = partition_day(now)
+        if not self.retention_days or self.last_purge_day == today:
+            return 0
+        self.last_purge_day = today
+
+        oldest = partition_day(now - self.retention_days * 86400)
+        removed = 0
+        for name in self.days():
+            if name < oldest:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"교통 히스토리 파티션 {removed}개 삭제 (보존 {self.retention_days}일)")
+        return removed
+
+    def days(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)) and len(name) == 10)
+
+    def load(self, since_day=None):
+        """파티션들을 이어붙인 (way_ids, speeds, observed_at)"""
+        columns = ([], [], [])
+        for day in self.days():
+            if since_day and day < since_day:
+                continue
+            day_dir = os.path.join(self.directory, day)
+            for name in sorted(os.listdir(day_dir)):
+                if not name.endswith('.npz') or '.tmp.' in name:
+                    continue
+                try:
+                    with np.load(os.path.join(day_dir, name)) as part:
+                        columns[0].append(part['way_ids'])
+                        columns[1].append(part['speeds'])
+                        columns[2].append(part['observed_at'])
+                except Exception as e:
+                    logger.warning(f"교통 히스토리 파티션을 읽을 수 없음 ({day}/{name}): {e}")
+
+        if not columns[0]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.uint32)
+        return tuple(np.concatenate(column) for column in columns)
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "days": len(self.days()),
+            "retention_days": self.retention_days,
+            "appended_rows": self.appended_rows,
+            "appended_files": self.appended_files,
+            "cursor": self.cursor,
+            "last_bucket_start": self.last_bucket * BUCKET_SECONDS if self.last_bucket is not None else None
+        }
+
+
+def build_profiles(way_ids, speeds, observed_at, min_samples=3):
+    """관측값을 way별 (요일, 15분 버킷) 평균 속도로 접는다. (정렬된 way_ids, speeds[n, 7, 96], samples[n, 7, 96])
+
+    표본이 min_samples 미만인 칸은 같은 버킷의 평일/주말 평균, 그것도 부족하면 way 전체 평균으로 채운다.
+    """
+    way_ids = np.asarray(way_ids, dtype=np.int64)
+    speeds = np.asarray(speeds, dtype=np.float64)
+    valid = np.isfinite(speeds) & (speeds > 0)
+    way_ids, speeds, observed_at = way_ids[valid], speeds[valid], np.asarray(observed_at)[valid]
+
+    unique_ways, way_index = np.unique(way_ids, return_inverse=True)
+    weekdays, buckets = time_slots(observed_at)
+    flat = way_index * SLOTS_PER_WEEK + weekdays * BUCKETS_PER_DAY + buckets
+
+    shape = (unique_ways.size, WEEKDAYS, BUCKETS_PER_DAY)
+    sums = np.bincount(flat, weights=speeds, minlength=unique_ways.size * SLOTS_PER_WEEK).reshape(shape)
+    counts = np.bincount(flat, minlength=unique_ways.size * SLOTS_PER_WEEK).reshape(shape)
+
+    profile = np.full(shape, np.nan)
+    enough = counts >= min_samples
+    profile[enough] = sums[enough] / counts[enough]
+
+    for days in (slice(0, 5), slice(5, 7)):
+        group_sums = sums[:, days].sum(axis=1, keepdims=True)
+        group_counts = counts[:, days].sum(axis=1, keepdims=True)
+        group_mean = np.divide(group_sums, group_counts, out=np.full(group_sums.shape, np.nan),
+                               where=group_counts >= min_samples)
+        part = profile[:, days]
+        profile[:, days] = np.where(np.isnan(part), group_mean, part)
+
+    total_counts = counts.sum(axis=(1, 2))
+    way_mean = np.divide(sums.sum(axis=(1, 2)), total_counts, out=np.full(unique_ways.size, np.nan),
+                         where=total_counts > 0)
+    profile = np.where(np.isnan(profile), way_mean[:, None, None], profile)
+    return unique_ways, profile.astype(np.float32), np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+
+
+def save_profiles(path, way_ids, speeds, samples, built_at=None, history_days=0):
+    built_at = time.time() if built_at is None else built_at
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}.npz"
+    np.savez(tmp_path, way_ids=way_ids, speeds=speeds.astype(np.float16), samples=samples,
+             built_at=np.float64(built_at), history_days=np.int64(history_days))
+    os.replace(tmp_path, path)
+
+
+class SpeedProfiles:
+    """way별 요일 x 15분 버킷 속도 프로파일 (build_speed_profiles.py 결과)"""
+
+    def __init__(self, way_ids, speeds, samples=None, built_at=0.0, history_days=0, path=None, mtime=0.0):
+        self.way_ids = np.asarray(way_ids, dtype=np.int64)
+        self.speeds = np.asarray(speeds, dtype=np.float32).reshape(-1, WEEKDAYS, BUCKETS_PER_DAY)
+        self.samples = samples
+        self.built_at = float(built_at)
+        self.history_days = int(history_days)
+        self.path = path
+        self.mtime = mtime
+        self.version = int(built_at)
+
+        with np.errstate(all='ignore'):
+            known = np.isfinite(self.speeds).any(axis=0)
+            city = np.full((WEEKDAYS, BUCKETS_PER_DAY), np.nan)
+            if self.way_ids.size:
+                city[known] = np.nanmedian(self.speeds[:, known], axis=0)
+            self.city_speeds = city
+            city_mean = np.nanmean(city) if known.any() else np.nan
+            self.city_factors = np.where(np.isfinite(city), city / city_mean, 1.0) if np.isfinite(city_mean) else np.ones(city.shape)
+
+    def __len__(self):
+        return int(self.way_ids.size)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['way_ids'], data['speeds'], data['samples'], float(data['built_at']),
+                       int(data['history_days']), path=path, mtime=os.path.getmtime(path))
+
+    def lookup(self, way_ids, when):
+        """way id 배열의 when(epoch 초, 스칼라 또는 같은 모양 배열) 시점 예상 속도. 프로파일이 없으면 NaN"""
+        way_ids = np.asarray(way_ids, dtype=np.int64)
+        result = np.full(way_ids.shape, np.nan)
+        if not self.way_ids.size or not way_ids.size:
+            return result
+
+        positions = np.minimum(np.searchsorted(self.way_ids, way_ids), self.way_ids.size - 1)
+        hit = self.way_ids[positions] == way_ids
+        weekdays, buckets = time_slots(np.broadcast_to(np.asarray(when, dtype=np.float64), way_ids.shape))
+        result[hit] = self.speeds[positions[hit], weekdays[hit], buckets[hit]]
+        return result
+
+    def time_factor(self, when):
+        """when 시점 도시 전체 중앙 속도 / 주간 평균 (1보다 작으면 평소보다 막히는 시간대)"""
+        weekday, bucket = time_slots(when)
+        return float(self.city_factors[weekday, bucket])
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "ways": len(self),
+            "built_at": self.built_at,
+            "history_days": self.history_days,
+            "bucket_minutes": BUCKET_SECONDS // 60
+        }
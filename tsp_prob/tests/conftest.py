@@ -0,0 +1,13 @@
+import os
+import sys
+
+# 테스트는 캐시/공유 파일과 실제 valhalla 없이 모듈을 불러온다
+os.environ.setdefault('TRAFFIC_SNAPSHOT_FILE', '')
+os.environ.setdefault('TRAFFIC_SHARED_SNAPSHOT_FILE', '')
+os.environ.setdefault('TRAFFIC_HISTORY_DIR', '')
+os.environ.setdefault('GEOCODE_CACHE_FILE', '')
+os.environ.setdefault('KAKAO_SHARED_BUCKET_FILE', '')
+os.environ.setdefault('VALHALLA_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('LKH_NATIVE', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,49 @@
+import pytest
+import requests
+
+import traffic_proxy
+from traffic_proxy import proxy, geocode_cache
+
+
+
+class FakeResponse:
+    def __init__(self, status_code, documents=()):
+        self.status_code = status_code
+        self._documents = list(documents)
+
+    def json(self):
+        return {"documents": self._documents}
+
+
+def fake_kakao(monkeypatch, address_response, keyword_response):
+    def kakao_request(url, params, priority):
+        response = address_response if url == traffic_proxy.KAKAO_ADDRESS_API else keyword_response
+        if isinstance(response, Exception):
+            raise response
+        return response
+    monkeypatch.setattr(proxy, 'kakao_request', kakao_request)
+
+
+@pytest.mark.parametrize('keyword_response', [
+    FakeResponse(500),
+    requests.ConnectionError("keyword search down"),
+])
+def test_failed_keyword_search_after_empty_address_is_not_cached(monkeypatch, keyword_response):
+    address = f"서울특별시 강남구 없는길 {id(keyword_response)}"
+    fake_kakao(monkeypatch, FakeResponse(200), keyword_response)
+
+    with pytest.raises(Exception):
+        proxy.kakao_lookup(address)
+
+    result = proxy.geocode(address)
+    assert result['source'] == 'fallback'
+    assert geocode_cache.get(address) is None
+
+
+def test_empty_results_from_both_searches_are_cached_as_not_found(monkeypatch):
+    address = "서울특별시 강남구 없는길 0"
+    fake_kakao(monkeypatch, FakeResponse(200), FakeResponse(200))
+
+    assert proxy.kakao_lookup(address) == traffic_proxy.NOT_FOUND
+    assert proxy.geocode(address)['source'] == 'fallback'
+    assert geocode_cache.get(address) == traffic_proxy.NOT_FOUND
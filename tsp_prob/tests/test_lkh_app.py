@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from lkh_app import app
+from matrix_codec import RAW_CONTENT_TYPE, SHAPE_HEADER, DTYPE_HEADER
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def raw_matrix(n):
+    matrix = (np.arange(n * n, dtype=np.float32).reshape(n, n) % 7) + 1
+    np.fill_diagonal(matrix, 0)
+    return matrix.tobytes(), {SHAPE_HEADER: f"{n},{n}", DTYPE_HEADER: 'float32'}
+
+
+@pytest.mark.parametrize('query', ['runs=abc', 'max_trials=1.5', 'time_limit=', 'seed=x'])
+def test_binary_rejects_non_integer_options(client, query):
+    body, headers = raw_matrix(4)
+    response = client.post(f'/solve?{query}', data=body, headers=headers, content_type=RAW_CONTENT_TYPE)
+    assert response.status_code == 400
+    assert 'must be an integer' in response.get_json()['error']
+
+
+def test_json_rejects_non_integer_options(client):
+    response = client.post('/solve', json={'matrix': [[0, 1, 2], [1, 0, 1], [2, 1, 0]], 'runs': 'abc'})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('shape', ['-4,-4', '0,16'])
+def test_binary_rejects_non_positive_shape(client, shape):
+    headers = {SHAPE_HEADER: shape, DTYPE_HEADER: 'float32'}
+    response = client.post('/solve', data=b'\0' * 64, headers=headers, content_type=RAW_CONTENT_TYPE)
+    assert response.status_code == 400
+
+
+def test_binary_accepts_integer_options(client):
+    body, headers = raw_matrix(4)
+    response = client.post('/solve?runs=2&seed=3', data=body, headers=headers, content_type=RAW_CONTENT_TYPE)
+    assert response.status_code == 200
+    assert sorted(response.get_json()['tour']) == [0, 1, 2, 3]
@@ -0,0 +1,65 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from lkh_native import LKH_LIBRARY, NativeSolverPool, native_parameters
+
+pytestmark = pytest.mark.skipif(not os.path.exists(LKH_LIBRARY), reason="liblkh.so가 없음")
+
+
+def random_matrix(n, seed=0):
+    matrix = (np.random.default_rng(seed).random((n, n)) * 10000).astype(np.intc)
+    matrix = matrix + matrix.T
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def small_solve(pool, results, key, timeout):
+    parameters = native_parameters(1, 5, 50)
+    results[key] = pool.solve(random_matrix(20, seed=len(key)), parameters, timeout=timeout)
+
+
+def test_solve_returns_a_tour():
+    pool = NativeSolverPool(processes=1)
+    tour, cost = pool.solve(random_matrix(20), native_parameters(1, 5, 50), timeout=30)
+    assert sorted(tour.tolist()) == list(range(20))
+    assert cost > 0
+
+
+def test_timeout_kills_only_the_stuck_worker():
+    pool = NativeSolverPool(processes=2)
+    pool.solve(random_matrix(20), native_parameters(1, 5, 50), timeout=30)  # 워커 하나를 미리 띄워 둔다
+
+    results = {}
+    other = threading.Thread(target=small_solve, args=(pool, results, "other", 30))
+    slow_parameters = native_parameters(50, 60, 100000)
+    stuck = threading.Thread(target=lambda: results.update(
+        stuck=pool.solve(random_matrix(300, seed=1), slow_parameters, timeout=0.5)))
+    stuck.start()
+    time.sleep(0.1)
+    other.start()
+    stuck.join()
+    other.join()
+
+    assert results["stuck"] is None
+    assert results["other"] is not None
+
+
+def test_queue_wait_does_not_count_against_timeout():
+    pool = NativeSolverPool(processes=1)
+    pool.solve(random_matrix(20), native_parameters(1, 5, 50), timeout=30)
+
+    results = {}
+    busy = threading.Thread(target=lambda: results.update(
+        busy=pool.solve(random_matrix(150, seed=2), native_parameters(3, 2, 100000), timeout=30)))
+    busy.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    small_solve(pool, results, "queued", 1.5)
+    busy.join()
+
+    assert time.monotonic() - started > 1.5
+    assert results["queued"] is not None
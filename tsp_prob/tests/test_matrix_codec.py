@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from matrix_codec import (NPY_CONTENT_TYPE, RAW_CONTENT_TYPE, SHAPE_HEADER, DTYPE_HEADER,
+                          MatrixFormatError, decode_matrix, encode_matrix)
+
+
+def test_npy_round_trip():
+    matrix = np.arange(9, dtype=np.float32).reshape(3, 3)
+    body, headers = encode_matrix(matrix, NPY_CONTENT_TYPE)
+    np.testing.assert_array_equal(decode_matrix(body, NPY_CONTENT_TYPE, headers), matrix)
+
+
+@pytest.mark.parametrize('shape', ['-2,-2', '0,5', '5,0', '0,0'])
+def test_raw_rejects_non_positive_shape(shape):
+    headers = {SHAPE_HEADER: shape, DTYPE_HEADER: 'float32'}
+    with pytest.raises(MatrixFormatError):
+        decode_matrix(b'\0' * 16, RAW_CONTENT_TYPE, headers)
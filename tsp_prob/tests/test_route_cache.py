@@ -0,0 +1,31 @@
+from traffic_proxy import ROUTE_CACHE_EPOCH, route_cache_key, traffic_epoch
+from traffic_snapshot import TrafficSnapshot
+
+ROUTE_REQUEST = {
+    "locations": [{"lat": 37.5665001, "lon": 126.9780001}, {"lat": 37.5172, "lon": 127.0473}],
+    "costing": "auto",
+    "costing_options": {"auto": {"use_live_traffic": True}},
+}
+
+
+def key_for(snapshot):
+    return route_cache_key(ROUTE_REQUEST, traffic_epoch(snapshot), 0)
+
+
+def test_refreshes_within_an_epoch_share_a_key():
+    start = 1_700_000_000 // ROUTE_CACHE_EPOCH * ROUTE_CACHE_EPOCH
+    first = TrafficSnapshot(version=10, built_at=start + 1)
+    refreshed = TrafficSnapshot(version=11, built_at=start + 25)
+    assert key_for(first) == key_for(refreshed)
+
+
+def test_next_epoch_changes_the_key():
+    start = 1_700_000_000 // ROUTE_CACHE_EPOCH * ROUTE_CACHE_EPOCH
+    first = TrafficSnapshot(version=10, built_at=start + 1)
+    later = TrafficSnapshot(version=20, built_at=start + ROUTE_CACHE_EPOCH + 1)
+    assert key_for(first) != key_for(later)
+
+
+def test_locations_are_rounded():
+    moved = dict(ROUTE_REQUEST, locations=[{"lat": 37.5665002, "lon": 126.9780002}, {"lat": 37.5172, "lon": 127.0473}])
+    assert route_cache_key(ROUTE_REQUEST, 1, 0) == route_cache_key(moved, 1, 0)
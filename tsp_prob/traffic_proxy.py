@@ -1,6 +1,10 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 import requests
+import numpy as np
 import json
+import hashlib
+import re
+import functools
 import logging
 import os
 import csv
@@ -8,6 +12,23 @@ import threading
 import time
 import xml.etree.ElementTree as ET
 import urllib.parse
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
+from traffic_snapshot import TrafficSnapshot, road_class_code
+from traffic_store import TrafficStore, save_snapshot_file, open_snapshot_file
+from shared_state import HarvesterLock, SharedLinkUsage, SharedTokenBucket
+from refresh_scheduler import RefreshScheduler
+from valhalla_pool import ValhallaPool
+from matrix_tiles import plan_tiles, run_tiles, miss_blocks
+from proxy_cache import MatrixCellCache, TTLCache
+from single_flight import SingleFlight, SingleFlightTimeout
+from kakao_scheduler import KakaoScheduler
+from valhalla_traffic import ValhallaTrafficWriter
+from speed_profiles import SpeedHistory, SpeedProfiles, parse_local_time, time_slots
+from geocode_cache import GeocodeCache, NOT_FOUND, normalize_address, district_from_address
 
 app = Flask(__name__)
 
@@ -15,29 +36,354 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 VALHALLA_URL = os.environ.get('VALHALLA_URL', 'http://valhalla:8002')
+VALHALLA_URLS = [url.strip() for url in os.environ.get('VALHALLA_URLS', VALHALLA_URL).split(',') if url.strip()]
+VALHALLA_POOL_SIZE = int(os.environ.get('VALHALLA_POOL_SIZE', '32'))
+VALHALLA_CONNECT_TIMEOUT = float(os.environ.get('VALHALLA_CONNECT_TIMEOUT', '3'))
+VALHALLA_HEALTH_INTERVAL = float(os.environ.get('VALHALLA_HEALTH_INTERVAL', '10'))
+VALHALLA_EJECT_AFTER = int(os.environ.get('VALHALLA_EJECT_AFTER', '3'))
+VALHALLA_EJECT_SECONDS = float(os.environ.get('VALHALLA_EJECT_SECONDS', '30'))
+VALHALLA_HEDGE = os.environ.get('VALHALLA_HEDGE', 'false').lower() == 'true'
+VALHALLA_HEDGE_MIN_DELAY = float(os.environ.get('VALHALLA_HEDGE_MIN_DELAY', '0.05'))
+PROXY_STREAM_CHUNK_SIZE = 64 * 1024
+MATRIX_MAX_PAIRS = int(os.environ.get('MATRIX_MAX_PAIRS', '2500'))
+MATRIX_TILE_SIZE = int(os.environ.get('MATRIX_TILE_SIZE', '50'))
+MATRIX_TILE_WORKERS = int(os.environ.get('MATRIX_TILE_WORKERS', '8'))
+MATRIX_TILE_RETRIES = int(os.environ.get('MATRIX_TILE_RETRIES', '2'))
+MATRIX_TILE_TIMEOUT = float(os.environ.get('MATRIX_TILE_TIMEOUT', '30'))
+MATRIX_CACHE_MAX_MB = float(os.environ.get('MATRIX_CACHE_MAX_MB', '64'))
+MATRIX_CACHE_TTL = float(os.environ.get('MATRIX_CACHE_TTL', '3600'))
+MATRIX_CACHE_PRECISION = int(os.environ.get('MATRIX_CACHE_PRECISION', '5'))
+MATRIX_CACHE_REQUEST_KEYS = ('sources', 'targets', 'locations', 'verbose', 'id')
+ROUTE_CACHE_MAX_MB = float(os.environ.get('ROUTE_CACHE_MAX_MB', '32'))
+ROUTE_CACHE_TTL = float(os.environ.get('ROUTE_CACHE_TTL', '300'))
+# 스냅샷 버전은 15~30초마다 바뀌므로 키에는 built_at을 이 간격으로 자른 교통 구간을 쓴다 (구간이 바뀌면 캐시가 비워지는 셈)
+ROUTE_CACHE_EPOCH = float(os.environ.get('ROUTE_CACHE_EPOCH', '300'))
+ROUTE_CACHE_PRECISION = int(os.environ.get('ROUTE_CACHE_PRECISION', '5'))
+ROUTE_CACHE_ADJUSTED = os.environ.get('ROUTE_CACHE_ADJUSTED', 'true').lower() == 'true'
+# 다구간 경로의 구간별 trace_attributes 동시 요청 수 (matrix 블록 요청과 별도 풀)
+TRACE_ATTRIBUTES_WORKERS = int(os.environ.get('TRACE_ATTRIBUTES_WORKERS', '8'))
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.environ.get('SINGLE_FLIGHT_WAIT_TIMEOUT', '60'))
+HOP_BY_HOP_HEADERS = {
+   'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer', 'trailers',
+   'transfer-encoding', 'upgrade', 'host', 'content-length'
+}
 SEOUL_API_KEY = os.environ.get('SEOUL_API_KEY', '7a7a43624a736b7a32385a7a617270')
 MAPPING_FILE = '/data/service_to_osm_mapping.csv'
 
+SEOUL_TRAFFIC_API = "http://openapi.seoul.go.kr:8088"
+TRAFFIC_FETCH_WORKERS = int(os.environ.get('TRAFFIC_FETCH_WORKERS', '16'))
+SEOUL_API_RATE = float(os.environ.get('SEOUL_API_RATE', '50'))
+SEOUL_API_BURST = float(os.environ.get('SEOUL_API_BURST', '20'))
+TRAFFIC_FETCH_RETRIES = int(os.environ.get('TRAFFIC_FETCH_RETRIES', '2'))
+TRAFFIC_RETRY_BACKOFF = float(os.environ.get('TRAFFIC_RETRY_BACKOFF', '0.5'))
+TRAFFIC_CONNECT_TIMEOUT = float(os.environ.get('TRAFFIC_CONNECT_TIMEOUT', '3'))
+TRAFFIC_READ_TIMEOUT = float(os.environ.get('TRAFFIC_READ_TIMEOUT', '5'))
+TRAFFIC_PUBLISH_EVERY_LINKS = int(os.environ.get('TRAFFIC_PUBLISH_EVERY_LINKS', '500'))
+TRAFFIC_PUBLISH_EVERY_SEC = float(os.environ.get('TRAFFIC_PUBLISH_EVERY_SEC', '15'))
+TRAFFIC_TTL = float(os.environ.get('TRAFFIC_TTL', '900'))
+TRAFFIC_DECAY = float(os.environ.get('TRAFFIC_DECAY', '900'))
+TRAFFIC_ADAPTIVE_REFRESH = os.environ.get('TRAFFIC_ADAPTIVE_REFRESH', 'true').lower() == 'true'
+TRAFFIC_SCHEDULER_TICK = float(os.environ.get('TRAFFIC_SCHEDULER_TICK', '30'))
+SEOUL_API_BUDGET_PER_HOUR = int(os.environ.get('SEOUL_API_BUDGET_PER_HOUR', '0'))
+TRAFFIC_MIN_REFRESH_INTERVAL = float(os.environ.get('TRAFFIC_MIN_REFRESH_INTERVAL', '120'))
+TRAFFIC_MAX_REFRESH_INTERVAL = float(os.environ.get('TRAFFIC_MAX_REFRESH_INTERVAL', '900'))
+TRAFFIC_HOT_HALF_LIFE = float(os.environ.get('TRAFFIC_HOT_HALF_LIFE', '1800'))
+TRAFFIC_SNAPSHOT_FILE = os.environ.get('TRAFFIC_SNAPSHOT_FILE', '/cache/traffic_snapshot.bin')
+TRAFFIC_SNAPSHOT_MAX_AGE = float(os.environ.get('TRAFFIC_SNAPSHOT_MAX_AGE', '21600'))
+TRAFFIC_SHARED_SNAPSHOT_FILE = os.environ.get('TRAFFIC_SHARED_SNAPSHOT_FILE', '/dev/shm/traffic_snapshot.bin')
+TRAFFIC_HARVESTER_LOCK = os.environ.get('TRAFFIC_HARVESTER_LOCK', '/dev/shm/traffic_harvester.lock')
+TRAFFIC_SHARED_USAGE_FILE = os.environ.get('TRAFFIC_SHARED_USAGE_FILE', '/dev/shm/traffic_link_usage.bin')
+TRAFFIC_SHARED_POLL_INTERVAL = float(os.environ.get('TRAFFIC_SHARED_POLL_INTERVAL', '1'))
+TRAFFIC_SHARED_ATTACH_RETRIES = max(1, int(os.environ.get('TRAFFIC_SHARED_ATTACH_RETRIES', '5')))
+PROXY_WORKERS = max(1, int(os.environ.get('PROXY_WORKERS', '1')))
+TRAFFIC_HISTORY_DIR = os.environ.get('TRAFFIC_HISTORY_DIR', '/cache/traffic_history')
+TRAFFIC_HISTORY_RETENTION_DAYS = int(os.environ.get('TRAFFIC_HISTORY_RETENTION_DAYS', '56'))
+SPEED_PROFILE_FILE = os.environ.get('SPEED_PROFILE_FILE', '/cache/speed_profiles.npz')
+SPEED_PROFILE_MIN_LEAD = float(os.environ.get('SPEED_PROFILE_MIN_LEAD', '900'))
+VALHALLA_NATIVE_TRAFFIC = os.environ.get('VALHALLA_NATIVE_TRAFFIC', 'auto').lower()
+VALHALLA_TRAFFIC_TAR = os.environ.get('VALHALLA_TRAFFIC_TAR', '/custom_files/traffic.tar')
+VALHALLA_WAYS_EDGES_FILE = os.environ.get('VALHALLA_WAYS_EDGES_FILE', '/custom_files/ways_edges.txt')
+VALHALLA_WAY_EDGES_CACHE = os.environ.get('VALHALLA_WAY_EDGES_CACHE', '/cache/way_edges.npz')
+NATIVE_SPEED_TYPES_WITHOUT_LIVE = ['freeflow', 'constrained', 'predicted']
+
 KAKAO_API_KEY = os.environ.get('KAKAO_API_KEY', 'YOUR_KAKAO_API_KEY_HERE')
 KAKAO_ADDRESS_API = "https://dapi.kakao.com/v2/local/search/address.json"
 KAKAO_KEYWORD_API = "https://dapi.kakao.com/v2/local/search/keyword.json"
+GEOCODE_CACHE_FILE = os.environ.get('GEOCODE_CACHE_FILE', '/cache/geocode.sqlite')
+GEOCODE_CACHE_MEMORY_ITEMS = int(os.environ.get('GEOCODE_CACHE_MEMORY_ITEMS', '50000'))
+GEOCODE_CACHE_TTL = float(os.environ.get('GEOCODE_CACHE_TTL', str(30 * 86400)))
+GEOCODE_NEGATIVE_TTL = float(os.environ.get('GEOCODE_NEGATIVE_TTL', '86400'))
+GEOCODE_PREWARM_FILE = os.environ.get('GEOCODE_PREWARM_FILE', '')
+GEOCODE_BATCH_WORKERS = int(os.environ.get('GEOCODE_BATCH_WORKERS', '8'))
+GEOCODE_BATCH_MAX = int(os.environ.get('GEOCODE_BATCH_MAX', '1000'))
+KAKAO_API_RATE = float(os.environ.get('KAKAO_API_RATE', '20'))
+KAKAO_API_BURST = float(os.environ.get('KAKAO_API_BURST', '10'))
+KAKAO_INTERACTIVE_RESERVE = float(os.environ.get('KAKAO_INTERACTIVE_RESERVE', '2'))
+KAKAO_SHARED_BUCKET_FILE = os.environ.get('KAKAO_SHARED_BUCKET_FILE', '/dev/shm/kakao_bucket.bin')
+KAKAO_QUEUE_TIMEOUT = {
+   'interactive': float(os.environ.get('KAKAO_INTERACTIVE_TIMEOUT', '5')),
+   'bulk': float(os.environ.get('KAKAO_BULK_TIMEOUT', '120'))
+}
+
+NON_DRIVABLE_HIGHWAYS = {'footway', 'cycleway', 'path', 'pedestrian', 'steps', 'busway', 'bridleway', 'construction'}
+STREET_KIND_OTHER, STREET_KIND_ARTERIAL, STREET_KIND_ROAD, STREET_KIND_MINOR = 0, 1, 2, 3
+STREET_KIND_PATTERNS = (
+   (STREET_KIND_ARTERIAL, re.compile('고속도로|순환로|대로')),
+   (STREET_KIND_ROAD, re.compile('로')),
+   (STREET_KIND_MINOR, re.compile('길|동'))
+)
+STREET_AREA_PATTERNS = (
+   (re.compile('강남|테헤란|서초|역삼'), 0.75, '강남권'),
+   (re.compile('종로|을지로|명동|세종대로|중구'), 0.8, '도심'),
+   (re.compile('강변북로|올림픽대로|한강대로'), 1.3, '한강변'),
+   (re.compile('외곽순환|강서|노원|도봉'), 1.15, '외곽')
+)
+
+ROUTE_EDGE_ATTRIBUTES = ["edge.way_id", "edge.length", "edge.speed", "edge.begin_shape_index", "edge.end_shape_index"]
 
-traffic_data = {}
 service_to_osm = {}
 
+valhalla_pool = ValhallaPool(
+   VALHALLA_URLS,
+   pool_size=VALHALLA_POOL_SIZE,
+   connect_timeout=VALHALLA_CONNECT_TIMEOUT,
+   health_interval=VALHALLA_HEALTH_INTERVAL,
+   eject_after=VALHALLA_EJECT_AFTER,
+   eject_seconds=VALHALLA_EJECT_SECONDS,
+   hedge=VALHALLA_HEDGE,
+   hedge_min_delay=VALHALLA_HEDGE_MIN_DELAY
+)
+valhalla_pool.start_health_checks()
+matrix_executor = ThreadPoolExecutor(max_workers=MATRIX_TILE_WORKERS, thread_name_prefix='matrix-tile')
+trace_executor = ThreadPoolExecutor(max_workers=TRACE_ATTRIBUTES_WORKERS, thread_name_prefix='trace-attributes')
+matrix_cache = MatrixCellCache(int(MATRIX_CACHE_MAX_MB * 1024 * 1024), MATRIX_CACHE_TTL,
+                               MATRIX_CACHE_PRECISION) if MATRIX_CACHE_MAX_MB > 0 else None
+request_flights = SingleFlight(SINGLE_FLIGHT_WAIT_TIMEOUT)
+geocode_cache = GeocodeCache(GEOCODE_CACHE_FILE, GEOCODE_CACHE_MEMORY_ITEMS, GEOCODE_CACHE_TTL, GEOCODE_NEGATIVE_TTL)
+
+def create_kakao_scheduler():
+   """워커가 여럿이면 카카오 한도 전체를 공유 버킷 하나로 함께 쓴다. 공유 파일을 열 수 없으면 워커 수로 나눈 독립 버킷"""
+   if PROXY_WORKERS > 1 and KAKAO_SHARED_BUCKET_FILE:
+       try:
+           bucket = SharedTokenBucket(KAKAO_SHARED_BUCKET_FILE, KAKAO_API_RATE, KAKAO_API_BURST)
+           return KakaoScheduler(KAKAO_API_RATE, KAKAO_API_BURST, KAKAO_INTERACTIVE_RESERVE, bucket=bucket)
+       except OSError as e:
+           logger.error(f"카카오 공유 버킷을 열 수 없어 한도를 워커 수로 나눠 사용: {e}")
+   return KakaoScheduler(KAKAO_API_RATE / PROXY_WORKERS, max(1.0, KAKAO_API_BURST / PROXY_WORKERS),
+                         KAKAO_INTERACTIVE_RESERVE)
+
+kakao_scheduler = create_kakao_scheduler()
+geocode_executor = ThreadPoolExecutor(max_workers=GEOCODE_BATCH_WORKERS, thread_name_prefix='geocode')
+route_cache = TTLCache(100000, min(ROUTE_CACHE_TTL, ROUTE_CACHE_EPOCH),
+                       max_bytes=int(ROUTE_CACHE_MAX_MB * 1024 * 1024)) if ROUTE_CACHE_MAX_MB > 0 else None
+
+class UpstreamError(Exception):
+   """Valhalla가 오류 응답을 돌려준 경우. 응답을 그대로 클라이언트에 전달한다"""
+   def __init__(self, response):
+       super().__init__(f"Valhalla {response.status_code}")
+       self.response = response
+
+def valhalla_request(method, path, read_timeout, hedge=False, **kwargs):
+   """Valhalla 백엔드 풀로 요청. hedge=True인 멱등 요청만 VALHALLA_HEDGE 설정에 따라 중복 전송"""
+   return valhalla_pool.request(method, path, read_timeout, hedge=hedge and valhalla_pool.hedge, **kwargs)
+
+def filter_headers(headers, drop=()):
+   """hop-by-hop 헤더와 Host/Content-Length를 제외하고 전달할 헤더만 남긴다"""
+   connection_tokens = {token.strip().lower() for token in headers.get('Connection', '').split(',') if token.strip()}
+   excluded = HOP_BY_HOP_HEADERS | connection_tokens | {name.lower() for name in drop}
+   return [(name, value) for name, value in headers.items() if name.lower() not in excluded]
+
+def upstream_response(response):
+   """버퍼링된 upstream 응답을 그대로 돌려줄 때 사용. requests가 이미 압축을 풀었으므로 Content-Encoding 제외"""
+   return response.content, response.status_code, filter_headers(response.headers, drop=('content-encoding',))
+
+def matrix_result_to_arrays(valhalla_result):
+   """Valhalla 매트릭스 응답(concise/verbose 모두)을 (시간, 거리) float 배열로 변환. 경로 없음은 NaN"""
+   sources_to_targets = valhalla_result.get('sources_to_targets') or []
+
+   if isinstance(sources_to_targets, dict):
+       times = np.array(sources_to_targets.get('durations') or [], dtype=float)
+       distances = np.array(sources_to_targets.get('distances') or [], dtype=float)
+       return times, distances
+
+   times = np.array([[c.get('time') if c else None for c in row or []] for row in sources_to_targets], dtype=float)
+   distances = np.array([[c.get('distance') if c else None for c in row or []] for row in sources_to_targets], dtype=float)
+   return times, distances
+
+def matrix_tile_fetcher(base_request, sources, targets):
+   """원 요청의 sources/targets 일부만 담아 Valhalla에 보내는 블록 요청 함수"""
+   def fetch(source_slice, target_slice):
+       tile_request = dict(base_request, sources=sources[source_slice], targets=targets[target_slice], verbose=False)
+       tile_request.pop('locations', None)
+       response = valhalla_request('POST', 'sources_to_targets', read_timeout=MATRIX_TILE_TIMEOUT, hedge=True,
+                                   json=tile_request)
+       if response.status_code != 200:
+           raise RuntimeError(f"Valhalla {response.status_code}: {response.text[:200]}")
+
+       tile_result = response.json()
+       times, distances = matrix_result_to_arrays(tile_result)
+       meta = {k: v for k, v in tile_result.items() if k not in ('sources_to_targets', 'sources', 'targets')}
+       return times, distances, meta
+   return fetch
+
+def compute_matrix(base_request, sources, targets):
+   """sources × targets 원본 (시간, 거리) 행렬. 큰 요청은 블록으로 나눠 병렬 계산
+
+   (times, distances, meta, 블록 수, 실패 블록 수) 반환. 단일 요청이 오류면 UpstreamError
+   """
+   tiles = plan_tiles(len(sources), len(targets), MATRIX_TILE_SIZE, MATRIX_MAX_PAIRS)
+
+   if len(tiles) == 1:
+       upstream_request = dict(base_request, sources=sources, targets=targets, verbose=False)
+       upstream_request.pop('locations', None)
+       response = valhalla_request('POST', 'sources_to_targets', read_timeout=60, hedge=True, json=upstream_request)
+       if response.status_code != 200:
+           raise UpstreamError(response)
+
+       valhalla_result = response.json()
+       times, distances = matrix_result_to_arrays(valhalla_result)
+       meta = {k: v for k, v in valhalla_result.items() if k not in ('sources_to_targets', 'sources', 'targets')}
+       return times, distances, meta, 1, 0
+
+   started_at = time.time()
+   times, distances, meta, failed = run_tiles(
+       tiles, matrix_tile_fetcher(base_request, sources, targets), matrix_executor,
+       len(sources), len(targets), retries=MATRIX_TILE_RETRIES, backoff=TRAFFIC_RETRY_BACKOFF
+   )
+   logger.info(f"Matrix 블록 분할 계산: {len(sources)}x{len(targets)}, 블록 {len(tiles)}개, "
+               f"실패 {failed}개, 소요 {time.time() - started_at:.1f}초")
+   return times, distances, meta, len(tiles), failed
+
+def matrix_cache_context(base_request, upstream_version):
+   """좌표를 제외한 요청 조건 키. use_live_traffic은 프록시가 나중에 적용하므로 제외"""
+   context = {k: v for k, v in base_request.items() if k not in MATRIX_CACHE_REQUEST_KEYS}
+   costing = context.get('costing', 'auto')
+   costing_options = dict(context.get('costing_options') or {})
+   if isinstance(costing_options.get(costing), dict):
+       costing_options[costing] = {k: v for k, v in costing_options[costing].items() if k != 'use_live_traffic'}
+   context['costing_options'] = costing_options
+   return (json.dumps(context, sort_keys=True, ensure_ascii=False), upstream_version)
+
+def traffic_epoch(snapshot):
+   """route 캐시 키용 교통 구간: snapshot.built_at을 ROUTE_CACHE_EPOCH초 단위로 자른 값"""
+   return int(snapshot.built_at // ROUTE_CACHE_EPOCH) if snapshot.built_at else 0
+
+def route_cache_key(route_request, traffic_version, upstream_version):
+   """좌표를 반올림한 요청 본문 + 교통 구간의 해시"""
+   normalized = dict(route_request)
+   normalized['locations'] = [
+       dict(location, lat=round(float(location['lat']), ROUTE_CACHE_PRECISION),
+            lon=round(float(location['lon']), ROUTE_CACHE_PRECISION))
+       for location in route_request.get('locations') or []
+   ]
+   payload = json.dumps([normalized, traffic_version, upstream_version], sort_keys=True, ensure_ascii=False)
+   return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+@functools.lru_cache(maxsize=8192)
+def classify_street(street_names):
+   """street_names 튜플 -> (도로 종류 코드, 지역 계수, 지역 이름). 도로명별로 한 번만 계산"""
+   street_text = ' '.join(street_names).lower()
+   kind = next((code for code, pattern in STREET_KIND_PATTERNS if pattern.search(street_text)), STREET_KIND_OTHER)
+   area_factor, area_name = next(((factor, name) for pattern, factor, name in STREET_AREA_PATTERNS
+                                  if pattern.search(street_text)), (1.0, '일반'))
+   return kind, area_factor, area_name
+
+def heuristic_segment_speeds(lengths, kinds, area_factors, condition_factor, time_factor):
+   """구간 길이/도로 종류/지역 계수 배열 -> 추정 속도(km/h) 배열"""
+   base_speeds = np.select([lengths >= 1.5, lengths >= 0.5], [50.0, 35.0], default=25.0)
+   base_speeds = np.where(kinds == STREET_KIND_ARTERIAL, np.maximum(base_speeds, 40.0), base_speeds)
+   base_speeds = np.where(kinds == STREET_KIND_ROAD, np.maximum(base_speeds, 30.0), base_speeds)
+   base_speeds = np.where(kinds == STREET_KIND_MINOR, np.minimum(base_speeds, 30.0), base_speeds)
+   return np.clip(base_speeds * condition_factor * area_factors * time_factor, 8, 80)
+
+def requested_departure(route_request):
+   """Valhalla date_time(type 1 출발/2 도착, value 'YYYY-MM-DDTHH:MM')의 epoch 초. 현재 시각 요청이면 None"""
+   date_time = route_request.get('date_time') or {}
+   if date_time.get('type') not in (1, 2):
+       return None
+   return parse_local_time(date_time.get('value'))
+
+def json_bytes(value):
+   return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+def array_to_json_list(values):
+   values = np.asarray(values, dtype=object)
+   values[values != values] = None
+   return values.tolist()
+
+# 셀 종류: 0 경로 있음, 1 교통 반영, 2 경로 없음. 행 번호는 행마다 {row}를 바꿔 넣는다
+VERBOSE_CELL_FORMATS = (
+   '{{"from_index": {{row}}, "to_index": {col}, "time": %r, "distance": %r}}',
+   '{{"from_index": {{row}}, "to_index": {col}, "time": %r, "distance": %r, "original_time": %r, '
+   '"traffic_applied": true, "applied_speed": %r}}',
+   '{{"from_index": {{row}}, "to_index": {col}, "time": null, "distance": null}}',
+)
+# 셀 종류별로 포맷에 들어가는 값 (time, distance, original_time, applied_speed)
+VERBOSE_CELL_FIELDS = np.array([
+   [True, True, False, False],
+   [True, True, True, True],
+   [False, False, False, False],
+])
+
+def verbose_matrix_json(times, distances, original_times=None, applied=None, speeds=None):
+   """verbose 매트릭스(셀 dict 목록)를 JSON bytes로. 셀마다 dict를 만들지 않고 행마다 % 포맷 한 번으로 직렬화한다"""
+   rows, cols = times.shape
+   values = np.zeros((rows, cols, 4))
+   values[:, :, 0] = times
+   values[:, :, 1] = distances
+   if applied is not None:
+       values[:, :, 2] = original_times
+       values[:, :, 3] = speeds
+
+   kind = np.zeros((rows, cols), dtype=np.intp)
+   if applied is not None:
+       kind[applied] = 1
+   kind[~(np.isfinite(times) & np.isfinite(distances))] = 2
+   templates = np.array([[cell.format(col=j) for j in range(cols)] for cell in VERBOSE_CELL_FORMATS])
+   formats = templates[kind, np.arange(cols)].tolist()
+   fields = VERBOSE_CELL_FIELDS[kind]
+
+   lines = []
+   for i in range(rows):
+       row_format = ('[' + ', '.join(formats[i]) + ']').replace('{row}', str(i))
+       lines.append(row_format % tuple(values[i][fields[i]].tolist()))
+   return ('[' + ', '.join(lines) + ']').encode('utf-8')
+
 class TrafficProxy:
    def __init__(self):
+       self.store = TrafficStore([])
+       self.build_link_index([])
        self.load_mappings()
        self.traffic_update_interval = int(os.environ.get('TRAFFIC_UPDATE_INTERVAL', '300'))
-       self.api_delay = 0.05
-       
-       self.start_traffic_updater()
+       self.traffic_pass_deadline = float(os.environ.get('TRAFFIC_PASS_DEADLINE', self.traffic_update_interval * 0.8))
+       self.last_pass_stats = {}
+       self.snapshot = TrafficSnapshot()
+       self.upstream_traffic_version = 0
+       self.native_traffic = None
+       self.native_traffic_error = None
+       self.speed_history = SpeedHistory(TRAFFIC_HISTORY_DIR, TRAFFIC_HISTORY_RETENTION_DAYS) if TRAFFIC_HISTORY_DIR else None
+       self.speed_profiles = None
+       self.predicted_snapshots = {}
+       self.role = None
+       self.shared_snapshot_key = None
+       self.shared_usage = None
+       self.harvester_lock = HarvesterLock(TRAFFIC_HARVESTER_LOCK) if TRAFFIC_SHARED_SNAPSHOT_FILE else None
+
+       self.seoul_rate_limiter = TokenBucket(SEOUL_API_RATE, SEOUL_API_BURST)
+       self.seoul_session = requests.Session()
+       adapter = HTTPAdapter(pool_connections=1, pool_maxsize=TRAFFIC_FETCH_WORKERS, max_retries=0)
+       self.seoul_session.mount('http://', adapter)
+       self.seoul_session.mount('https://', adapter)
+
+       self.reload_speed_profiles()
+       self.start_role()
    
    def load_mappings(self):
        try:
            if os.path.exists(MAPPING_FILE):
                with open(MAPPING_FILE, 'r', encoding='utf-8') as f:
                    reader = csv.DictReader(f)
+                   rows = []
                    success_count = 0
                    error_count = 0
                    
@@ -57,9 +403,18 @@ class TrafficProxy:
                                continue
 
                            osm_way_id_float = float(osm_way_id_str)
-                           osm_id = str(int(osm_way_id_float))
-                           
-                           service_to_osm[service_id] = osm_id
+                           osm_id = int(osm_way_id_float)
+                           highway = str(row.get('osm_highway') or '').strip()
+
+                           if highway in NON_DRIVABLE_HIGHWAYS:
+                               logger.debug(f"행 {row_num}: 차량 통행 불가 도로({highway}) 스킵")
+                               error_count += 1
+                               continue
+
+                           distance = float(row.get('distance') or 0.0)
+                           weight = 1.0 / (1.0 + max(distance, 0.0))
+
+                           rows.append((service_id, osm_id, weight, highway))
                            success_count += 1
                            
                        except (ValueError, TypeError) as e:
@@ -71,221 +426,619 @@ class TrafficProxy:
                            error_count += 1
                            continue
                    
+               self.build_link_index(rows)
                logger.info(f"매핑 로드 완료: 성공 {success_count}개, 실패 {error_count}개")
-               logger.info(f"유효한 매핑: {len(service_to_osm)}개")
+               logger.info(f"유효한 매핑: 서비스링크 {len(service_to_osm)}개 -> OSM way {len(self.store)}개 "
+                           f"(저장소 {self.store.nbytes / 1024:.0f}KB)")
            else:
                logger.error(f"매핑 파일을 찾을 수 없습니다: {MAPPING_FILE}")
        except Exception as e:
            logger.error(f"매핑 파일 읽기 오류: {e}")
            logger.info(f"현재 로드된 매핑: {len(service_to_osm)}개")
    
-   def fetch_traffic_data(self):
-       global traffic_data
-       logger.info("실시간 교통 데이터 수집 시작...")
+   def fetch_link_speed(self, service_link, deadline):
+       url = f"{SEOUL_TRAFFIC_API}/{SEOUL_API_KEY}/xml/TrafficInfo/1/1/{service_link}"
+
+       for attempt in range(TRAFFIC_FETCH_RETRIES + 1):
+           if time.monotonic() >= deadline:
+               return None
+           if not self.seoul_rate_limiter.acquire(deadline=deadline):
+               return None
 
-       new_traffic_data = {}
-       
-       service_links = list(service_to_osm.keys())
-       total_links = len(service_links)
-       logger.info(f"총 서비스링크 수: {total_links}개")
-       
-       success_count = 0
-       fail_count = 0
-       
-       for i, service_link in enumerate(service_links):
            try:
-               url = f"http://openapi.seoul.go.kr:8088/{SEOUL_API_KEY}/xml/TrafficInfo/1/1/{service_link}"
-               response = requests.get(url, timeout=5)
-               
+               response = self.seoul_session.get(url, timeout=(TRAFFIC_CONNECT_TIMEOUT, TRAFFIC_READ_TIMEOUT))
+
                if response.status_code == 200:
                    root = ET.fromstring(response.text)
 
                    result = root.find('RESULT/CODE')
-                   if result is not None and result.text == 'INFO-000':
-                       row = root.find('row')
-                       if row is not None:
-                           link_id_elem = row.find('link_id')
-                           prcs_spd_elem = row.find('prcs_spd')
-                           
-                           if link_id_elem is not None and prcs_spd_elem is not None:
-                               link_id = str(link_id_elem.text)
-                               speed = float(prcs_spd_elem.text)
-
-                               if link_id in service_to_osm:
-                                   osm_id = service_to_osm[link_id]
-                                   new_traffic_data[osm_id] = speed
-                                   success_count += 1
-                                   if success_count % 100 == 0:
-                                       logger.info(f"수집 중... {success_count}개 완료")
-
-               time.sleep(self.api_delay)
-               
-           except Exception as e:
-               fail_count += 1
-               continue
-           
-           if (i + 1) % 500 == 0:
-               logger.info(f"진행률: {i+1}/{total_links} ({(i+1)/total_links*100:.1f}%)")
-
-       traffic_data = new_traffic_data
-       logger.info(f"교통 데이터 수집 완료: {len(traffic_data)}개 (성공: {success_count}, 실패: {fail_count})")
-
-       if traffic_data:
-           speeds = list(traffic_data.values())
-           avg_speed = sum(speeds) / len(speeds)
-           min_speed = min(speeds)
-           max_speed = max(speeds)
-           logger.info(f"교통 속도 분포: 평균 {avg_speed:.1f}km/h, 최소 {min_speed:.1f}km/h, 최대 {max_speed:.1f}km/h")
-   
-   def find_real_speed_for_segment(self, maneuver):
-       """현실적인 실시간 교통 적용 - 5000개 데이터 활용"""
-       
-       if not traffic_data:
-           return None
-       
-       street_names = maneuver.get('street_names', [])
-       segment_length = maneuver.get('length', 0)
+                   if result is None or result.text != 'INFO-000':
+                       return None
 
-       current_speeds = [s for s in traffic_data.values() if 10 <= s <= 80]
-       if not current_speeds:
-           return None
+                   row = root.find('row')
+                   if row is None:
+                       return None
 
-       avg_speed = sum(current_speeds) / len(current_speeds)
-       slow_count = len([s for s in current_speeds if s < 25])
-       fast_count = len([s for s in current_speeds if s > 50])
-       total_count = len(current_speeds)
-       
-       congestion_ratio = slow_count / total_count
-       smooth_ratio = fast_count / total_count
-
-       if congestion_ratio > 0.5:
-           traffic_condition = '혼잡'
-           condition_factor = 0.7
-       elif congestion_ratio > 0.3:
-           traffic_condition = '보통'
-           condition_factor = 0.85
+                   link_id_elem = row.find('link_id')
+                   prcs_spd_elem = row.find('prcs_spd')
+                   if link_id_elem is None or prcs_spd_elem is None:
+                       return None
+
+                   return str(link_id_elem.text), float(prcs_spd_elem.text)
+
+               if response.status_code < 500 and response.status_code != 429:
+                   return None
+
+           except (requests.RequestException, ET.ParseError) as e:
+               logger.debug(f"서비스링크 {service_link} 요청 실패 (시도 {attempt + 1}): {e}")
+           except (ValueError, TypeError):
+               return None
+
+           if attempt < TRAFFIC_FETCH_RETRIES:
+               backoff = TRAFFIC_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+               if time.monotonic() + backoff >= deadline:
+                   return None
+               time.sleep(backoff)
+
+       return None
+
+   def build_link_index(self, rows):
+       """(service_link_id, osm_way_id, weight, highway) 행으로 서비스링크 -> way 배열 인덱스 구성"""
+       service_to_osm.clear()
+       for service_id, osm_id, weight, _ in rows:
+           service_to_osm.setdefault(service_id, []).append((osm_id, weight))
+
+       self.service_links = sorted(service_to_osm)
+       self.link_positions = {link_id: i for i, link_id in enumerate(self.service_links)}
+       self.store = TrafficStore([osm_id for _, osm_id, _, _ in rows])
+
+       way_positions, _ = self.store.positions([osm_id for _, osm_id, _, _ in rows])
+       self.mapping_links = np.array([self.link_positions[service_id] for service_id, _, _, _ in rows], dtype=np.int64)
+       self.mapping_ways = way_positions
+       self.mapping_weights = np.array([weight for _, _, weight, _ in rows], dtype=np.float64)
+
+       self.way_classes = np.zeros(len(self.store), dtype=np.uint8)
+       self.way_classes[way_positions] = [road_class_code(highway) for _, _, _, highway in rows]
+
+       self.link_speeds = np.full(len(self.service_links), np.nan, dtype=np.float32)
+       self.scheduler = RefreshScheduler(len(self.service_links), TRAFFIC_MIN_REFRESH_INTERVAL,
+                                         TRAFFIC_MAX_REFRESH_INTERVAL, TRAFFIC_HOT_HALF_LIFE)
+
+   def write_link_speeds(self, link_speeds, observed_at=None):
+       """서비스링크 속도를 매핑된 모든 OSM way에 매칭 품질 가중 평균으로 분배해 백 버퍼에 기록"""
+       if not link_speeds:
+           return 0
+
+       observed_at = int(time.time() if observed_at is None else observed_at)
+       link_idx = np.fromiter((self.link_positions[link_id] for link_id in link_speeds), dtype=np.int64, count=len(link_speeds))
+       self.link_speeds[link_idx] = np.fromiter(link_speeds.values(), dtype=np.float32, count=len(link_speeds))
+       self.scheduler.record_observations(link_idx, self.link_speeds[link_idx], observed_at)
+
+       row_speeds = self.link_speeds[self.mapping_links].astype(np.float64)
+       known = np.isfinite(row_speeds)
+       way_count = len(self.store)
+       speed_sums = np.bincount(self.mapping_ways[known], weights=row_speeds[known] * self.mapping_weights[known], minlength=way_count)
+       weight_sums = np.bincount(self.mapping_ways[known], weights=self.mapping_weights[known], minlength=way_count)
+
+       touched = np.zeros(way_count, dtype=bool)
+       touched[self.mapping_ways[np.isin(self.mapping_links, link_idx)]] = True
+       touched &= weight_sums > 0
+
+       positions = np.flatnonzero(touched)
+       self.store.write(positions, speed_sums[positions] / weight_sums[positions], observed_at)
+       return int(positions.size)
+
+   def record_route_usage(self, way_ids):
+       """응답한 경로의 way를 서비스링크로 되돌려 갱신 스케줄러에 사용 기록"""
+       positions, hit = self.store.positions(way_ids)
+       if not hit.any():
+           return
+       used = np.zeros(len(self.store), dtype=bool)
+       used[positions[hit]] = True
+       links = self.mapping_links[used[self.mapping_ways]]
+       if self.role == 'follower' and self.shared_usage is not None:
+           self.shared_usage.increment(links)
        else:
-           traffic_condition = '원활'
-           condition_factor = 1.1
+           self.scheduler.record_usage(links, time.time())
 
-       street_text = ' '.join(street_names).lower()
+   def refresh_budget(self):
+       """스케줄러 한 번에 쓸 수 있는 서울시 API 요청 수"""
+       per_hour = SEOUL_API_BUDGET_PER_HOUR or len(self.service_links) * 3600 / max(self.traffic_update_interval, 1)
+       return max(1, int(per_hour * TRAFFIC_SCHEDULER_TICK / 3600))
 
-       
-       if segment_length >= 1.5:
-           road_class = 'highway'
-           base_speed = 50
-       elif segment_length >= 0.5:
-           road_class = 'major'
-           base_speed = 35
+   def publish_snapshot(self, version=None, built_at=None, source='live'):
+       speeds, observed_at, baseline = self.store.publish()
+       if self.speed_profiles is not None:
+           expected = self.speed_profiles.lookup(self.store.way_ids, time.time() if built_at is None else built_at)
+           baseline = np.where(np.isfinite(expected), expected, baseline).astype(np.float32)
+       snapshot = TrafficSnapshot.build(self.store.way_ids, speeds, observed_at,
+                                        version=self.snapshot.version + 1 if version is None else version,
+                                        built_at=built_at, way_classes=self.way_classes, source=source,
+                                        baseline=baseline, ttl=TRAFFIC_TTL, decay=TRAFFIC_DECAY)
+       self.snapshot = snapshot
+       self.write_native_traffic(snapshot)
+       self.share_snapshot(snapshot)
+       return snapshot
+
+   def start_role(self):
+       """공유 메모리 모드면 flock으로 수집 프로세스 하나를 선출하고, 나머지 워커는 공유 스냅샷만 읽는다"""
+       if self.harvester_lock is None:
+           self.become_harvester()
+           return
+
+       elected = False
+       for attempt in range(1, TRAFFIC_SHARED_ATTACH_RETRIES + 1):
+           try:
+               self.attach_shared_usage()
+               elected = self.harvester_lock.try_acquire()
+               break
+           except Exception as e:
+               logger.warning(f"공유 메모리 연결 실패 ({attempt}/{TRAFFIC_SHARED_ATTACH_RETRIES}): {e}")
+               time.sleep(TRAFFIC_SHARED_POLL_INTERVAL)
        else:
-           road_class = 'local'
-           base_speed = 25
-
-       if any(keyword in street_text for keyword in ['고속도로', '순환로', '대로']):
-           if road_class == 'local':
-               road_class = 'major'
-           base_speed = max(base_speed, 40)
-       elif any(keyword in street_text for keyword in ['로']):
-           base_speed = max(base_speed, 30)
-       elif any(keyword in street_text for keyword in ['길', '동']):
-           base_speed = min(base_speed, 30)
-
-       area_factor = 1.0
-       area_name = '일반'
-       
-       if any(keyword in street_text for keyword in ['강남', '테헤란', '서초', '역삼']):
-           area_factor = 0.75
-           area_name = '강남권'
-       elif any(keyword in street_text for keyword in ['종로', '을지로', '명동', '세종대로', '중구']):
-           area_factor = 0.8
-           area_name = '도심'
-       elif any(keyword in street_text for keyword in ['강변북로', '올림픽대로', '한강대로']):
-           area_factor = 1.3
-           area_name = '한강변'
-       elif any(keyword in street_text for keyword in ['외곽순환', '강서', '노원', '도봉']):
-           area_factor = 1.15
-           area_name = '외곽'
-
-       from datetime import datetime
-       import pytz
+           if PROXY_WORKERS == 1:
+               logger.error("공유 메모리 모드를 사용할 수 없어 단독 수집으로 동작")
+               self.harvester_lock = None
+               self.shared_usage = None
+               self.become_harvester()
+               return
+           # 여기서 단독 수집으로 넘어가면 수집 프로세스가 여럿 생기므로 읽기 전용으로 남아 선출을 계속 시도한다
+           logger.error("공유 메모리에 연결하지 못해 읽기 전용 워커로 시작하고 계속 재시도")
+
+       if elected:
+           self.become_harvester()
+       else:
+           self.start_follower()
+
+   def attach_shared_usage(self):
+       if self.shared_usage is None:
+           self.shared_usage = SharedLinkUsage(TRAFFIC_SHARED_USAGE_FILE, len(self.service_links))
+
+   def become_harvester(self):
+       self.role = 'harvester'
+       if self.harvester_lock is not None:
+           logger.info(f"교통 수집 프로세스로 선출됨 (pid {os.getpid()})")
+       self.open_native_traffic()
+       restored = self.harvester_lock is not None and self.restore_snapshot(TRAFFIC_SHARED_SNAPSHOT_FILE)
+       if not restored:
+           self.restore_snapshot(TRAFFIC_SNAPSHOT_FILE)
+       self.start_traffic_updater()
+
+   def start_follower(self):
+       """수집은 하지 않고 공유 스냅샷 파일이 바뀔 때마다 memmap으로 다시 연다. 수집 프로세스가 죽으면 이어받는다"""
+       self.role = 'follower'
+       logger.info(f"공유 교통 스냅샷 읽기 전용 워커 (pid {os.getpid()})")
+       self.sync_shared_snapshot()
+
+       def follow_loop():
+           while True:
+               time.sleep(TRAFFIC_SHARED_POLL_INTERVAL)
+               try:
+                   self.attach_shared_usage()
+                   if self.harvester_lock.try_acquire():
+                       self.become_harvester()
+                       return
+                   self.sync_shared_snapshot()
+                   self.reload_speed_profiles()
+               except Exception as e:
+                   logger.error(f"공유 교통 스냅샷 동기화 오류: {e}")
+
+       threading.Thread(target=follow_loop, daemon=True).start()
+
+   def sync_shared_snapshot(self):
+       """공유 스냅샷 파일이 교체됐으면 새로 열어 스냅샷 교체 (배열은 복사하지 않고 memmap 그대로 사용)"""
        try:
-           kst = pytz.timezone('Asia/Seoul')
-           hour = datetime.now(kst).hour
-           
-           if 7 <= hour <= 9 or 18 <= hour <= 20:
-               time_factor = 0.6
-               time_desc = '출퇴근'
-           elif 12 <= hour <= 14:
-               time_factor = 0.8
-               time_desc = '점심'
-           elif 22 <= hour or hour <= 6:
-               time_factor = 1.4
-               time_desc = '심야'
-           else:
-               time_factor = 1.0
-               time_desc = '평시'
-       except:
-           time_factor = 1.0
-           time_desc = '평시'
+           stat = os.stat(TRAFFIC_SHARED_SNAPSHOT_FILE)
+       except FileNotFoundError:
+           return False
+       key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+       if key == self.shared_snapshot_key:
+           return False
+
+       meta, way_ids, speeds, observed_at, baseline = open_snapshot_file(TRAFFIC_SHARED_SNAPSHOT_FILE)
+       way_classes = self.way_classes if len(self.way_classes) == meta['count'] else None
+       self.snapshot = TrafficSnapshot.build(way_ids, speeds, observed_at, version=meta['snapshot_version'],
+                                             built_at=meta['built_at'], way_classes=way_classes, source=meta['source'],
+                                             baseline=baseline, ttl=TRAFFIC_TTL, decay=TRAFFIC_DECAY)
+       self.upstream_traffic_version = meta['native_version']
+       self.shared_snapshot_key = key
+       return True
+
+   def share_snapshot(self, snapshot):
+       """수집 프로세스가 발행한 스냅샷을 다른 워커들이 읽도록 공유 메모리(/dev/shm) 파일로 교체"""
+       if self.harvester_lock is None or not self.harvester_lock.held or not snapshot:
+           return
+       try:
+           save_snapshot_file(TRAFFIC_SHARED_SNAPSHOT_FILE, snapshot.way_ids, snapshot.speeds, snapshot.observed_at,
+                              snapshot.version, snapshot.built_at, baseline=snapshot.baseline,
+                              native_version=self.upstream_traffic_version, source=snapshot.source)
+       except Exception as e:
+           logger.error(f"공유 교통 스냅샷 저장 오류: {e}")
+
+   def collect_shared_usage(self):
+       """다른 워커들이 공유 카운터에 남긴 경로 사용 기록을 갱신 스케줄러로 옮긴다"""
+       if self.shared_usage is None:
+           return
+       links = self.shared_usage.collect()
+       if links.size:
+           self.scheduler.record_usage(links, time.time())
+
+   def open_native_traffic(self):
+       """Valhalla traffic.tar와 way->edge 매핑이 있으면 스냅샷을 Valhalla 실시간 교통 타일로 직접 기록"""
+       if VALHALLA_NATIVE_TRAFFIC == 'false':
+           return
+       missing = [path for path in (VALHALLA_TRAFFIC_TAR, VALHALLA_WAYS_EDGES_FILE) if not os.path.exists(path)]
+       if missing:
+           self.native_traffic_error = f"파일 없음: {', '.join(missing)}"
+           if VALHALLA_NATIVE_TRAFFIC == 'true':
+               logger.error(f"네이티브 교통 {self.native_traffic_error} (build_valhalla_traffic.sh로 생성)")
+           return
+       try:
+           self.native_traffic = ValhallaTrafficWriter(VALHALLA_TRAFFIC_TAR, VALHALLA_WAYS_EDGES_FILE,
+                                                       VALHALLA_WAY_EDGES_CACHE, way_filter=self.store.way_ids)
+           self.native_traffic_error = None
+       except Exception as e:
+           self.native_traffic_error = str(e)
+           logger.error(f"Valhalla 교통 타일을 열 수 없어 응답 후처리 방식 사용: {e}")
+
+   def native_traffic_status(self):
+       """health용 네이티브 교통 상태. VALHALLA_NATIVE_TRAFFIC=true인데 수집 프로세스가 기록하지 못하면 degraded"""
+       status = {"mode": VALHALLA_NATIVE_TRAFFIC, "active": self.native_traffic_active(),
+                 "error": self.native_traffic_error}
+       if self.native_traffic is not None:
+           status.update(self.native_traffic.stats())
+       status["degraded"] = (VALHALLA_NATIVE_TRAFFIC == 'true' and self.role == 'harvester'
+                             and self.native_traffic is None)
+       return status
+
+   def write_native_traffic(self, snapshot):
+       if self.native_traffic is None or not snapshot:
+           return
+       try:
+           started_at = time.time()
+           live_edges = self.native_traffic.write(snapshot)
+           self.upstream_traffic_version = snapshot.version
+           logger.info(f"Valhalla 교통 타일 기록: v{snapshot.version}, 실시간 속도 엣지 {live_edges}개 "
+                       f"({(time.time() - started_at) * 1000:.0f}ms)")
+       except Exception as e:
+           logger.error(f"Valhalla 교통 타일 기록 오류: {e}")
+
+   def native_traffic_active(self):
+       """현재 스냅샷이 Valhalla 교통 타일에도 기록돼 있는지 (다른 워커가 기록한 경우 포함)"""
+       return self.upstream_traffic_version > 0
+
+   def native_traffic_request(self, original_request, use_traffic):
+       """네이티브 교통 사용 시 Valhalla 요청 조정: 실시간 교통 요청은 현재 출발(date_time type 0),
+       아니면 current 속도를 빼서 기존처럼 교통 미반영 결과를 받는다"""
+       if not self.native_traffic_active():
+           return original_request
 
-       final_speed = base_speed * condition_factor * area_factor * time_factor
+       upstream_request = dict(original_request)
+       if use_traffic:
+           upstream_request.setdefault('date_time', {"type": 0})
+       else:
+           costing = upstream_request.get('costing', 'auto')
+           costing_options = dict(upstream_request.get('costing_options') or {})
+           costing_options[costing] = dict(costing_options.get(costing) or {}, speed_types=NATIVE_SPEED_TYPES_WITHOUT_LIVE)
+           upstream_request['costing_options'] = costing_options
+       return upstream_request
+
+   def record_history(self, snapshot):
+       """수집 결과 중 새로 관측된 속도를 히스토리 파티션에 추가 (속도 프로파일 생성용, 15분 버킷마다 한 번)"""
+       if self.speed_history is None or not snapshot:
+           return
+       try:
+           rows = self.speed_history.append(snapshot.way_ids, snapshot.speeds, snapshot.observed_at)
+           if rows:
+               logger.info(f"교통 히스토리 기록: {rows}개 관측")
+       except Exception as e:
+           logger.error(f"교통 히스토리 기록 오류: {e}")
+
+   def reload_speed_profiles(self):
+       """속도 프로파일 파일이 새로 만들어졌으면 다시 읽는다"""
+       if not SPEED_PROFILE_FILE or not os.path.exists(SPEED_PROFILE_FILE):
+           return
+       try:
+           if self.speed_profiles is not None and self.speed_profiles.mtime == os.path.getmtime(SPEED_PROFILE_FILE):
+               return
+           self.speed_profiles = SpeedProfiles.load(SPEED_PROFILE_FILE)
+           self.predicted_snapshots = {}
+           logger.info(f"속도 프로파일 로드: way {len(self.speed_profiles)}개, 히스토리 {self.speed_profiles.history_days}일")
+       except Exception as e:
+           logger.error(f"속도 프로파일 로드 오류: {e}")
+
+   def predicted_snapshot(self, when):
+       """when 시점의 프로파일 속도로 만든 스냅샷 (같은 요일/15분 버킷은 재사용)"""
+       profiles = self.speed_profiles
+       weekday, bucket = time_slots(when)
+       key = (profiles.version, int(weekday), int(bucket))
+       snapshot = self.predicted_snapshots.get(key)
+       if snapshot is None:
+           speeds = profiles.lookup(self.store.way_ids, when)
+           observed_at = np.where(np.isfinite(speeds), int(when), 0)
+           snapshot = TrafficSnapshot.build(self.store.way_ids, speeds, observed_at, version=profiles.version,
+                                            built_at=when, way_classes=self.way_classes, source='profile')
+           if len(self.predicted_snapshots) >= 64:
+               self.predicted_snapshots = {}
+           self.predicted_snapshots[key] = snapshot
+       return snapshot
+
+   def traffic_snapshot_for(self, route_request):
+       """요청의 출발 시각에 맞는 (스냅샷, 예측 여부). 먼 미래 출발이면 속도 프로파일 기반 예측 스냅샷"""
+       departure = requested_departure(route_request)
+       if departure is None or self.speed_profiles is None or departure - time.time() <= SPEED_PROFILE_MIN_LEAD:
+           return self.snapshot, False
+       return self.predicted_snapshot(departure), True
+
+   def time_factor(self, when):
+       """시간대 보정 계수와 설명. 속도 프로파일이 있으면 그 시간대의 도시 전체 속도 비율을 쓴다"""
+       if self.speed_profiles is not None:
+           return min(max(self.speed_profiles.time_factor(when), 0.5), 1.5), '프로파일'
+
+       hour = int(time_slots(when)[1]) * 15 // 60
+       if 7 <= hour <= 9 or 18 <= hour <= 20:
+           return 0.6, '출퇴근'
+       elif 12 <= hour <= 14:
+           return 0.8, '점심'
+       elif 22 <= hour or hour <= 6:
+           return 1.4, '심야'
+       return 1.0, '평시'
+
+   def persist_snapshot(self, snapshot):
+       if not TRAFFIC_SNAPSHOT_FILE or not snapshot:
+           return
+       try:
+           save_snapshot_file(TRAFFIC_SNAPSHOT_FILE, snapshot.way_ids, snapshot.speeds, snapshot.observed_at,
+                              snapshot.version, snapshot.built_at, baseline=snapshot.baseline,
+                              native_version=self.upstream_traffic_version, source=snapshot.source)
+           logger.info(f"교통 스냅샷 저장: {TRAFFIC_SNAPSHOT_FILE} (v{snapshot.version})")
+       except Exception as e:
+           logger.error(f"교통 스냅샷 저장 오류: {e}")
+
+   def restore_snapshot(self, path):
+       """저장된 스냅샷을 memmap으로 열어 첫 수집이 끝나기 전부터 바로 사용. 복원했으면 True"""
+       if not path or not os.path.exists(path):
+           return False
+       try:
+           meta, way_ids, speeds, observed_at, _ = open_snapshot_file(path)
+           age = time.time() - meta['built_at']
+           if age > TRAFFIC_SNAPSHOT_MAX_AGE:
+               logger.warning(f"저장된 교통 스냅샷이 너무 오래됨 ({age:.0f}초), 사용하지 않음")
+               return False
 
-       final_speed = max(8, min(final_speed, 80))
+           restored = self.store.load(way_ids, speeds, observed_at)
+           snapshot = self.publish_snapshot(version=meta['snapshot_version'], built_at=meta['built_at'], source='file')
+           logger.info(f"저장된 교통 스냅샷 복원: {path}, {restored}개 way, v{snapshot.version}, {age:.0f}초 전 데이터")
+           return True
+       except Exception as e:
+           logger.error(f"교통 스냅샷 복원 오류: {e}")
+           return False
+
+   def fetch_traffic_data(self, service_links=None, pass_deadline=None):
+       logger.info("실시간 교통 데이터 수집 시작...")
+
+       pending_link_speeds = {}
        
-       logger.info(f'🚦 {area_name} {road_class} {time_desc}: {final_speed:.1f}km/h '
-                  f'(전체상황: {traffic_condition} {congestion_ratio:.1%}, '
-                  f'기본: {base_speed}, 지역: {area_factor}, 시간: {time_factor})')
+       if service_links is None:
+           service_links = list(service_to_osm.keys())
+       total_links = len(service_links)
+       logger.info(f"총 서비스링크 수: {total_links}개 (동시 요청: {TRAFFIC_FETCH_WORKERS}, 초당 한도: {SEOUL_API_RATE})")
        
-       return final_speed
+       started_at = time.monotonic()
+       deadline = started_at + (self.traffic_pass_deadline if pass_deadline is None else pass_deadline)
+       success_count = 0
+       fail_count = 0
+       done_count = 0
+       deadline_hit = False
+       published_chunks = 0
+       last_published_at = started_at
+
+       executor = ThreadPoolExecutor(max_workers=TRAFFIC_FETCH_WORKERS, thread_name_prefix='traffic-fetch')
+       try:
+           futures = [executor.submit(self.fetch_link_speed, link, deadline) for link in service_links]
+
+           for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic()) + TRAFFIC_READ_TIMEOUT):
+               done_count += 1
+               result = future.result()
+
+               if result is None:
+                   fail_count += 1
+               else:
+                   link_id, speed = result
+                   if link_id in service_to_osm:
+                       pending_link_speeds[link_id] = speed
+                       success_count += 1
+                   else:
+                       fail_count += 1
+
+               now = time.monotonic()
+               if pending_link_speeds and (len(pending_link_speeds) >= TRAFFIC_PUBLISH_EVERY_LINKS
+                                           or now - last_published_at >= TRAFFIC_PUBLISH_EVERY_SEC):
+                   self.write_link_speeds(pending_link_speeds)
+                   self.publish_snapshot()
+                   pending_link_speeds = {}
+                   published_chunks += 1
+                   last_published_at = now
+
+               if done_count % 500 == 0:
+                   logger.info(f"진행률: {done_count}/{total_links} ({done_count/total_links*100:.1f}%)")
+       except FuturesTimeoutError:
+           deadline_hit = True
+           logger.warning(f"수집 제한시간 {self.traffic_pass_deadline}초 초과: {done_count}/{total_links}개에서 중단")
+       finally:
+           executor.shutdown(wait=False, cancel_futures=True)
+
+       if time.monotonic() >= deadline:
+           deadline_hit = True
+
+       self.scheduler.record_fetch([self.link_positions[link_id] for link_id in service_links], time.time())
+
+       duration = time.monotonic() - started_at
+       self.last_pass_stats = {
+           "finished_at": time.time(),
+           "duration_sec": round(duration, 2),
+           "links_total": total_links,
+           "links_done": done_count,
+           "links_per_second": round(done_count / duration, 1) if duration > 0 else 0.0,
+           "success": success_count,
+           "failed": fail_count,
+           "deadline_hit": deadline_hit,
+           "published_chunks": published_chunks + 1
+       }
+
+       if pending_link_speeds:
+           self.write_link_speeds(pending_link_speeds)
+       snapshot = self.publish_snapshot()
+       self.persist_snapshot(snapshot)
+       self.record_history(snapshot)
+       logger.info(f"교통 데이터 수집 완료: {snapshot.count}개 (성공: {success_count}, 실패: {fail_count}, "
+                   f"소요: {duration:.1f}초, {self.last_pass_stats['links_per_second']}링크/초)")
+
+       if snapshot:
+           logger.info(f"교통 속도 분포: 평균 {snapshot.avg_speed:.1f}km/h, 최소 {snapshot.min_speed:.1f}km/h, "
+                       f"최대 {snapshot.max_speed:.1f}km/h (스냅샷 v{snapshot.version})")
    
-   def apply_real_traffic_to_response(self, valhalla_response, use_traffic=False):
-       if not use_traffic or not traffic_data or 'trip' not in valhalla_response:
+   def fetch_leg_edges(self, leg, costing):
+       """경로 shape를 edge_walk로 다시 매칭해 edge별 OSM way id, 길이, 속도를 얻는다"""
+       shape = leg.get('shape')
+       if not shape:
+           return None
+
+       try:
+           response = valhalla_request(
+               'POST', 'trace_attributes',
+               read_timeout=10,
+               hedge=True,
+               json={
+                   "encoded_polyline": shape,
+                   "costing": costing,
+                   "shape_match": "edge_walk",
+                   "units": "kilometers",
+                   "filters": {"attributes": ROUTE_EDGE_ATTRIBUTES, "action": "include"}
+               }
+           )
+           if response.status_code != 200:
+               logger.warning(f"trace_attributes 실패: {response.status_code}")
+               return None
+           return response.json().get('edges') or None
+       except Exception as e:
+           logger.warning(f"trace_attributes 오류: {e}")
+           return None
+
+   def apply_edge_traffic_to_leg(self, leg, edges, snapshot):
+       """edge별 실시간 속도로 구간 시간을 다시 계산해 maneuver 단위로 합산"""
+       maneuvers = leg.get('maneuvers', [])
+       maneuver_count = len(maneuvers)
+       if not maneuver_count:
+           return 0, 0.0, 0.0
+
+       original_times = np.array([m.get('time', 0) for m in maneuvers], dtype=float)
+       lengths = np.array([m.get('length', 0) for m in maneuvers], dtype=float)
+       begins = np.array([m.get('begin_shape_index', 0) for m in maneuvers], dtype=np.int64)
+
+       edge_way_ids = np.array([e.get('way_id', 0) for e in edges], dtype=np.int64)
+       edge_lengths = np.array([e.get('length', 0) for e in edges], dtype=float)
+       edge_speeds = np.array([e.get('speed', 0) for e in edges], dtype=float)
+       edge_begins = np.array([e.get('begin_shape_index', 0) for e in edges], dtype=np.int64)
+       self.record_route_usage(edge_way_ids)
+
+       live_speeds = snapshot.lookup(edge_way_ids)
+       has_base = edge_speeds > 0
+       base_times = np.where(has_base, edge_lengths / np.where(has_base, edge_speeds, 1.0) * 3600, 0.0)
+       live_valid = has_base & np.isfinite(live_speeds) & (live_speeds > 0)
+       live_times = np.where(live_valid, edge_lengths / np.where(live_valid, live_speeds, 1.0) * 3600, base_times)
+
+       owners = np.clip(np.searchsorted(begins, edge_begins, side='right') - 1, 0, maneuver_count - 1)
+       base_sums = np.bincount(owners, weights=base_times, minlength=maneuver_count)
+       live_sums = np.bincount(owners, weights=live_times, minlength=maneuver_count)
+       matched = np.bincount(owners, weights=live_valid.astype(float), minlength=maneuver_count)
+
+       ratios = np.divide(live_sums, base_sums, out=np.ones(maneuver_count), where=base_sums > 0)
+       applied = (matched > 0) & (original_times > 0) & (lengths > 0) & (ratios >= 0.3) & (ratios <= 3.0)
+       new_times = np.where(applied, original_times * ratios, original_times)
+
+       for i in np.flatnonzero(applied):
+           maneuver = maneuvers[i]
+           maneuver['original_time'] = maneuver.get('time', 0)
+           maneuver['time'] = float(new_times[i])
+           maneuver['real_speed_applied'] = float(lengths[i] / new_times[i] * 3600)
+           maneuver['traffic_edges'] = int(matched[i])
+
+       return int(applied.sum()), float(original_times.sum()), float(new_times.sum())
+
+   def apply_heuristic_traffic_to_leg(self, leg, snapshot, time_factor):
+       """edge 매칭이 없을 때 도로명/길이 기반 추정 속도로 maneuver 시간을 한 번에 다시 계산"""
+       maneuvers = leg.get('maneuvers', [])
+       original_times = np.array([m.get('time', 0) for m in maneuvers], dtype=float)
+       if not maneuvers or not snapshot.valid_count:
+           return 0, float(original_times.sum()), float(original_times.sum())
+
+       lengths = np.array([m.get('length', 0) for m in maneuvers], dtype=float)
+       streets = [classify_street(tuple(m.get('street_names') or ())) for m in maneuvers]
+       kinds = np.array([kind for kind, _, _ in streets], dtype=np.int64)
+       area_factors = np.array([factor for _, factor, _ in streets], dtype=float)
+
+       speeds = heuristic_segment_speeds(lengths, kinds, area_factors, snapshot.condition_factor, time_factor)
+       new_times = lengths / speeds * 3600
+       ratios = np.divide(new_times, original_times, out=np.ones(len(maneuvers)), where=original_times > 0)
+       applied = (lengths > 0) & (ratios >= 0.3) & (ratios <= 3.0)
+       new_times = np.where(applied, new_times, original_times)
+
+       for i in np.flatnonzero(applied):
+           maneuver = maneuvers[i]
+           maneuver['original_time'] = maneuver.get('time', 0)
+           maneuver['time'] = float(new_times[i])
+           maneuver['real_speed_applied'] = float(speeds[i])
+
+       return int(applied.sum()), float(original_times.sum()), float(new_times.sum())
+
+   def apply_real_traffic_to_response(self, valhalla_response, use_traffic=False, costing='auto', used_ways=None,
+                                      snapshot=None):
+       """used_ways가 주어지면 edge 매칭된 way id 배열을 모아준다 (캐시 적중 시 사용 기록용).
+       snapshot이 주어지면 (미래 출발 예측 스냅샷) 현재 스냅샷 대신 사용한다"""
+       predicted = snapshot is not None
+       snapshot = self.snapshot if snapshot is None else snapshot
+       if use_traffic and not predicted and self.native_traffic_active() and 'trip' in valhalla_response:
+           valhalla_response['trip'].update(
+               has_traffic=True, traffic_data_count=snapshot.count, traffic_version=self.upstream_traffic_version,
+               traffic_age_sec=snapshot.age(), traffic_source=snapshot.source, real_traffic_applied=True,
+               traffic_method='native'
+           )
+           return valhalla_response
+
+       if not use_traffic or not snapshot or 'trip' not in valhalla_response:
            if 'trip' in valhalla_response:
                valhalla_response['trip']['has_traffic'] = False
-               valhalla_response['trip']['traffic_data_count'] = len(traffic_data)
+               valhalla_response['trip']['traffic_data_count'] = snapshot.count
                valhalla_response['trip']['real_traffic_applied'] = False
            return valhalla_response
        
-       logger.info("현실적인 실시간 교통 적용 시작")
-       
+       time_factor, time_desc = self.time_factor(snapshot.built_at or time.time())
        applied_segments = 0
        total_segments = 0
        total_original_time = 0
        total_new_time = 0
+       edge_legs = 0
        
        try:
-           for leg in valhalla_response['trip'].get('legs', []):
-               leg_original_time = 0
-               leg_new_time = 0
-               
-               for maneuver in leg.get('maneuvers', []):
-                   total_segments += 1
-                   
-                   original_time = maneuver.get('time', 0)
-                   segment_length = maneuver.get('length', 0)
-                   
-                   leg_original_time += original_time
-
-                   if segment_length > 0:
-                       real_speed_kmh = self.find_real_speed_for_segment(maneuver)
-                       
-                       if real_speed_kmh and real_speed_kmh > 0:
-                           new_time = (segment_length / real_speed_kmh) * 3600
-
-                           time_ratio = new_time / original_time if original_time > 0 else 1
-                           if 0.3 <= time_ratio <= 3.0:
-                               maneuver['time'] = new_time
-                               maneuver['original_time'] = original_time
-                               maneuver['real_speed_applied'] = real_speed_kmh
-                               
-                               leg_new_time += new_time
-                               applied_segments += 1
-                           else:
-                               leg_new_time += original_time
-                       else:
-                           leg_new_time += original_time
-                   else:
-                       leg_new_time += original_time
+           legs = valhalla_response['trip'].get('legs', [])
+           # 다구간 경로는 trace_attributes를 구간별로 동시에 요청
+           if len(legs) > 1:
+               leg_edges = list(trace_executor.map(lambda leg: self.fetch_leg_edges(leg, costing), legs))
+           else:
+               leg_edges = [self.fetch_leg_edges(leg, costing) for leg in legs]
+
+           for leg, edges in zip(legs, leg_edges):
+               total_segments += len(leg.get('maneuvers', []))
+
+               if edges and used_ways is not None:
+                   used_ways.append(np.array([e.get('way_id', 0) for e in edges], dtype=np.int64))
+               if edges:
+                   leg_applied, leg_original_time, leg_new_time = self.apply_edge_traffic_to_leg(leg, edges, snapshot)
+                   edge_legs += 1
+               else:
+                   leg_applied, leg_original_time, leg_new_time = self.apply_heuristic_traffic_to_leg(leg, snapshot, time_factor)
+               applied_segments += leg_applied
 
                if 'summary' in leg:
                    leg['summary']['original_time'] = leg_original_time
@@ -303,72 +1056,52 @@ class TrafficProxy:
            logger.error(f"실시간 교통 적용 중 오류: {e}")
 
        valhalla_response['trip']['has_traffic'] = True
-       valhalla_response['trip']['traffic_data_count'] = len(traffic_data)
+       valhalla_response['trip']['traffic_data_count'] = snapshot.count
+       valhalla_response['trip']['traffic_version'] = snapshot.version
+       valhalla_response['trip']['traffic_age_sec'] = snapshot.age()
+       valhalla_response['trip']['traffic_source'] = snapshot.source
        valhalla_response['trip']['real_traffic_applied'] = True
+       valhalla_response['trip']['traffic_method'] = 'edge' if edge_legs else 'heuristic'
        valhalla_response['trip']['applied_segments'] = applied_segments
        valhalla_response['trip']['total_segments'] = total_segments
        
-       if applied_segments > 0:
+       if applied_segments > 0 and total_original_time > 0:
            time_change_pct = ((total_new_time - total_original_time) / total_original_time) * 100
            logger.info(f"현실적인 교통 적용 완료: {applied_segments}/{total_segments} 구간, "
-                      f"시간 변화: {time_change_pct:+.1f}%")
+                      f"시간 변화: {time_change_pct:+.1f}% (edge 매칭 leg {edge_legs}개, 시간대 {time_desc} x{time_factor:.2f}, "
+                      f"전체상황: {snapshot.traffic_condition} {snapshot.congestion_ratio:.1%})")
        else:
            logger.info("적용된 실시간 교통 구간 없음")
        
        return valhalla_response
 
-   def apply_traffic_to_matrix(self, valhalla_result):
-       """매트릭스에도 현실적인 교통 적용"""
+   def apply_traffic_to_matrix(self, times, distances, snapshot=None):
+       """매트릭스에도 현실적인 교통 적용 - 배열 단위 계산. (새 시간, 적용 여부, 적용 속도) 반환"""
        
-       if not traffic_data:
-           return valhalla_result
+       predicted = snapshot is not None
+       snapshot = self.snapshot if snapshot is None else snapshot
+       applied = np.zeros(times.shape, dtype=bool)
+       if not snapshot.valid_count or (not predicted and self.native_traffic_active()):
+           return times, applied, np.zeros(times.shape)
        
-       logger.info('Matrix에 실시간 교통 적용 시작')
+       slow_ratio = snapshot.congestion_ratio
+       global_factor = snapshot.matrix_factor
+       class_speeds = snapshot.class_speeds
 
-       current_speeds = [s for s in traffic_data.values() if 10 <= s <= 80]
-       if not current_speeds:
-           return valhalla_result
-       
-       avg_speed = sum(current_speeds) / len(current_speeds)
-       slow_ratio = len([s for s in current_speeds if s < 25]) / len(current_speeds)
+       expected_speeds = np.select(
+           [distances >= 5, distances >= 2],
+           [class_speeds.get('highway', 45 * global_factor), class_speeds.get('major', 35 * global_factor)],
+           default=class_speeds.get('local', 25 * global_factor)
+       )
 
-       if slow_ratio > 0.5:
-           global_factor = 0.7
-       elif slow_ratio > 0.3:
-           global_factor = 0.85
-       else:
-           global_factor = 1.0
-       
-       applied_count = 0
+       valid = np.isfinite(times) & np.isfinite(distances) & (distances > 0)
+       new_times = np.where(valid, distances / expected_speeds * 3600, times)
+       ratios = np.divide(new_times, times, out=np.ones(times.shape), where=valid & (times > 0))
+       applied = valid & (ratios >= 0.5) & (ratios <= 2.0)
+       new_times = np.where(applied, new_times, times)
        
-       if 'sources_to_targets' in valhalla_result:
-           for i, source_data in enumerate(valhalla_result['sources_to_targets']):
-               if source_data:
-                   for j, target_data in enumerate(source_data):
-                       if target_data and target_data.get('time') is not None:
-                           original_time = target_data['time']
-                           distance = target_data.get('distance', 0)
-                           
-                           if distance > 0:
-                               if distance >= 5:
-                                   expected_speed = 45 * global_factor
-                               elif distance >= 2:
-                                   expected_speed = 35 * global_factor
-                               else:
-                                   expected_speed = 25 * global_factor
-                               
-                               new_time = (distance / expected_speed) * 3600
-
-                               time_ratio = new_time / original_time if original_time > 0 else 1
-                               if 0.5 <= time_ratio <= 2.0:
-                                   target_data['time'] = new_time
-                                   target_data['original_time'] = original_time
-                                   target_data['traffic_applied'] = True
-                                   target_data['applied_speed'] = expected_speed
-                                   applied_count += 1
-       
-       logger.info(f'Matrix 교통 적용 완료: {applied_count}개 구간, 전체상황: {slow_ratio:.1%} 혼잡')
-       return valhalla_result
+       logger.info(f'Matrix 교통 적용 완료: {int(applied.sum())}개 구간, 전체상황: {slow_ratio:.1%} 혼잡')
+       return new_times, applied, np.where(applied, expected_speeds, 0.0)
    
    def start_traffic_updater(self):
        def update_loop():
@@ -380,6 +1113,17 @@ class TrafficProxy:
 
            while True:
                try:
+                   self.reload_speed_profiles()
+                   if TRAFFIC_ADAPTIVE_REFRESH:
+                       time.sleep(TRAFFIC_SCHEDULER_TICK)
+                       self.collect_shared_usage()
+                       due = self.scheduler.due_links(time.time(), self.refresh_budget())
+                       if len(due):
+                           logger.info(f"우선순위 교통 데이터 갱신: {len(due)}개 링크")
+                           self.fetch_traffic_data([self.service_links[i] for i in due],
+                                                   pass_deadline=TRAFFIC_SCHEDULER_TICK * 0.9)
+                       continue
+
                    logger.info(f"다음 업데이트까지 {self.traffic_update_interval}초 대기...")
                    time.sleep(self.traffic_update_interval)
                    logger.info("주기적 교통 데이터 업데이트 시작...")
@@ -391,47 +1135,75 @@ class TrafficProxy:
        thread.start()
        logger.info("교통 데이터 자동 업데이트 스레드 시작됨")
 
-   def kakao_geocoding(self, address):
+   def kakao_request(self, url, params, priority):
+       """우선순위 스케줄러에서 토큰을 받은 뒤 카카오 API 호출"""
+       if not kakao_scheduler.acquire(priority, timeout=KAKAO_QUEUE_TIMEOUT.get(priority)):
+           raise RuntimeError(f"카카오 API 대기 시간 초과 ({priority})")
+       headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
+       return requests.get(url, headers=headers, params=params, timeout=10)
+
+   def kakao_lookup(self, address, priority='interactive'):
+       """카카오 주소 검색 후 키워드 검색. 결과 dict, 두 검색 모두 정상 응답에 결과가 없으면 NOT_FOUND,
+       어느 한 호출이라도 실패해 결과를 못 찾았으면 예외 (일시적인 실패가 NOT_FOUND로 캐시되지 않도록)"""
+       params = {"query": address}
+
+       response = self.kakao_request(KAKAO_ADDRESS_API, params, priority)
+       address_ok = response.status_code == 200
+       documents = response.json().get("documents", []) if address_ok else []
+       if documents:
+           doc = documents[0]
+           region = doc.get("address") or doc.get("road_address") or {}
+           return {
+               "lat": float(doc["y"]),
+               "lon": float(doc["x"]),
+               "name": doc.get("address_name", address),
+               "confidence": 0.95,
+               "district": region.get("region_2depth_name")
+           }
+
+       response = self.kakao_request(KAKAO_KEYWORD_API, params, priority)
+       if response.status_code != 200:
+           raise RuntimeError(f"카카오 키워드 검색 응답 오류: {response.status_code}")
+
+       documents = response.json().get("documents", [])
+       if not documents and not address_ok:
+           raise RuntimeError("카카오 주소 검색 응답 오류 (키워드 검색 결과 없음)")
+       if documents:
+           doc = documents[0]
+           return {
+               "lat": float(doc["y"]),
+               "lon": float(doc["x"]),
+               "name": doc.get("place_name", address),
+               "confidence": 0.85,
+               "district": district_from_address(doc.get("address_name", ""))
+           }
+       return NOT_FOUND
+
+   def geocode(self, address, priority='interactive'):
+       """캐시 -> 카카오 -> 구별 기본 좌표 순으로 찾은 결과 dict (lat, lon, name, confidence, district, source)"""
        try:
-           headers = {"Authorization": f"KakaoAK {KAKAO_API_KEY}"}
-
-           params = {"query": address}
-           response = requests.get(KAKAO_ADDRESS_API, headers=headers, params=params, timeout=10)
-           
-           if response.status_code == 200:
-               data = response.json()
-               documents = data.get("documents", [])
-               
-               if documents:
-                   doc = documents[0]
-                   lat = float(doc["y"])
-                   lon = float(doc["x"])
-                   address_name = doc.get("address_name", address)
-                   
-                   logger.info(f"카카오 주소 검색 성공: {address} -> ({lat}, {lon}) [{address_name}]")
-                   return lat, lon, address_name, 0.95
-
-           response = requests.get(KAKAO_KEYWORD_API, headers=headers, params=params, timeout=10)
-           
-           if response.status_code == 200:
-               data = response.json()
-               documents = data.get("documents", [])
-               
-               if documents:
-                   doc = documents[0]
-                   lat = float(doc["y"])
-                   lon = float(doc["x"])
-                   place_name = doc.get("place_name", address)
-                   
-                   logger.info(f"카카오 키워드 검색 성공: {address} -> ({lat}, {lon}) [{place_name}]")
-                   return lat, lon, place_name, 0.85
+           result, source = geocode_cache.get(address), 'cache'
+           if result is None:
+               result, source = self.kakao_lookup(address, priority), 'kakao'
+               geocode_cache.put(address, result)
+               if result:
+                   logger.info(f"카카오 지오코딩 성공: {address} -> ({result['lat']}, {result['lon']}) [{result['name']}]")
+
+           if result:
+               return dict(result, source=source)
 
            logger.warning(f"카카오 지오코딩 실패, 기본 좌표 사용: {address}")
-           return self.get_default_coordinates_by_district(address)
-           
+
        except Exception as e:
            logger.error(f"카카오 지오코딩 오류: {e}")
-           return self.get_default_coordinates_by_district(address)
+
+       lat, lon, name, confidence = self.get_default_coordinates_by_district(address)
+       return {"lat": lat, "lon": lon, "name": name, "confidence": confidence,
+               "district": district_from_address(address), "source": "fallback"}
+
+   def kakao_geocoding(self, address):
+       result = self.geocode(address)
+       return result['lat'], result['lon'], result['name'], result['confidence']
 
    def get_default_coordinates_by_district(self, address):
        district_coords = {
@@ -472,11 +1244,18 @@ class TrafficProxy:
 
 proxy = TrafficProxy()
 
+geocode_cache.purge_expired()
+if GEOCODE_PREWARM_FILE and os.path.exists(GEOCODE_PREWARM_FILE):
+   try:
+       logger.info(f"지오코딩 캐시 사전 적재: {geocode_cache.prewarm(GEOCODE_PREWARM_FILE)}개 주소 ({GEOCODE_PREWARM_FILE})")
+   except Exception as e:
+       logger.error(f"지오코딩 캐시 사전 적재 실패: {e}")
+
 @app.route('/status', methods=['GET'])
 def status():
    try:
-       response = requests.get(f"{VALHALLA_URL}/status", timeout=5)
-       return response.text, response.status_code, response.headers.items()
+       response = valhalla_request('GET', 'status', read_timeout=5)
+       return upstream_response(response)
    except Exception as e:
        logger.error(f"Status check error: {e}")
        return jsonify({"error": "Valhalla unreachable"}), 503
@@ -486,28 +1265,61 @@ def proxy_route():
    try:
        original_request = request.json
        logger.info(f"Route request received")
-       logger.info(f"교통 데이터 수집: {len(traffic_data)}개")
+       logger.info(f"교통 데이터 수집: {proxy.snapshot.count}개 (v{proxy.snapshot.version})")
 
        costing_options = original_request.get('costing_options', {})
        costing = original_request.get('costing', 'auto')
        use_traffic = costing_options.get(costing, {}).get('use_live_traffic', False)
 
-       response = requests.post(
-           f"{VALHALLA_URL}/route",
-           json=original_request,
-           timeout=30
-       )
-       
-       if response.status_code == 200:
+       snapshot, predicted = proxy.traffic_snapshot_for(original_request) if use_traffic else (proxy.snapshot, False)
+       prediction = snapshot if predicted else None
+       # 같은 교통 구간 안의 반복 요청은 구간이 시작된 뒤 처음 계산한 결과를 받는다 (최대 ROUTE_CACHE_EPOCH초 묵은 교통)
+       traffic_version = traffic_epoch(snapshot) if use_traffic and ROUTE_CACHE_ADJUSTED else 0
+       upstream_version = traffic_epoch(proxy.snapshot) if proxy.native_traffic_active() else 0
+       cache_key = route_cache_key(original_request, traffic_version, upstream_version)
+       if route_cache is not None:
+           cached = route_cache.get(cache_key)
+           if cached is not None:
+               body, used_ways = cached
+               if not ROUTE_CACHE_ADJUSTED:
+                   modified_result = proxy.apply_real_traffic_to_response(json.loads(body), use_traffic, costing,
+                                                                          snapshot=prediction)
+                   return jsonify(modified_result), 200, {'X-Proxy-Cache': 'HIT'}
+
+               if used_ways.size:
+                   proxy.record_route_usage(used_ways)
+               return Response(body, status=200, mimetype='application/json', headers={'X-Proxy-Cache': 'HIT'})
+
+       def fetch_route():
+           upstream_request = proxy.native_traffic_request(original_request, use_traffic and not predicted)
+           response = valhalla_request('POST', 'route', read_timeout=30, hedge=True, json=upstream_request)
+           if response.status_code != 200:
+               logger.error(f"Valhalla error: {response.status_code}")
+               return json_bytes({"error": "Valhalla error"}), response.status_code
+
            valhalla_result = response.json()
+           if route_cache is not None and not ROUTE_CACHE_ADJUSTED:
+               route_cache.put(cache_key, (response.content, None), size=len(response.content))
+
+           used_ways = []
+           modified_result = proxy.apply_real_traffic_to_response(valhalla_result, use_traffic, costing, used_ways,
+                                                                  snapshot=prediction)
+           body = json_bytes(modified_result)
+
+           if route_cache is not None and ROUTE_CACHE_ADJUSTED:
+               # 조회한 키 그대로 저장 (네이티브 모드의 응답 traffic_version은 업스트림 버전이라 키가 어긋난다)
+               used_ways = np.concatenate(used_ways) if used_ways else np.empty(0, dtype=np.int64)
+               route_cache.put(cache_key, (body, used_ways), size=len(body) + used_ways.nbytes)
+           return body, 200
+
+       (body, status), shared = request_flights.do(('route', cache_key), fetch_route)
+       return Response(body, status=status, mimetype='application/json',
+                       headers={'X-Proxy-Cache': 'MISS', 'X-Coalesced': str(shared).lower()})
+
+   except SingleFlightTimeout as e:
+       logger.warning(f"Route 동일 요청 대기 초과: {e}")
+       return jsonify({"error": str(e)}), 504
 
-           modified_result = proxy.apply_real_traffic_to_response(valhalla_result, use_traffic)
-           
-           return jsonify(modified_result)
-       else:
-           logger.error(f"Valhalla error: {response.status_code}")
-           return jsonify({"error": "Valhalla error"}), response.status_code
-           
    except Exception as e:
        logger.error(f"Proxy error: {e}")
        return jsonify({"error": str(e)}), 500
@@ -521,27 +1333,98 @@ def proxy_matrix_endpoint():
        costing_options = original_request.get('costing_options', {})
        costing = original_request.get('costing', 'auto')
        use_traffic = costing_options.get(costing, {}).get('use_live_traffic', False)
+       verbose = original_request.get('verbose', True)
 
-       response = requests.post(
-           f"{VALHALLA_URL}/sources_to_targets",
-           json=original_request,
-           timeout=60
-       )
-       
-       if response.status_code == 200:
-           valhalla_result = response.json()
+       sources = original_request.get('sources') or original_request.get('locations') or []
+       targets = original_request.get('targets') or original_request.get('locations') or []
+       if not sources or not targets:
+           return jsonify({"error": "sources/targets (또는 locations)가 필요합니다"}), 400
+
+       snapshot, predicted = proxy.traffic_snapshot_for(original_request) if use_traffic else (proxy.snapshot, False)
+
+       def build_matrix():
+           upstream_request = proxy.native_traffic_request(original_request, use_traffic and not predicted)
+           if matrix_cache is not None:
+               context = matrix_cache_context(upstream_request, proxy.upstream_traffic_version)
+               source_keys = [matrix_cache.location_key(location) for location in sources]
+               target_keys = [matrix_cache.location_key(location) for location in targets]
+               times, distances, hit = matrix_cache.lookup(source_keys, target_keys, context)
+           else:
+               times = np.full((len(sources), len(targets)), np.nan)
+               distances = np.full((len(sources), len(targets)), np.nan)
+               hit = np.zeros(times.shape, dtype=bool)
+
+           result = {"units": original_request.get('units', 'kilometers')}
+           tiles = failed = 0
+           for rows, cols in miss_blocks(hit):
+               block_times, block_distances, meta, block_tiles, block_failed = compute_matrix(
+                   upstream_request, [sources[i] for i in rows], [targets[j] for j in cols]
+               )
+               if meta is None:
+                   return json_bytes({"error": "모든 매트릭스 블록 계산 실패", "tiles": block_tiles}), 502
+
+               times[np.ix_(rows, cols)] = block_times
+               distances[np.ix_(rows, cols)] = block_distances
+               result.update(meta)
+               tiles += block_tiles
+               failed += block_failed
+               if matrix_cache is not None:
+                   matrix_cache.store([source_keys[i] for i in rows], [target_keys[j] for j in cols],
+                                      context, block_times, block_distances)
+
+           if tiles > 1:
+               result.update(tiles=tiles, tiles_failed=failed)
+           if matrix_cache is not None:
+               result['matrix_cache'] = {"hits": int(hit.sum()), "cells": int(hit.size)}
+               logger.info(f"Matrix 캐시: {int(hit.sum())}/{hit.size} 셀 적중, Valhalla 요청 셀 {int((~hit).sum())}")
 
-           if use_traffic and traffic_data:
-               modified_result = proxy.apply_traffic_to_matrix(valhalla_result)
-               logger.info("Matrix에 실시간 교통 적용 완료")
-               return jsonify(modified_result)
+           applied = speeds = None
+           original_times = times
+           if use_traffic and not predicted and proxy.native_traffic_active():
+               result['traffic_applied'] = True
+               result['traffic_method'] = 'native'
+               result['traffic_version'] = proxy.upstream_traffic_version
+               result['traffic_age_sec'] = proxy.snapshot.age()
+               result['traffic_source'] = proxy.snapshot.source
+           elif use_traffic and snapshot and times.size:
+               times, applied, speeds = proxy.apply_traffic_to_matrix(times, distances, snapshot if predicted else None)
+               result['traffic_applied'] = True
+               result['traffic_version'] = snapshot.version
+               result['traffic_age_sec'] = snapshot.age()
+               result['traffic_source'] = snapshot.source
            else:
                logger.info("Matrix 기본 Valhalla 결과 사용")
-               return jsonify(valhalla_result)
-       else:
-           logger.error(f"Matrix request failed: {response.status_code}")
-           return response.text, response.status_code, response.headers.items()
-   
+               result['traffic_applied'] = False
+
+           if verbose:
+               # 내부 호출(get_valhalla_matrix)은 verbose=False의 배열 형식을 쓰고, verbose 응답은 배열에서 바로 직렬화
+               body = json_bytes(result)
+               matrix = verbose_matrix_json(times, distances, original_times, applied, speeds)
+               return body[:-1] + b', "sources_to_targets": ' + matrix + b'}', 200
+           else:
+               result['sources_to_targets'] = {
+                   "durations": array_to_json_list(times),
+                   "distances": array_to_json_list(distances)
+               }
+               if applied is not None:
+                   result['original_durations'] = array_to_json_list(original_times)
+
+           return json_bytes(result), 200
+
+       traffic_version = snapshot.version if use_traffic else 0
+       flight_key = ('matrix', hashlib.sha1(json.dumps(original_request, sort_keys=True).encode('utf-8')).hexdigest(),
+                     traffic_version, proxy.upstream_traffic_version)
+       (body, status), shared = request_flights.do(flight_key, build_matrix)
+       return Response(body, status=status, mimetype='application/json', headers={'X-Coalesced': str(shared).lower()})
+
+   except SingleFlightTimeout as e:
+       logger.warning(f"Matrix 동일 요청 대기 초과: {e}")
+       return jsonify({"error": str(e)}), 504
+
+   except UpstreamError as e:
+       logger.error(f"Matrix request failed: {e.response.status_code}")
+       return upstream_response(e.response)
+
    except Exception as e:
        logger.error(f"Matrix proxy error: {e}")
        return jsonify({"error": str(e)}), 500
@@ -549,15 +1432,10 @@ def proxy_matrix_endpoint():
 @app.route('/sources_to_targets', methods=['POST'])
 def proxy_matrix():
    try:
-       original_request = request.json
-
-       response = requests.post(
-           f"{VALHALLA_URL}/sources_to_targets",
-           json=original_request,
-           timeout=60
-       )
+       response = valhalla_request('POST', 'sources_to_targets', read_timeout=60, hedge=True,
+                                  data=request.get_data(), headers=dict(filter_headers(request.headers)))
        
-       return jsonify(response.json())
+       return upstream_response(response)
    
    except Exception as e:
        logger.error(f"Matrix proxy error: {e}")
@@ -565,25 +1443,50 @@ def proxy_matrix():
 
 @app.route('/health', methods=['GET'])
 def health():
+   snapshot = proxy.snapshot
    traffic_stats = {}
-   if traffic_data:
-       speeds = list(traffic_data.values())
+   if snapshot:
        traffic_stats = {
-           "avg_speed": sum(speeds) / len(speeds),
-           "min_speed": min(speeds),
-           "max_speed": max(speeds),
-           "slow_roads": len([s for s in speeds if s < 20]),
-           "fast_roads": len([s for s in speeds if s > 50])
+           "avg_speed": snapshot.avg_speed,
+           "min_speed": snapshot.min_speed,
+           "max_speed": snapshot.max_speed,
+           "slow_roads": snapshot.slow_roads,
+           "fast_roads": snapshot.fast_roads,
+           "congestion_ratio": snapshot.congestion_ratio,
+           "smooth_ratio": snapshot.smooth_ratio,
+           "traffic_condition": snapshot.traffic_condition
        }
    
+   native_traffic = proxy.native_traffic_status()
    return jsonify({
-       "status": "healthy",
-       "traffic_data_count": len(traffic_data),
+       "status": "degraded" if native_traffic["degraded"] else "healthy",
+       "traffic_data_count": snapshot.count,
+       "traffic_version": snapshot.version,
+       "traffic_built_at": snapshot.built_at,
+       "traffic_age_sec": snapshot.age(),
+       "traffic_source": snapshot.source,
+       "traffic_freshness": snapshot.freshness(),
+       "traffic_refresh": dict(proxy.scheduler.stats(time.time()), adaptive=TRAFFIC_ADAPTIVE_REFRESH,
+                               budget_per_tick=proxy.refresh_budget()),
+       "traffic_store_ways": len(proxy.store),
+       "traffic_store_bytes": proxy.store.nbytes,
        "traffic_stats": traffic_stats,
+       "traffic_last_pass": proxy.last_pass_stats,
        "valhalla_url": VALHALLA_URL,
+       "valhalla_pool": valhalla_pool.stats(),
+       "worker": {"pid": os.getpid(), "role": proxy.role, "workers": PROXY_WORKERS,
+                  "shared_snapshot_file": TRAFFIC_SHARED_SNAPSHOT_FILE or None},
+       "traffic_history": proxy.speed_history.stats() if proxy.speed_history is not None else None,
+       "speed_profiles": proxy.speed_profiles.stats() if proxy.speed_profiles is not None else None,
+       "valhalla_native_traffic": native_traffic,
+       "matrix_cache": matrix_cache.stats() if matrix_cache is not None else None,
+       "single_flight": request_flights.stats(),
+       "geocode_cache": geocode_cache.stats(),
+       "kakao_scheduler": kakao_scheduler.stats(),
+       "route_cache": dict(route_cache.stats(), adjusted=ROUTE_CACHE_ADJUSTED, epoch=ROUTE_CACHE_EPOCH) if route_cache is not None else None,
        "kakao_api_configured": bool(KAKAO_API_KEY and KAKAO_API_KEY != 'YOUR_KAKAO_API_KEY_HERE'),
        "geocoding_method": "kakao",
-       "intercept_method": "realistic_traffic_system"
+       "intercept_method": "valhalla_native_traffic" if proxy.native_traffic_active() else "realistic_traffic_system"
    })
 
 @app.route('/search', methods=['GET'])
@@ -595,7 +1498,9 @@ def kakao_geocoding_search():
        if not text:
            return jsonify({"error": "text parameter required"}), 400
 
-       lat, lon, location_name, confidence = proxy.kakao_geocoding(text)
+       priority = request.args.get('priority', 'interactive')
+       geocoded, _ = request_flights.do(('geocode', normalize_address(text), priority), lambda: proxy.geocode(text, priority))
+       lat, lon, location_name, confidence = geocoded['lat'], geocoded['lon'], geocoded['name'], geocoded['confidence']
 
        result = {
            "features": [{
@@ -605,6 +1510,7 @@ def kakao_geocoding_search():
                "properties": {
                    "confidence": confidence,
                    "display_name": location_name,
+                   "district": geocoded.get('district'),
                    "geocoding_method": "kakao"
                }
            }]
@@ -634,29 +1540,72 @@ def kakao_geocoding_search():
        }
        return jsonify(result), 200
 
+@app.route('/search/batch', methods=['POST'])
+def kakao_geocoding_batch():
+   """주소 목록을 한 번에 지오코딩. 중복 제거 후 캐시에 없는 주소만 병렬로 카카오 조회, 입력 순서대로 반환"""
+   try:
+       started_at = time.time()
+       body = request.json or {}
+       addresses = body.get('addresses') or []
+       priority = body.get('priority', 'bulk')
+       if not isinstance(addresses, list) or not addresses:
+           return jsonify({"error": "addresses list required"}), 400
+       if len(addresses) > GEOCODE_BATCH_MAX:
+           return jsonify({"error": f"최대 {GEOCODE_BATCH_MAX}개까지 요청할 수 있습니다"}), 413
+
+       unique = {}
+       for address in addresses:
+           unique.setdefault(normalize_address(str(address or '')), str(address or ''))
+       unique.pop('', None)
+
+       def resolve(key, address):
+           result, _ = request_flights.do(('geocode', key, priority), lambda: proxy.geocode(address, priority))
+           return result
+
+       futures = {key: geocode_executor.submit(resolve, key, address) for key, address in unique.items()}
+       resolved = {key: future.result() for key, future in futures.items()}
+
+       results = []
+       for address in addresses:
+           result = resolved.get(normalize_address(str(address or '')))
+           results.append(dict(result, query=address) if result else {"query": address, "error": "empty address"})
+
+       sources = {}
+       for result in resolved.values():
+           sources[result['source']] = sources.get(result['source'], 0) + 1
+
+       elapsed = time.time() - started_at
+       logger.info(f"카카오 일괄 지오코딩: {len(addresses)}건 (고유 {len(unique)}건, {sources}) {elapsed:.2f}초")
+       return jsonify({
+           "results": results,
+           "count": len(addresses),
+           "unique": len(unique),
+           "sources": sources,
+           "elapsed_sec": round(elapsed, 3)
+       }), 200
+
+   except Exception as e:
+       logger.error(f"카카오 일괄 지오코딩 오류: {e}")
+       return jsonify({"error": str(e)}), 500
+
 @app.route('/traffic-debug', methods=['GET'])
 def traffic_debug():
-   if not traffic_data:
+   snapshot = proxy.snapshot
+   if not snapshot:
        return jsonify({"message": "교통 데이터 없음"}), 200
    
-   speeds = list(traffic_data.values())
-   sample_data = dict(list(traffic_data.items())[:10])
-
-   speed_distribution = {
-       "very_slow": len([s for s in speeds if s < 15]),
-       "slow": len([s for s in speeds if 15 <= s < 30]), 
-       "normal": len([s for s in speeds if 30 <= s < 50]),
-       "fast": len([s for s in speeds if s >= 50])
-   }
+   sample_data = snapshot.sample(10)
    
    return jsonify({
-       "total_roads": len(traffic_data),
+       "total_roads": snapshot.count,
+       "traffic_version": snapshot.version,
        "speed_stats": {
-           "avg": sum(speeds) / len(speeds),
-           "min": min(speeds),
-           "max": max(speeds)
+           "avg": snapshot.avg_speed,
+           "min": snapshot.min_speed,
+           "max": snapshot.max_speed
        },
-       "speed_distribution": speed_distribution,
+       "speed_distribution": dict(snapshot.speed_distribution),
+       "speed_histogram": snapshot.histogram_dict(),
        "sample_data": sample_data,
        "method": "현실적인 실시간 교통 시스템"
    })
@@ -664,17 +1613,28 @@ def traffic_debug():
 @app.route('/<path:path>', methods=['GET', 'POST'])
 def proxy_all(path):
    try:
-       if request.method == 'GET':
-           response = requests.get(f"{VALHALLA_URL}/{path}", timeout=30)
-       else:
-           response = requests.post(
-               f"{VALHALLA_URL}/{path}",
-               json=request.json,
-               headers=request.headers,
-               timeout=30
-           )
-       
-       return response.text, response.status_code, response.headers.items()
+       headers = dict(filter_headers(request.headers))
+       headers.setdefault('Accept-Encoding', 'identity')
+       response = valhalla_request(
+           request.method, path,
+           read_timeout=30,
+           params=request.args,
+           data=request.get_data() if request.method == 'POST' else None,
+           headers=headers,
+           stream=True
+       )
+
+       def generate():
+           try:
+               for chunk in response.raw.stream(PROXY_STREAM_CHUNK_SIZE, decode_content=False):
+                   yield chunk
+           finally:
+               response.close()
+
+       response_headers = filter_headers(response.headers)
+       if 'Content-Length' in response.headers:
+           response_headers.append(('Content-Length', response.headers['Content-Length']))
+       return Response(stream_with_context(generate()), status=response.status_code, headers=response_headers)
    except Exception as e:
        logger.error(f"Proxy error for {path}: {e}")
        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,218 @@
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import numpy as np
+
+VALID_SPEED_MIN = 10
+VALID_SPEED_MAX = 80
+CONGESTED_SPEED = 25
+SMOOTH_SPEED = 50
+
+SPEED_HISTOGRAM_EDGES = (0, 10, 15, 20, 25, 30, 40, 50, 60, 80, float('inf'))
+FRESHNESS_PERCENTILES = (50, 90, 99)
+
+ROAD_CLASSES = ('local', 'major', 'highway')
+ROAD_CLASS_BY_HIGHWAY = {
+    'motorway': 'highway', 'motorway_link': 'highway',
+    'trunk': 'highway', 'trunk_link': 'highway',
+    'primary': 'major', 'primary_link': 'major',
+    'secondary': 'major', 'secondary_link': 'major'
+}
+
+
+def road_class_of(highway):
+    return ROAD_CLASS_BY_HIGHWAY.get(highway, 'local')
+
+
+def road_class_code(highway):
+    return ROAD_CLASSES.index(road_class_of(highway))
+
+
+def decay_toward_baseline(speeds, observed_at, baseline, now, ttl, decay):
+    """TTL이 지난 속도는 baseline 쪽으로 지수 감쇠, baseline이 없으면 NaN(만료)"""
+    speeds = np.asarray(speeds, dtype=np.float64)
+    if ttl is None or ttl <= 0:
+        return speeds
+
+    ages = now - np.asarray(observed_at, dtype=np.float64)
+    stale = ages > ttl
+    if not stale.any():
+        return speeds
+
+    weights = np.exp(-np.maximum(ages - ttl, 0.0) / max(decay, 1.0))
+    baseline = np.asarray(baseline, dtype=np.float64)
+    decayed = np.where(np.isfinite(baseline), baseline + (speeds - baseline) * weights, np.nan)
+    return np.where(stale, decayed, speeds)
+
+
+def _readonly(values, dtype):
+    values = np.asarray(values, dtype=dtype)
+    if values.flags.writeable:
+        values = values.copy()
+        values.setflags(write=False)
+    return values
+
+
+def _empty(dtype):
+    return lambda: _readonly(np.empty(0), dtype)
+
+
+@dataclass(frozen=True, eq=False)
+class TrafficSnapshot:
+    """한 번의 수집 결과와 집계값. 생성 후 변경하지 않고 통째로 교체한다
+
+    way_ids는 TrafficStore의 정렬된 way 집합, speeds/observed_at은 같은 순서의 배열.
+    """
+
+    version: int = 0
+    built_at: float = 0.0
+    source: str = 'live'
+    way_ids: np.ndarray = field(default_factory=_empty(np.int64))
+    speeds: np.ndarray = field(default_factory=_empty(np.float32))
+    observed_at: np.ndarray = field(default_factory=_empty(np.uint32))
+    baseline: np.ndarray = field(default_factory=_empty(np.float32))
+    ttl: float = 0.0
+    decay: float = 0.0
+    observed_quantiles: tuple = ()
+    stale_count: int = 0
+    class_speeds: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    count: int = 0
+    avg_speed: float = 0.0
+    min_speed: float = 0.0
+    max_speed: float = 0.0
+    valid_count: int = 0
+    valid_avg_speed: float = 0.0
+    congestion_ratio: float = 0.0
+    smooth_ratio: float = 0.0
+    traffic_condition: str = '원활'
+    condition_factor: float = 1.0
+    matrix_factor: float = 1.0
+    speed_histogram: tuple = ()
+    speed_distribution: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+    slow_roads: int = 0
+    fast_roads: int = 0
+
+    @classmethod
+    def build(cls, way_ids, speeds, observed_at, version, built_at=None, way_classes=None, source='live',
+              baseline=None, ttl=0.0, decay=0.0):
+        """way_ids/speeds/observed_at/baseline: 같은 길이의 배열, speeds의 NaN은 데이터 없음
+
+        집계값은 built_at 시점에 TTL 감쇠를 적용한 유효 속도로 계산한다.
+        """
+        way_ids = _readonly(way_ids, np.int64)
+        speeds = _readonly(speeds, np.float32)
+        observed_at = _readonly(observed_at, np.uint32)
+        baseline = _readonly(speeds if baseline is None else baseline, np.float32)
+        built_at = time.time() if built_at is None else built_at
+
+        observed = observed_at[observed_at > 0]
+        observed_quantiles = ()
+        if observed.size:
+            observed_quantiles = tuple(
+                (p, float(np.percentile(observed, 100 - p))) for p in FRESHNESS_PERCENTILES
+            ) + (('max', float(observed.min())),)
+        stale_count = int(np.count_nonzero(built_at - observed > ttl)) if ttl else 0
+
+        base_fields = dict(version=version, built_at=built_at, source=source, way_ids=way_ids, speeds=speeds,
+                           observed_at=observed_at, baseline=baseline, ttl=ttl, decay=decay,
+                           observed_quantiles=observed_quantiles, stale_count=stale_count)
+
+        effective = decay_toward_baseline(speeds, observed_at, baseline, built_at, ttl, decay)
+        known = np.isfinite(effective)
+        values = effective[known]
+        if not values.size:
+            return cls(**base_fields)
+
+        valid_mask = known & (effective >= VALID_SPEED_MIN) & (effective <= VALID_SPEED_MAX)
+        valid = effective[valid_mask]
+        valid_count = int(valid.size)
+        congestion_ratio = float(np.count_nonzero(valid < CONGESTED_SPEED) / valid_count) if valid_count else 0.0
+        smooth_ratio = float(np.count_nonzero(valid > SMOOTH_SPEED) / valid_count) if valid_count else 0.0
+
+        if congestion_ratio > 0.5:
+            traffic_condition, condition_factor, matrix_factor = '혼잡', 0.7, 0.7
+        elif congestion_ratio > 0.3:
+            traffic_condition, condition_factor, matrix_factor = '보통', 0.85, 0.85
+        else:
+            traffic_condition, condition_factor, matrix_factor = '원활', 1.1, 1.0
+
+        class_speeds = {}
+        if way_classes is not None and valid_count:
+            valid_classes = np.asarray(way_classes)[valid_mask]
+            sums = np.bincount(valid_classes, weights=valid, minlength=len(ROAD_CLASSES))
+            counts = np.bincount(valid_classes, minlength=len(ROAD_CLASSES))
+            class_speeds = {name: float(sums[i] / counts[i]) for i, name in enumerate(ROAD_CLASSES) if counts[i]}
+
+        bins = np.searchsorted(SPEED_HISTOGRAM_EDGES, values, side='right') - 1
+        bin_counts = np.bincount(bins, minlength=len(SPEED_HISTOGRAM_EDGES) - 1)
+        histogram = tuple((lo, hi, int(c)) for lo, hi, c in zip(SPEED_HISTOGRAM_EDGES[:-1], SPEED_HISTOGRAM_EDGES[1:], bin_counts))
+
+        return cls(
+            **base_fields,
+            class_speeds=MappingProxyType(class_speeds),
+            count=int(values.size),
+            avg_speed=float(values.mean()),
+            min_speed=float(values.min()),
+            max_speed=float(values.max()),
+            valid_count=valid_count,
+            valid_avg_speed=float(valid.mean()) if valid_count else 0.0,
+            congestion_ratio=congestion_ratio,
+            smooth_ratio=smooth_ratio,
+            traffic_condition=traffic_condition,
+            condition_factor=condition_factor,
+            matrix_factor=matrix_factor,
+            speed_histogram=histogram,
+            speed_distribution=MappingProxyType({
+                "very_slow": int(np.count_nonzero(values < 15)),
+                "slow": int(np.count_nonzero((values >= 15) & (values < 30))),
+                "normal": int(np.count_nonzero((values >= 30) & (values < 50))),
+                "fast": int(np.count_nonzero(values >= 50))
+            }),
+            slow_roads=int(np.count_nonzero(values < 20)),
+            fast_roads=int(np.count_nonzero(values > 50))
+        )
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+    def age(self, now=None):
+        if not self.built_at:
+            return None
+        return max(0.0, (time.time() if now is None else now) - self.built_at)
+
+    def freshness(self, now=None):
+        """관측된 way들의 데이터 나이(초) 백분위"""
+        now = time.time() if now is None else now
+        result = {f"p{p}" if p != 'max' else 'max': round(max(0.0, now - observed), 1)
+                  for p, observed in self.observed_quantiles}
+        result['observed_ways'] = int(np.count_nonzero(self.observed_at))
+        result['stale_ways'] = self.stale_count
+        result['ttl_sec'] = self.ttl
+        return result
+
+    def lookup(self, way_ids, now=None):
+        """way id 배열에 대한 실시간 속도 배열 (TTL 감쇠 적용). 데이터가 없는 way는 NaN"""
+        way_ids = np.asarray(way_ids, dtype=np.int64)
+        result = np.full(way_ids.shape, np.nan)
+        if not self.way_ids.size or not way_ids.size:
+            return result
+
+        positions = np.minimum(np.searchsorted(self.way_ids, way_ids), self.way_ids.size - 1)
+        hit = self.way_ids[positions] == way_ids
+        hit_positions = positions[hit]
+        result[hit] = decay_toward_baseline(self.speeds[hit_positions], self.observed_at[hit_positions],
+                                            self.baseline[hit_positions], time.time() if now is None else now,
+                                            self.ttl, self.decay)
+        return result
+
+    def sample(self, limit=10):
+        known = np.flatnonzero(np.isfinite(self.speeds))[:limit]
+        return {str(int(self.way_ids[i])): float(self.speeds[i]) for i in known}
+
+    def histogram_dict(self):
+        return [{"min": lo, "max": None if hi == float('inf') else hi, "count": c}
+                for lo, hi, c in self.speed_histogram]
@@ -0,0 +1,141 @@
+import os
+import threading
+
+import numpy as np
+
+
+class TrafficStore:
+    """고정된 OSM way 집합에 대한 배열 기반 속도 저장소
+
+    way id는 정렬된 int64, 속도는 float32(NaN = 데이터 없음), 관측 시각은 uint32 epoch 초.
+    baseline은 관측 속도의 지수이동평균으로, 오래된 속도가 되돌아갈 기준값이다.
+    수집기는 백 버퍼에만 쓰고 publish()로 읽기 전용 복사본을 만들어 한 번에 교체한다.
+    """
+
+    def __init__(self, way_ids, baseline_alpha=0.1):
+        self.way_ids = np.unique(np.asarray(way_ids, dtype=np.int64))
+        self.way_ids.setflags(write=False)
+
+        self._speeds = np.full(self.way_ids.size, np.nan, dtype=np.float32)
+        self._observed_at = np.zeros(self.way_ids.size, dtype=np.uint32)
+        self._baseline = np.full(self.way_ids.size, np.nan, dtype=np.float32)
+        self.baseline_alpha = baseline_alpha
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(self.way_ids.size)
+
+    @property
+    def nbytes(self):
+        return int(self.way_ids.nbytes + self._speeds.nbytes + self._observed_at.nbytes + self._baseline.nbytes)
+
+    def positions(self, way_ids):
+        """way id 배열의 저장소 내 위치와 존재 여부"""
+        way_ids = np.asarray(way_ids, dtype=np.int64)
+        if not self.way_ids.size:
+            return np.zeros(way_ids.shape, dtype=np.int64), np.zeros(way_ids.shape, dtype=bool)
+
+        positions = np.minimum(np.searchsorted(self.way_ids, way_ids), self.way_ids.size - 1)
+        return positions, self.way_ids[positions] == way_ids
+
+    def write(self, positions, speeds, observed_at):
+        speeds = np.asarray(speeds, dtype=np.float32)
+        with self._lock:
+            self._speeds[positions] = speeds
+            self._observed_at[positions] = observed_at
+
+            baseline = self._baseline[positions]
+            self._baseline[positions] = np.where(np.isfinite(baseline),
+                                                 baseline + (speeds - baseline) * self.baseline_alpha,
+                                                 speeds)
+
+    def load(self, way_ids, speeds, observed_at):
+        """다른 배열(저장된 스냅샷 등)을 현재 way 집합에 맞춰 백 버퍼로 복사. 복사된 way 수 반환"""
+        positions, hit = self.positions(way_ids)
+        self.write(positions[hit], np.asarray(speeds)[hit], np.asarray(observed_at)[hit])
+        return int(hit.sum())
+
+    def publish(self):
+        """백 버퍼의 읽기 전용 복사본 (speeds, observed_at, baseline)"""
+        with self._lock:
+            arrays = (self._speeds.copy(), self._observed_at.copy(), self._baseline.copy())
+
+        for values in arrays:
+            values.setflags(write=False)
+        return arrays
+
+
+SNAPSHOT_MAGIC = b'STTRAFF1'
+SNAPSHOT_FORMAT_VERSION = 2
+SNAPSHOT_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('format_version', '<u4'),
+    ('count', '<u4'),
+    ('snapshot_version', '<u8'),
+    ('built_at', '<f8'),
+    ('native_version', '<u8'),
+    ('source', 'S8'),
+    ('reserved', 'V16')
+])
+
+
+def save_snapshot_file(path, way_ids, speeds, observed_at, snapshot_version, built_at, baseline=None,
+                       native_version=0, source='live'):
+    """스냅샷을 memmap 가능한 바이너리로 저장 (헤더 64바이트 + way_ids + speeds + observed_at + baseline)
+
+    임시 파일에 쓴 뒤 os.replace로 교체하므로 읽는 쪽은 항상 완성된 파일만 본다.
+    native_version은 같은 버전이 Valhalla 교통 타일에도 기록됐는지 (0이면 아님).
+    """
+    header = np.zeros(1, dtype=SNAPSHOT_HEADER)
+    header['magic'] = SNAPSHOT_MAGIC
+    header['format_version'] = SNAPSHOT_FORMAT_VERSION
+    header['count'] = len(way_ids)
+    header['snapshot_version'] = snapshot_version
+    header['built_at'] = built_at
+    header['native_version'] = native_version
+    header['source'] = source.encode('ascii')[:8]
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(np.ascontiguousarray(way_ids, dtype='<i8').tobytes())
+        f.write(np.ascontiguousarray(speeds, dtype='<f4').tobytes())
+        f.write(np.ascontiguousarray(observed_at, dtype='<u4').tobytes())
+        f.write(np.ascontiguousarray(speeds if baseline is None else baseline, dtype='<f4').tobytes())
+    os.replace(tmp_path, path)
+
+
+def open_snapshot_file(path):
+    """저장된 스냅샷을 읽기 전용 memmap으로 연다. (header dict, way_ids, speeds, observed_at, baseline)
+
+    형식 1 파일에는 baseline이 없어 speeds를 그대로 돌려준다.
+    """
+    header = np.fromfile(path, dtype=SNAPSHOT_HEADER, count=1)
+    if header.size != 1 or header['magic'][0] != SNAPSHOT_MAGIC:
+        raise ValueError(f"교통 스냅샷 파일 형식이 아닙니다: {path}")
+    format_version = int(header['format_version'][0])
+    if format_version not in (1, SNAPSHOT_FORMAT_VERSION):
+        raise ValueError(f"지원하지 않는 스냅샷 버전: {format_version}")
+
+    count = int(header['count'][0])
+    offset = SNAPSHOT_HEADER.itemsize
+    way_ids = np.memmap(path, dtype='<i8', mode='r', offset=offset, shape=(count,))
+    offset += way_ids.nbytes
+    speeds = np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(count,))
+    offset += speeds.nbytes
+    observed_at = np.memmap(path, dtype='<u4', mode='r', offset=offset, shape=(count,))
+    offset += observed_at.nbytes
+    baseline = speeds
+    if format_version >= 2:
+        baseline = np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(count,))
+
+    meta = {
+        "snapshot_version": int(header['snapshot_version'][0]),
+        "built_at": float(header['built_at'][0]),
+        "native_version": int(header['native_version'][0]) if format_version >= 2 else 0,
+        "source": header['source'][0].decode('ascii') if format_version >= 2 else 'file',
+        "count": count
+    }
+    return meta, way_ids, speeds, observed_at, baseline
@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class ValhallaBackend:
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.latency_ewma = 0.0
+
+    def available(self, now):
+        return self.healthy and now >= self.ejected_until
+
+
+class ValhallaPool:
+    """여러 Valhalla 인스턴스에 요청을 나누는 클라이언트 측 로드밸런서
+
+    - 진행 중인 요청이 가장 적은 백엔드 선택 (least outstanding requests), 같으면 평균 지연이 짧은 쪽
+    - /status 주기 점검과 연속 실패 시 일정 시간 제외 (ejection)
+    - 선택적 hedging: 첫 응답이 경로별 p95 지연을 넘기면 다른 백엔드로 같은 요청을 보내 먼저 온 응답 사용
+    """
+
+    def __init__(self, urls, pool_size=32, connect_timeout=3.0, health_interval=10.0,
+                 eject_after=3, eject_seconds=30.0, hedge=False, hedge_min_delay=0.05,
+                 hedge_initial_delay=1.0):
+        self.backends = [ValhallaBackend(url) for url in urls]
+        if not self.backends:
+            raise ValueError("Valhalla 백엔드가 하나 이상 필요합니다")
+
+        self.connect_timeout = connect_timeout
+        self.health_interval = health_interval
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_initial_delay = hedge_initial_delay
+        self.hedged_requests = 0
+        self.hedge_wins = 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.backends), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.latencies = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='valhalla-hedge')
+
+    def pick(self, exclude=()):
+        now = time.monotonic()
+        with self.lock:
+            candidates = [b for b in self.backends if b not in exclude and b.available(now)]
+            if not candidates:
+                candidates = [b for b in self.backends if b not in exclude] or self.backends
+            random.shuffle(candidates)
+            backend = min(candidates, key=lambda b: (b.outstanding, b.latency_ewma))
+            backend.outstanding += 1
+            backend.requests += 1
+        return backend
+
+    def p95(self, path):
+        with self.lock:
+            samples = list(self.latencies.get(path, ()))
+        if len(samples) < 20:
+            return None
+        return float(np.percentile(samples, 95))
+
+    def _record(self, backend, path, elapsed, ok):
+        with self.lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.consecutive_failures = 0
+                backend.latency_ewma = elapsed if not backend.latency_ewma else backend.latency_ewma * 0.8 + elapsed * 0.2
+                self.latencies.setdefault(path, deque(maxlen=500)).append(elapsed)
+                return
+
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            if backend.consecutive_failures >= self.eject_after:
+                backend.ejected_until = time.monotonic() + self.eject_seconds
+                logger.warning(f"Valhalla 백엔드 제외: {backend.url} ({self.eject_seconds}초, 연속 실패 {backend.consecutive_failures}회)")
+
+    def _send(self, backend, method, path, read_timeout, **kwargs):
+        started_at = time.monotonic()
+        try:
+            response = self.session.request(method, f"{backend.url}/{path}",
+                                            timeout=(self.connect_timeout, read_timeout), **kwargs)
+        except requests.RequestException:
+            self._record(backend, path, time.monotonic() - started_at, ok=False)
+            raise
+
+        self._record(backend, path, time.monotonic() - started_at, ok=response.status_code < 500)
+        return response
+
+    def request(self, method, path, read_timeout, hedge=None, **kwargs):
+        path = path.lstrip('/')
+        hedge = self.hedge if hedge is None else hedge
+
+        if hedge and len(self.backends) > 1 and not kwargs.get('stream'):
+            return self._hedged_request(method, path, read_timeout, **kwargs)
+
+        backend = self.pick()
+        try:
+            return self._send(backend, method, path, read_timeout, **kwargs)
+        except requests.ConnectionError:
+            if len(self.backends) == 1:
+                raise
+            retry_backend = self.pick(exclude=(backend,))
+            logger.warning(f"Valhalla 연결 실패, 다른 백엔드로 재시도: {backend.url} -> {retry_backend.url}")
+            return self._send(retry_backend, method, path, read_timeout, **kwargs)
+
+    def _hedged_request(self, method, path, read_timeout, **kwargs):
+        first_backend = self.pick()
+        first = self.executor.submit(self._send, first_backend, method, path, read_timeout, **kwargs)
+
+        p95 = self.p95(path)
+        delay = min(max(p95 if p95 is not None else self.hedge_initial_delay, self.hedge_min_delay), read_timeout)
+        done, _ = wait([first], timeout=delay)
+        if done and not first.exception() and first.result().status_code < 500:
+            return first.result()
+
+        second_backend = self.pick(exclude=(first_backend,))
+        second = self.executor.submit(self._send, second_backend, method, path, read_timeout, **kwargs)
+        with self.lock:
+            self.hedged_requests += 1
+
+        pending = {first, second}
+        last_error = None
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    last_error = future.exception()
+                    continue
+                response = future.result()
+                if response.status_code >= 500 and pending:
+                    fallback = response
+                    continue
+                if future is second:
+                    with self.lock:
+                        self.hedge_wins += 1
+                for other in pending:
+                    other.add_done_callback(lambda f: f.exception() is None and f.result().close())
+                return response
+
+        if fallback is not None:
+            return fallback
+        raise last_error
+
+    def check_health(self):
+        for backend in self.backends:
+            try:
+                response = self.session.get(f"{backend.url}/status", timeout=(self.connect_timeout, 5))
+                healthy = response.status_code == 200
+            except requests.RequestException:
+                healthy = False
+
+            if healthy != backend.healthy:
+                logger.warning(f"Valhalla 백엔드 상태 변경: {backend.url} -> {'정상' if healthy else '비정상'}")
+            backend.healthy = healthy
+            if healthy and backend.ejected_until and time.monotonic() >= backend.ejected_until:
+                backend.consecutive_failures = 0
+                backend.ejected_until = 0.0
+
+    def start_health_checks(self):
+        def health_loop():
+            while True:
+                try:
+                    self.check_health()
+                except Exception as e:
+                    logger.error(f"Valhalla 상태 점검 오류: {e}")
+                time.sleep(self.health_interval)
+
+        thread = threading.Thread(target=health_loop, daemon=True)
+        thread.start()
+
+    def stats(self):
+        now = time.monotonic()
+        with self.lock:
+            backends = [{
+                "url": b.url,
+                "healthy": b.healthy,
+                "ejected": now < b.ejected_until,
+                "outstanding": b.outstanding,
+                "requests": b.requests,
+                "failures": b.failures,
+                "latency_ewma_sec": round(b.latency_ewma, 4)
+            } for b in self.backends]
+        return {
+            "backends": backends,
+            "hedge": self.hedge,
+            "hedged_requests": self.hedged_requests,
+            "hedge_wins": self.hedge_wins,
+            "p95_sec": {path: self.p95(path) for path in list(self.latencies)}
+        }
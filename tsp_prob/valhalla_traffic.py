@@ -0,0 +1,226 @@
+import ctypes
+import logging
+import os
+import tarfile
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRAFFIC_TILE_VERSION = 3
+TRAFFIC_TILE_HEADER = np.dtype([
+    ('tile_id', '<u8'),
+    ('last_update', '<u8'),
+    ('directed_edge_count', '<u4'),
+    ('traffic_tile_version', '<u4'),
+    ('spare2', '<u4'),
+    ('spare3', '<u4')
+])
+
+# valhalla/baldr/traffictile.h의 struct TrafficSpeed (uint64_t 비트필드, 선언 순서대로 하위 비트부터)
+TRAFFIC_SPEED_FIELDS = (
+    ('overall_encoded_speed', 7),
+    ('encoded_speed1', 7),
+    ('encoded_speed2', 7),
+    ('encoded_speed3', 7),
+    ('breakpoint1', 8),
+    ('breakpoint2', 8),
+    ('congestion1', 6),
+    ('congestion2', 6),
+    ('congestion3', 6),
+    ('has_incidents', 1),
+    ('spare', 1)
+)
+TRAFFIC_SPEED_SHIFTS = dict(zip([name for name, _ in TRAFFIC_SPEED_FIELDS],
+                                np.cumsum([0] + [bits for _, bits in TRAFFIC_SPEED_FIELDS[:-1]]).tolist()))
+
+UNKNOWN_SPEED_RAW = 127
+WHOLE_EDGE_BREAKPOINT = 255
+MAX_ENCODED_SPEED = 126
+
+GRAPH_ID_LEVEL_BITS = 3
+GRAPH_ID_TILE_BITS = 22
+GRAPH_ID_INDEX_BITS = 21
+
+
+def split_graph_ids(graph_ids):
+    """Valhalla GraphId(level 3비트, tile 22비트, edge index 21비트) -> (tile 키, edge index)"""
+    graph_ids = np.asarray(graph_ids, dtype=np.uint64)
+    tile_keys = graph_ids & np.uint64((1 << (GRAPH_ID_LEVEL_BITS + GRAPH_ID_TILE_BITS)) - 1)
+    indexes = (graph_ids >> np.uint64(GRAPH_ID_LEVEL_BITS + GRAPH_ID_TILE_BITS)) & np.uint64((1 << GRAPH_ID_INDEX_BITS) - 1)
+    return tile_keys, indexes.astype(np.int64)
+
+
+def pack_traffic_speeds(speeds_kph):
+    """km/h 속도 배열 -> TrafficSpeed 64비트 값. 엣지 전체 한 구간(breakpoint1=255)으로 기록하고
+    속도가 없는 엣지는 0(실시간 데이터 없음)으로 둔다"""
+    speeds_kph = np.asarray(speeds_kph, dtype=np.float64)
+    valid = np.isfinite(speeds_kph) & (speeds_kph > 0)
+    encoded = np.clip(np.rint(np.where(valid, speeds_kph, 0.0) / 2.0), 1, MAX_ENCODED_SPEED).astype(np.uint64)
+
+    shift = {name: np.uint64(bits) for name, bits in TRAFFIC_SPEED_SHIFTS.items()}
+    packed = ((encoded << shift['overall_encoded_speed'])
+              | (encoded << shift['encoded_speed1'])
+              | (np.uint64(UNKNOWN_SPEED_RAW) << shift['encoded_speed2'])
+              | (np.uint64(UNKNOWN_SPEED_RAW) << shift['encoded_speed3'])
+              | (np.uint64(WHOLE_EDGE_BREAKPOINT) << shift['breakpoint1']))
+    return np.where(valid, packed, np.uint64(0))
+
+
+class _TrafficSpeedStruct(ctypes.LittleEndianStructure):
+    """C 컴파일러와 같은 규칙으로 배치한 TrafficSpeed 비트필드 (시프트 계산과 독립적인 검증용)"""
+    _fields_ = [(name, ctypes.c_uint64, bits) for name, bits in TRAFFIC_SPEED_FIELDS]
+
+
+def check_traffic_speed_layout():
+    """pack_traffic_speeds가 Valhalla TrafficSpeed 구조체대로 기록하는지 확인. 어긋나면 ValueError
+
+    기록한 값을 ctypes 비트필드 구조체로 다시 읽어 필드별로 비교한다.
+    Valhalla는 encoded_speed*2를 km/h로 읽고, breakpoint1=255면 엣지 전체에 encoded_speed1을 쓴다.
+    """
+    if ctypes.sizeof(_TrafficSpeedStruct) != 8:
+        raise ValueError("TrafficSpeed 구조체가 64비트가 아닙니다")
+
+    speeds = np.array([2.0, 37.0, 60.0, 252.0, 400.0, 0.0, np.nan])
+    decoded = [_TrafficSpeedStruct.from_buffer_copy(int(value).to_bytes(8, 'little'))
+               for value in pack_traffic_speeds(speeds)]
+    fields = {name: np.array([getattr(value, name) for value in decoded]) for name, _ in TRAFFIC_SPEED_FIELDS}
+    live = np.isfinite(speeds) & (speeds > 0)
+    expected_kph = np.minimum(np.rint(speeds[live] / 2.0), MAX_ENCODED_SPEED) * 2
+    checks = {
+        'overall_encoded_speed': np.array_equal(fields['overall_encoded_speed'][live] * 2, expected_kph),
+        'encoded_speed1': np.array_equal(fields['encoded_speed1'][live] * 2, expected_kph),
+        'encoded_speed2': (fields['encoded_speed2'][live] == UNKNOWN_SPEED_RAW).all(),
+        'encoded_speed3': (fields['encoded_speed3'][live] == UNKNOWN_SPEED_RAW).all(),
+        'breakpoint1': (fields['breakpoint1'][live] == WHOLE_EDGE_BREAKPOINT).all(),
+        'breakpoint2': (fields['breakpoint2'][live] == 0).all(),
+        'no_live_speed': all((values[~live] == 0).all() for values in fields.values()),
+    }
+    broken = [name for name, ok in checks.items() if not ok]
+    if broken:
+        raise ValueError(f"TrafficSpeed 비트 배치가 Valhalla 구조체와 다릅니다: {broken}")
+
+
+def load_way_edges(ways_edges_path, cache_path=None):
+    """valhalla_ways_to_edges 출력(way_id,forward,edge_id,forward,edge_id,...)을 (way id, edge GraphId) 배열로
+
+    파싱 결과는 cache_path(npz)에 원본 파일 mtime과 함께 저장해 다음 기동 시 재사용한다.
+    """
+    source_mtime = os.path.getmtime(ways_edges_path)
+    if cache_path and os.path.exists(cache_path):
+        try:
+            cached = np.load(cache_path)
+            if float(cached['source_mtime']) == source_mtime:
+                return cached['way_ids'], cached['edge_ids']
+        except Exception as e:
+            logger.warning(f"way-edge 매핑 캐시를 읽을 수 없어 다시 생성: {e}")
+
+    way_ids = []
+    edge_ids = []
+    with open(ways_edges_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split(',')
+            if len(parts) < 3:
+                continue
+            edges = parts[2::2]
+            way_ids.extend([int(parts[0])] * len(edges))
+            edge_ids.extend(int(edge) for edge in edges)
+
+    way_ids = np.array(way_ids, dtype=np.int64)
+    edge_ids = np.array(edge_ids, dtype=np.uint64)
+    if cache_path:
+        try:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            tmp_path = f"{cache_path}.tmp.{os.getpid()}.npz"
+            np.savez(tmp_path, way_ids=way_ids, edge_ids=edge_ids, source_mtime=np.float64(source_mtime))
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"way-edge 매핑 캐시 저장 실패: {e}")
+    return way_ids, edge_ids
+
+
+class ValhallaTrafficWriter:
+    """교통 스냅샷을 Valhalla traffic.tar의 TrafficSpeed 값으로 직접 기록
+
+    traffic.tar는 valhalla_build_extract --with-traffic이 타일별로 미리 만들어 둔 파일이고,
+    Valhalla가 mmap으로 읽으므로 같은 파일을 memmap(r+)으로 열어 제자리에 쓰면 재시작 없이 반영된다.
+    """
+
+    def __init__(self, tar_path, ways_edges_path, mapping_cache_path=None, way_filter=None):
+        """way_filter: 주어지면 이 way들의 엣지만 기록 (교통 데이터가 올 수 있는 way)"""
+        self.tar_path = tar_path
+        self.written_version = 0
+        self.written_at = 0.0
+        self.live_edges = 0
+
+        check_traffic_speed_layout()
+        tile_offsets = self._index_tiles(tar_path)
+        if not tile_offsets:
+            raise ValueError(f"교통 타일이 없는 traffic.tar입니다: {tar_path}")
+        self.tar = np.memmap(tar_path, dtype='<u8', mode='r+')
+
+        way_ids, edge_ids = load_way_edges(ways_edges_path, mapping_cache_path)
+        if way_filter is not None:
+            keep = np.isin(way_ids, np.asarray(way_filter, dtype=np.int64))
+            way_ids, edge_ids = way_ids[keep], edge_ids[keep]
+        tile_keys, indexes = split_graph_ids(edge_ids)
+
+        keys = np.array(sorted(tile_offsets), dtype=np.uint64)
+        offsets = np.array([tile_offsets[int(k)][0] for k in keys], dtype=np.int64)
+        counts = np.array([tile_offsets[int(k)][1] for k in keys], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(keys, tile_keys), keys.size - 1)
+        known = (keys[positions] == tile_keys) & (indexes < counts[positions])
+
+        self.edge_way_ids = way_ids[known]
+        self.edge_slots = (offsets[positions[known]] + TRAFFIC_TILE_HEADER.itemsize) // 8 + indexes[known]
+        self.unique_way_ids, self.way_inverse = np.unique(self.edge_way_ids, return_inverse=True)
+        self.tile_update_slots = (offsets + TRAFFIC_TILE_HEADER.fields['last_update'][1]) // 8
+        logger.info(f"Valhalla 교통 타일 연결: 타일 {keys.size}개, 매핑 엣지 {self.edge_slots.size}개 "
+                    f"(way {self.unique_way_ids.size}개, 타일 밖 엣지 {int((~known).sum())}개)")
+
+    @staticmethod
+    def _index_tiles(tar_path):
+        """tar 안 타일별 (데이터 시작 오프셋, directed edge 수)"""
+        tiles = {}
+        with tarfile.open(tar_path, 'r:') as tar, open(tar_path, 'rb') as raw:
+            for member in tar:
+                if not member.isfile() or member.size < TRAFFIC_TILE_HEADER.itemsize:
+                    continue
+                raw.seek(member.offset_data)
+                header = np.frombuffer(raw.read(TRAFFIC_TILE_HEADER.itemsize), dtype=TRAFFIC_TILE_HEADER)[0]
+                if int(header['traffic_tile_version']) != TRAFFIC_TILE_VERSION or member.offset_data % 8:
+                    continue
+                tile_key = int(header['tile_id']) & ((1 << (GRAPH_ID_LEVEL_BITS + GRAPH_ID_TILE_BITS)) - 1)
+                tiles[tile_key] = (member.offset_data, int(header['directed_edge_count']))
+        return tiles
+
+    @property
+    def active(self):
+        return self.written_version > 0
+
+    def write(self, snapshot, now=None):
+        """스냅샷(TTL 감쇠 적용)의 way 속도를 매핑된 모든 엣지에 기록. 실시간 속도가 들어간 엣지 수 반환"""
+        now = time.time() if now is None else now
+        way_speeds = snapshot.lookup(self.unique_way_ids, now=now)
+        packed = pack_traffic_speeds(way_speeds)[self.way_inverse]
+
+        self.tar[self.edge_slots] = packed
+        self.tar[self.tile_update_slots] = np.uint64(int(now))
+        self.tar.flush()
+
+        self.written_version = snapshot.version
+        self.written_at = now
+        self.live_edges = int(np.count_nonzero(packed))
+        return self.live_edges
+
+    def stats(self, now=None):
+        now = time.time() if now is None else now
+        return {
+            "tar_path": self.tar_path,
+            "mapped_edges": int(self.edge_slots.size),
+            "mapped_ways": int(self.unique_way_ids.size),
+            "live_edges": self.live_edges,
+            "written_version": self.written_version,
+            "written_age_sec": round(now - self.written_at, 1) if self.written_at else None
+        }